@@ -2,10 +2,10 @@ import logging
 from datetime import datetime
 
 import pytz
-from django.db.models import Q
+from django.db.models import Q, Sum
 
 from ...moments.comments.models import CommentThreads, MomentComments
-from ...moments.models import MomentScores
+from ...moments.models import Moment
 from ...moments.serializers import MomentSerializer
 from ...moments.shares.models import MomentShares
 from ...moments.views.models import MomentViews
@@ -43,23 +43,23 @@ def get_top_moment_by_filter(user, filter_type):
         now = pytz.UTC.localize(datetime.now())
         lowerbound = get_start_day_for_applied_filter(filter_type)
 
-        top_moment = None
         top_moment_views = 0
         top_moment_shares = 0
         top_moment_comments = 0
 
-        if MomentScores.objects.filter(
-            moment__user_id=user,
-            timestamp__gte=lowerbound,
-            timestamp__lte=now,
-        ).exists():
-            top_moment_score_card = MomentScores.objects.filter(
-                moment__user_id=user,
-                timestamp__gte=lowerbound,
-                timestamp__lte=now,
-            ).order_by("-score")[0]
+        # the moment with the highest total of its daily scores over the range
+        top_moment = (
+            Moment.objects.filter(
+                user_id=user,
+                moment__day__gte=lowerbound.date(),
+                moment__day__lte=now.date(),
+            )
+            .annotate(total_score=Sum("moment__score"))
+            .order_by("-total_score")
+            .first()
+        )
 
-            top_moment = top_moment_score_card.moment
+        if top_moment is not None:
             top_moment_views = MomentViews.objects.filter(
                 moment_viewed=top_moment,
                 timestamp__gte=lowerbound,
@@ -5,7 +5,9 @@ from datetime import datetime
 import pytz
 from django.db.models import Count
 
-from ...widget.models import RewardCalculation
+from ...common.utils import iter_chunks
+from ...models import TaggUser
+from ...widget.models import RewardCalculation, Widget
 from ...gamification.constants import TAGG_SCORE_ALLOTMENT
 from ...gamification.utils import increase_tagg_score
 
@@ -19,6 +21,9 @@ from ..utils import get_start_day_for_applied_filter
 
 from .models import WidgetViews
 
+# Owners are rewarded each time the clicks counted towards a reward exceed this
+WIDGET_CLICK_REWARD_THRESHOLD = 30
+
 
 def record_widget_click(widget, viewer):
     """
@@ -43,17 +48,8 @@ def send_tagg_click_count_notification(widget, count):
         view_count = RewardCalculation.objects.filter(userId=widget.owner)[0]
 
         new_count = view_count.count + count
-        if new_count > 30:
-            handle_notification(
-                notification_type=NotificationType.CLICK_TAG,
-                actor=widget.owner,
-                receiver=widget.owner,
-                verbage="Your Taggs are getting clicked! Here's some Tagg coin!",
-                notification_object=None,
-            )
-            increase_tagg_score(
-                widget.owner, TAGG_SCORE_ALLOTMENT["TAGG_CLICK_COUNT_10"]
-            )
+        if new_count > WIDGET_CLICK_REWARD_THRESHOLD:
+            reward_widget_click_count(widget.owner)
             new_count = 0
         view_count.count = new_count
         view_count.save()
@@ -63,6 +59,99 @@ def send_tagg_click_count_notification(widget, count):
         )
 
 
+def reward_widget_click_count(owner):
+    handle_notification(
+        notification_type=NotificationType.CLICK_TAG,
+        actor=owner,
+        receiver=owner,
+        verbage="Your Taggs are getting clicked! Here's some Tagg coin!",
+        notification_object=None,
+    )
+    increase_tagg_score(owner, TAGG_SCORE_ALLOTMENT["TAGG_CLICK_COUNT_10"])
+
+
+def boost_widget_clicks(viewer, chunk_size=1000):
+    """
+    Adds 2 to 5 clicks by viewer to every active widget and applies the click
+    rewards of their owners, the way send_tagg_click_count_notification does
+    for each widget in turn. Widgets are streamed and their clicks written a
+    chunk at a time, rewards are written once at the end
+
+    Returns:
+        Number of click records written
+    """
+    rows = 0
+    # owner id -> reward row pk (or widget to create it for), count, rewards due
+    rewards = {}
+    widgets = Widget.objects.filter(active=True).values_list("id", "owner_id")
+    for chunk in iter_chunks(widgets.iterator(chunk_size=chunk_size), chunk_size):
+        now = pytz.UTC.localize(datetime.now())
+        clicks = [
+            (widget_id, owner_id, random.randint(2, 5)) for widget_id, owner_id in chunk
+        ]
+        WidgetViews.objects.bulk_create(
+            [
+                WidgetViews(widget_id=widget_id, viewer=viewer, timestamp=now)
+                for widget_id, _, count in clicks
+                for _ in range(count)
+            ],
+            batch_size=chunk_size,
+        )
+        rows += sum(count for _, _, count in clicks)
+
+        # descending so each owner ends up with their first row
+        for pk, owner_id, count in (
+            RewardCalculation.objects.filter(
+                userId__in={owner_id for _, owner_id, _ in clicks} - rewards.keys()
+            )
+            .order_by("-pk")
+            .values_list("pk", "userId_id", "count")
+        ):
+            rewards[owner_id] = {"pk": pk, "count": count, "due": 0}
+
+        for widget_id, owner_id, count in clicks:
+            reward = rewards.get(owner_id)
+            if reward is None:
+                rewards[owner_id] = {
+                    "pk": None,
+                    "widget_id": widget_id,
+                    "count": count,
+                    "due": 0,
+                }
+                continue
+            reward["count"] += count
+            if reward["count"] > WIDGET_CLICK_REWARD_THRESHOLD:
+                reward["due"] += 1
+                reward["count"] = 0
+
+    RewardCalculation.objects.bulk_update(
+        [
+            RewardCalculation(pk=reward["pk"], count=reward["count"])
+            for reward in rewards.values()
+            if reward["pk"]
+        ],
+        ["count"],
+        batch_size=chunk_size,
+    )
+    RewardCalculation.objects.bulk_create(
+        [
+            RewardCalculation(
+                taggId_id=reward["widget_id"], userId_id=owner_id, count=reward["count"]
+            )
+            for owner_id, reward in rewards.items()
+            if not reward["pk"]
+        ],
+        batch_size=chunk_size,
+    )
+    due = {
+        owner_id: reward["due"] for owner_id, reward in rewards.items() if reward["due"]
+    }
+    for owner in TaggUser.objects.filter(id__in=due.keys()):
+        for _ in range(due[owner.id]):
+            reward_widget_click_count(owner)
+    return rows
+
+
 def get_total_widget_view_count(user, filter_type):
     """
     To retrieve total clicks a given user has received
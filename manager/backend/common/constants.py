@@ -47,6 +47,18 @@ INVITE_FRIEND_RESET_DATE = "2021-05-01"
 NUM_MOMENT_RECOMMENDATAIONS = 100
 NUM_ENGAGED_MOMENTS = 15
 
+# Moment scores upserted per statement
+MOMENT_SCORES_BATCH_SIZE = 500
+
+# Daily moments
+DAILY_MOMENTS_PER_USER = 7
+DAILY_MOMENTS_USER_CHUNK = 500
+DAILY_MOMENTS_BATCH_SIZE = 1000
+
+# Discover feed, stored with slack so deleted moments don't shorten the page
+DISCOVER_FEED_LENGTH = 2 * NUM_MOMENT_RECOMMENDATAIONS
+DISCOVER_FEED_BATCH_SIZE = 1000
+
 # SMS
 SMS_WAITLIST_CONFIRMED = """
 Wassup? This is Tagg again! As you know, we support our creators as they grow their brand and reward them for creating! But in order to get these REWARDS✨ we need to chat with you directly. Tap the link to our personal cell and text “creator” to register for access to rewards!!
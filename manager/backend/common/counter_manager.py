@@ -0,0 +1,220 @@
+"""
+Write-behind counters: the live value of a counter is kept in the cache and
+flushed to its model column in periodic batches
+
+The queue of objects whose counter changed is kept in the cache as well, so
+any process can flush it: the flush_counters command does so every minute.
+"""
+
+import logging
+import time
+
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Greatest
+
+logger = logging.getLogger(__name__)
+
+_counters = []
+
+# a queued object whose slot was evicted is queued again after this long
+QUEUED_TIMEOUT = 60 * 60
+# a slot is taken before its pk is stored in it, a slot still empty after this
+# long lost its pk (evicted, or the process died) and is skipped
+QUEUE_GAP_TIMEOUT = 30
+FLUSH_LOCK_TIMEOUT = 60
+
+
+class WriteBehindCounter:
+    """A monotonically increasing counter per object
+
+    The cache holds the live value of every counter, seeded from the database
+    the first time it is touched. Objects whose counter changed are queued in
+    numbered cache slots and written to `model.field` by flush(), from the
+    flush_counters command or once `flush_size` objects were queued. Counters
+    without a model are never flushed, their seed is the source of truth.
+
+    Args:
+        name (str): Unique name, used to build cache keys
+        seed (callable): Returns the exact value of the counter for a pk
+        model (Model): Model holding the counter column, if any
+        field (str): Name of the counter column
+    """
+
+    def __init__(self, name, seed, model=None, field=None, flush_size=500):
+        self.name = name
+        self.seed = seed
+        self.model = model
+        self.field = field
+        self.flush_size = flush_size
+        _counters.append(self)
+
+    def _key(self, pk):
+        return f"counter:{self.name}:{pk}"
+
+    def _queue_key(self, suffix):
+        return f"counter:{self.name}:queue:{suffix}"
+
+    def get(self, pk):
+        """Returns the live value of the counter"""
+        value = cache.get(self._key(pk))
+        if value is None:
+            value = self.seed(pk)
+            cache.add(self._key(pk), value, timeout=None)
+        return value
+
+    def incr(self, pk, delta=1):
+        """Increments the counter and returns its new value"""
+        try:
+            value = cache.incr(self._key(pk), delta)
+        except ValueError:
+            # cold cache, seed from the database. add() is a no-op if another
+            # process seeded the key in the meantime
+            cache.add(self._key(pk), self.seed(pk), timeout=None)
+            value = cache.incr(self._key(pk), delta)
+
+        self._mark_dirty([pk])
+        return value
+
+    def incr_many(self, deltas):
+        """Increments many counters at once
+
+        Counters that aren't cached are not seeded, their column is
+        incremented in place instead, so callers recording the underlying rows
+        must insert them after this call, as with incr.
+
+        Args:
+            deltas (dict): {pk: delta}
+        """
+        keys = {self._key(pk): pk for pk in deltas}
+        cached = cache.get_many(keys)
+        incremented = []
+        uncached = {}
+        for key, pk in keys.items():
+            if key in cached:
+                try:
+                    cache.incr(key, deltas[pk])
+                    incremented.append(pk)
+                    continue
+                except ValueError:
+                    # evicted since get_many
+                    pass
+            uncached[pk] = deltas[pk]
+
+        if self.model is not None and uncached:
+            self.model.objects.filter(pk__in=uncached.keys()).update(
+                **{
+                    self.field: F(self.field)
+                    + Case(
+                        *[
+                            When(pk=pk, then=Value(delta))
+                            for pk, delta in uncached.items()
+                        ],
+                        output_field=IntegerField(),
+                    )
+                }
+            )
+        self._mark_dirty(incremented)
+
+    def _mark_dirty(self, pks):
+        """Queues the objects for the next flush, an object is queued once
+        until it is flushed"""
+        if self.model is None:
+            return
+        for pk in pks:
+            if not cache.add(self._queue_key(f"pk:{pk}"), 1, timeout=QUEUED_TIMEOUT):
+                continue
+            try:
+                slot = cache.incr(self._queue_key("head"))
+            except ValueError:
+                cache.add(self._queue_key("head"), 0, timeout=None)
+                slot = cache.incr(self._queue_key("head"))
+            cache.set(self._queue_key(slot), pk, timeout=QUEUED_TIMEOUT)
+            if slot % self.flush_size == 0:
+                self.flush()
+
+    def flush(self):
+        """Writes the live value of every queued counter to the database
+
+        Only one process flushes a counter at a time, the others return
+        right away.
+
+        Returns:
+            Number of rows updated
+        """
+        lock = self._queue_key("lock")
+        if not cache.add(lock, 1, timeout=FLUSH_LOCK_TIMEOUT):
+            return 0
+        updated = 0
+        try:
+            head = cache.get(self._queue_key("head"), 0)
+            tail = cache.get(self._queue_key("tail"), 0)
+            if head < tail:
+                # the head was evicted and restarted from 0
+                tail = 0
+            while tail < head:
+                end = min(tail + self.flush_size, head)
+                slots = [self._queue_key(slot) for slot in range(tail + 1, end + 1)]
+                queued = cache.get_many(slots)
+                # the tail only moves past filled slots, a slot may be taken
+                # while its pk is still on the way
+                filled = next(
+                    (i for i, slot in enumerate(slots) if slot not in queued),
+                    len(slots),
+                )
+                if not filled:
+                    if not self._skip_lost_slot(tail + 1):
+                        break
+                    filled = 1
+                slots = slots[:filled]
+                pks = {queued[slot] for slot in slots if slot in queued}
+                # unqueued before their values are read, so that increments
+                # from here on are queued again
+                cache.delete_many([self._queue_key(f"pk:{pk}") for pk in pks])
+                updated += self._write(pks)
+                cache.delete_many(slots)
+                tail += filled
+                cache.set(self._queue_key("tail"), tail, timeout=None)
+        except Exception:
+            # the slots stay queued, the next flush retries them
+            logger.exception(f"Failed to flush {self.name} counters")
+        finally:
+            cache.delete(lock)
+        return updated
+
+    def _skip_lost_slot(self, slot):
+        """Whether an empty slot stayed empty for QUEUE_GAP_TIMEOUT, its pk is
+        queued again once its marker expires"""
+        gap = self._queue_key(f"gap:{slot}")
+        empty_since = cache.get_or_set(gap, time.time(), timeout=QUEUED_TIMEOUT)
+        if time.time() - empty_since < QUEUE_GAP_TIMEOUT:
+            return False
+        cache.delete(gap)
+        return True
+
+    def _write(self, pks):
+        keys = {self._key(pk): pk for pk in pks}
+        values = {keys[key]: value for key, value in cache.get_many(keys).items()}
+        if not values:
+            return 0
+
+        # Greatest keeps the column monotonic if a flush writes a stale value
+        return self.model.objects.filter(pk__in=values.keys()).update(
+            **{
+                self.field: Greatest(
+                    F(self.field),
+                    Case(
+                        *[
+                            When(pk=pk, then=Value(value))
+                            for pk, value in values.items()
+                        ],
+                        output_field=IntegerField(),
+                    ),
+                )
+            }
+        )
+
+
+def flush_all_counters():
+    """Flushes every counter, returns the number of rows updated"""
+    return sum(counter.flush() for counter in _counters if counter.model is not None)
@@ -0,0 +1,457 @@
+"""
+In-memory index of the friendship graph: every user's friends as a sorted
+array of ordinals, shared between processes through the cache along with the
+changes made to it since
+"""
+
+import logging
+import pickle
+import threading
+import time
+import uuid
+import zlib
+from array import array
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+FRIEND_GRAPH_VERSION_KEY = "friend_graph:version"
+# version of the latest graph cached in full
+FRIEND_GRAPH_BASE_KEY = "friend_graph:base"
+# how long a process trusts its graph before checking the cached version
+FRIEND_GRAPH_VERSION_CHECK = 1
+FRIEND_GRAPH_CACHE_TIMEOUT = 60 * 60 * 24
+# memcached refuses values over 1MB
+FRIEND_GRAPH_CHUNK_SIZE = 1000 * 1000
+# held by the one process rebuilding a version of the graph
+FRIEND_GRAPH_REBUILD_LOCK_TIMEOUT = 60
+# processes without a graph wait this long for the rebuilding one
+FRIEND_GRAPH_REBUILD_WAIT = 10
+FRIEND_GRAPH_REBUILD_POLL = 0.1
+# a process further behind than this many changes reloads the graph in full
+FRIEND_GRAPH_MAX_CHANGES = 1000
+# a version is taken before its change is cached, a change still missing after
+# this long was lost and the graph is reloaded in full
+FRIEND_GRAPH_CHANGE_WAIT = 5
+
+
+def _user_id(user):
+    """Accepts a TaggUser, a UUID or its string form"""
+    if hasattr(user, "pk"):
+        return user.pk
+    if isinstance(user, uuid.UUID):
+        return user
+    return uuid.UUID(str(user))
+
+
+class FriendGraph:
+    """Adjacency of the friendship graph in compressed sparse row form
+
+    Users with at least one friend get an ordinal, the friends of ordinal i
+    are neighbors[offsets[i]:offsets[i + 1]], sorted. Users without friends
+    have no ordinal. Rows changed since the arrays were built are held in
+    rows, see with_changes.
+
+    Args:
+        ids (list): UUID of every ordinal
+        offsets (array): Row offsets into neighbors
+        neighbors (array): Friend ordinals, two per friendship
+        rows (dict): {ordinal: sorted array of friend ordinals} overriding
+            the rows of the arrays
+        ordinals (dict): {UUID: ordinal}, built from ids if None
+    """
+
+    def __init__(self, ids, offsets, neighbors, rows=None, ordinals=None):
+        self.ids = ids
+        if ordinals is None:
+            ordinals = {user_id: ordinal for ordinal, user_id in enumerate(ids)}
+        self.ordinals = ordinals
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.rows = rows or {}
+        self._view = memoryview(neighbors)
+
+    @classmethod
+    def from_edges(cls, edges):
+        """Builds the graph from (requester_id, requested_id) pairs"""
+        ordinals = {}
+        rows = defaultdict(list)
+        for a, b in edges:
+            a = ordinals.setdefault(a, len(ordinals))
+            b = ordinals.setdefault(b, len(ordinals))
+            rows[a].append(b)
+            rows[b].append(a)
+
+        offsets = array("I", [0])
+        neighbors = array("I")
+        for ordinal in range(len(ordinals)):
+            # a friendship recorded in both directions counts once
+            neighbors.extend(sorted(set(rows[ordinal])))
+            offsets.append(len(neighbors))
+        return cls(list(ordinals), offsets, neighbors)
+
+    @classmethod
+    def from_database(cls):
+        from ..friends.models import Friends, FriendshipStatusType
+
+        return cls.from_edges(
+            Friends.objects.filter(status=FriendshipStatusType.FRIENDS)
+            .values_list("requester_id", "requested_id")
+            .iterator()
+        )
+
+    def dumps(self):
+        return zlib.compress(
+            pickle.dumps(
+                (
+                    b"".join(user_id.bytes for user_id in self.ids),
+                    self.offsets.tobytes(),
+                    self.neighbors.tobytes(),
+                ),
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        )
+
+    @classmethod
+    def loads(cls, data):
+        ids, offsets, neighbors = pickle.loads(zlib.decompress(data))
+        offsets_array = array("I")
+        offsets_array.frombytes(offsets)
+        neighbors_array = array("I")
+        neighbors_array.frombytes(neighbors)
+        return cls(
+            [uuid.UUID(bytes=ids[i : i + 16]) for i in range(0, len(ids), 16)],
+            offsets_array,
+            neighbors_array,
+        )
+
+    def with_changes(self, changes):
+        """Returns the graph with friendships set or unset
+
+        The new graph shares the arrays of this one, only the changed rows
+        are copied. New users are given an ordinal in the ids and ordinals
+        both graphs share, this graph has no row for them.
+
+        Args:
+            changes (list): (user1_id, user2_id, whether they are friends)
+        """
+        rows = {}
+        for user1, user2, friends in changes:
+            if not friends and (
+                user1 not in self.ordinals or user2 not in self.ordinals
+            ):
+                continue
+            for user_id in (user1, user2):
+                if user_id not in self.ordinals:
+                    self.ordinals[user_id] = len(self.ids)
+                    self.ids.append(user_id)
+            a, b = self.ordinals[user1], self.ordinals[user2]
+            for ordinal, friend in ((a, b), (b, a)):
+                row = rows.get(ordinal)
+                if row is None:
+                    row = rows[ordinal] = set(self._ordinal_row(ordinal))
+                if friends:
+                    row.add(friend)
+                else:
+                    row.discard(friend)
+
+        changed = dict(self.rows)
+        changed.update(
+            {ordinal: array("I", sorted(row)) for ordinal, row in rows.items()}
+        )
+        return FriendGraph(
+            self.ids, self.offsets, self.neighbors, changed, self.ordinals
+        )
+
+    def _ordinal_row(self, ordinal):
+        row = self.rows.get(ordinal)
+        if row is not None:
+            return row
+        if ordinal >= len(self.offsets) - 1:
+            # a user who got an ordinal after the arrays were built
+            return self._view[0:0]
+        return self._view[self.offsets[ordinal] : self.offsets[ordinal + 1]]
+
+    def _row(self, user):
+        ordinal = self.ordinals.get(_user_id(user))
+        if ordinal is None:
+            return self._view[0:0]
+        return self._ordinal_row(ordinal)
+
+    def friend_ids(self, user):
+        """Returns the ids of the user's friends"""
+        return [self.ids[ordinal] for ordinal in self._row(user)]
+
+    def friend_count(self, user):
+        return len(self._row(user))
+
+    def mutual_friend_ids(self, user1, user2):
+        """Returns the ids of the friends both users have in common"""
+        row1, row2 = self._row(user1), self._row(user2)
+        if len(row1) > len(row2):
+            row1, row2 = row2, row1
+        if not row1:
+            return []
+        return [self.ids[ordinal] for ordinal in set(row1).intersection(row2)]
+
+    def mutual_friend_count(self, user1, user2):
+        row1, row2 = self._row(user1), self._row(user2)
+        if len(row1) > len(row2):
+            row1, row2 = row2, row1
+        if not row1:
+            return 0
+        return len(set(row1).intersection(row2))
+
+    def mutual_friend_counts(self, user):
+        """Returns {user_id: number of mutual friends} for every other user
+        sharing a friend with the user, the user's row of the squared
+        adjacency matrix"""
+        counts = Counter()
+        for friend in self._row(user):
+            counts.update(self._ordinal_row(friend))
+        counts.pop(self.ordinals.get(_user_id(user)), None)
+        return {self.ids[ordinal]: count for ordinal, count in counts.items()}
+
+    def are_friends(self, user1, user2):
+        row = self._row(user1)
+        ordinal = self.ordinals.get(_user_id(user2))
+        if ordinal is None or not row:
+            return False
+        # binary search of the sorted row
+        low, high = 0, len(row)
+        while low < high:
+            middle = (low + high) // 2
+            if row[middle] < ordinal:
+                low = middle + 1
+            else:
+                high = middle
+        return low < len(row) and row[low] == ordinal
+
+
+class FriendGraphIndex:
+    """Process-local copy of the friend graph, kept in step with the cache
+
+    The cache holds a version number, bumped on every change to a friendship
+    along with the change itself, and the serialized graph of a base version.
+    A process checks the version at most every FRIEND_GRAPH_VERSION_CHECK
+    seconds and applies the changes it missed to its graph. A process without
+    a graph loads the base graph and the changes since. When the changes
+    can't be followed, the graph of the current version is rebuilt from the
+    database by the one process taking its rebuild lock, while the others keep
+    serving their stale graph, or wait for it if they have none.
+    """
+
+    def __init__(self):
+        self._graph = None
+        self._version = None
+        self._checked = 0
+        # (version, since) of a change that wasn't cached yet
+        self._missing_change = None
+        self._lock = threading.Lock()
+
+    def _current_version(self):
+        version = cache.get(FRIEND_GRAPH_VERSION_KEY)
+        if version is None:
+            # a clock based seed never goes back to a version that was
+            # already used if the key gets evicted
+            cache.add(FRIEND_GRAPH_VERSION_KEY, int(time.time() * 1000), timeout=None)
+            version = cache.get(FRIEND_GRAPH_VERSION_KEY)
+        return version
+
+    def _cached(self, key):
+        chunks = cache.get(key)
+        if chunks is None:
+            return None
+        keys = [f"{key}:{i}" for i in range(chunks)]
+        values = cache.get_many(keys)
+        if len(values) != chunks:
+            return None
+        try:
+            return FriendGraph.loads(b"".join(values[k] for k in keys))
+        except Exception:
+            logger.exception("Failed to load the cached friend graph")
+            return None
+
+    def _follow(self, graph, graph_version, version):
+        """Applies the cached changes after graph_version up to version
+
+        Returns:
+            (graph, version it reached), None if the changes can't be followed
+        """
+        if not graph_version < version <= graph_version + FRIEND_GRAPH_MAX_CHANGES:
+            return None
+        keys = [
+            f"friend_graph:change:{v}" for v in range(graph_version + 1, version + 1)
+        ]
+        cached = cache.get_many(keys)
+        changes = []
+        for key in keys:
+            if key not in cached:
+                break
+            changes.append(cached[key])
+
+        reached = graph_version + len(changes)
+        if reached < version:
+            # the change may still be on its way, stop before it for now
+            missing = reached + 1
+            if self._missing_change is None or self._missing_change[0] != missing:
+                self._missing_change = (missing, time.monotonic())
+            if time.monotonic() - self._missing_change[1] >= FRIEND_GRAPH_CHANGE_WAIT:
+                return None
+        else:
+            self._missing_change = None
+        if changes:
+            graph = graph.with_changes(changes)
+        return graph, reached
+
+    def _load(self, version, stale=None):
+        """Returns (graph, version) of the base graph brought up to the given
+        version, or of the given version rebuilt from the database
+
+        The stale graph is returned with a None version while another process
+        rebuilds the graph.
+        """
+        base = cache.get(FRIEND_GRAPH_BASE_KEY)
+        if base is not None and base <= version:
+            graph = self._cached(f"friend_graph:{base}")
+            if graph is not None and base == version:
+                return graph, version
+            if graph is not None:
+                followed = self._follow(graph, base, version)
+                if followed is not None:
+                    return followed
+
+        key = f"friend_graph:{version}"
+        graph = self._cached(key)
+        if graph is not None:
+            return graph, version
+
+        lock = f"{key}:lock"
+        deadline = time.monotonic() + FRIEND_GRAPH_REBUILD_WAIT
+        locked = cache.add(lock, 1, timeout=FRIEND_GRAPH_REBUILD_LOCK_TIMEOUT)
+        while not locked:
+            if stale is not None:
+                return stale, None
+            if time.monotonic() >= deadline:
+                # the rebuilding process is slow or gone, don't wait forever
+                break
+            time.sleep(FRIEND_GRAPH_REBUILD_POLL)
+            graph = self._cached(key)
+            if graph is not None:
+                return graph, version
+            locked = cache.add(lock, 1, timeout=FRIEND_GRAPH_REBUILD_LOCK_TIMEOUT)
+
+        try:
+            # cached while this process waited for the lock
+            graph = self._cached(key)
+            if graph is not None:
+                return graph, version
+            graph = FriendGraph.from_database()
+            data = graph.dumps()
+            chunks = range(0, len(data), FRIEND_GRAPH_CHUNK_SIZE)
+            cache.set_many(
+                {
+                    f"{key}:{i}": data[offset : offset + FRIEND_GRAPH_CHUNK_SIZE]
+                    for i, offset in enumerate(chunks)
+                },
+                timeout=FRIEND_GRAPH_CACHE_TIMEOUT,
+            )
+            cache.set(key, len(chunks), timeout=FRIEND_GRAPH_CACHE_TIMEOUT)
+            cache.set(
+                FRIEND_GRAPH_BASE_KEY, version, timeout=FRIEND_GRAPH_CACHE_TIMEOUT
+            )
+            return graph, version
+        finally:
+            if locked:
+                cache.delete(lock)
+
+    def get(self):
+        """Returns the current FriendGraph"""
+        graph = self._graph
+        if graph is not None and time.monotonic() - self._checked < (
+            FRIEND_GRAPH_VERSION_CHECK
+        ):
+            return graph
+
+        with self._lock:
+            version = self._current_version()
+            if self._graph is None or self._version != version:
+                followed = None
+                if self._graph is not None and self._version is not None:
+                    followed = self._follow(self._graph, self._version, version)
+                if followed is None:
+                    followed = self._load(version, stale=self._graph)
+                self._graph, self._version = followed
+            self._checked = time.monotonic()
+            return self._graph
+
+    def record_change(self, user1, user2):
+        """Publishes the friendship of two users as it is in the database, as
+        the change of a new version"""
+        from ..friends.models import Friends, FriendshipStatusType
+
+        user1, user2 = _user_id(user1), _user_id(user2)
+        # a friendship may be recorded in both directions
+        friends = Friends.objects.filter(
+            Q(requester=user1, requested=user2) | Q(requester=user2, requested=user1),
+            status=FriendshipStatusType.FRIENDS,
+        ).exists()
+        try:
+            version = cache.incr(FRIEND_GRAPH_VERSION_KEY)
+        except ValueError:
+            # the version was evicted, every process reloads the graph
+            self._current_version()
+        else:
+            cache.set(
+                f"friend_graph:change:{version}",
+                (user1, user2, friends),
+                timeout=FRIEND_GRAPH_CACHE_TIMEOUT,
+            )
+        with self._lock:
+            self._checked = 0
+
+    def invalidate(self):
+        """Bumps the cached version without a change, so that every process
+        reloads the graph"""
+        try:
+            cache.incr(FRIEND_GRAPH_VERSION_KEY)
+        except ValueError:
+            cache.add(FRIEND_GRAPH_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        cache.delete(FRIEND_GRAPH_BASE_KEY)
+        with self._lock:
+            self._version = None
+            self._checked = 0
+
+
+friend_graph = FriendGraphIndex()
+
+
+def friend_ids(user):
+    return friend_graph.get().friend_ids(user)
+
+
+def friend_count(user):
+    return friend_graph.get().friend_count(user)
+
+
+def mutual_friend_ids(user1, user2):
+    return friend_graph.get().mutual_friend_ids(user1, user2)
+
+
+def mutual_friend_count(user1, user2):
+    return friend_graph.get().mutual_friend_count(user1, user2)
+
+
+def are_friends(user1, user2):
+    return friend_graph.get().are_friends(user1, user2)
+
+
+def record_friendship_change(user1, user2):
+    friend_graph.record_change(user1, user2)
+
+
+def invalidate_friend_graph():
+    friend_graph.invalidate()
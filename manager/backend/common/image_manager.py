@@ -1,5 +1,7 @@
-import asyncio
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
 
 from ..skins.models import Skin, TemplateType
 from ..common import hash_manager
@@ -7,6 +9,7 @@ import os
 from collections import defaultdict
 
 import boto3
+from botocore.config import Config
 from django.conf import settings
 from PIL import Image
 
@@ -16,6 +19,32 @@ logger = logging.getLogger(__name__)
 
 THUMBNAIL_SIZE = (120, 120)
 
+# Uploads are I/O bound, decoding, resizing and encoding are CPU bound and
+# Pillow releases the GIL while doing them, so both run on thread pools
+IMAGE_UPLOAD_WORKERS = 16
+IMAGE_ENCODE_WORKERS = os.cpu_count() or 2
+
+_upload_pool = ThreadPoolExecutor(
+    max_workers=IMAGE_UPLOAD_WORKERS, thread_name_prefix="image-upload"
+)
+_encode_pool = ThreadPoolExecutor(
+    max_workers=IMAGE_ENCODE_WORKERS, thread_name_prefix="image-encode"
+)
+
+_s3_client = None
+_s3_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """Returns the S3 client shared by every upload, boto3 clients are thread safe"""
+    global _s3_client
+    with _s3_client_lock:
+        if _s3_client is None:
+            _s3_client = boto3.client(
+                "s3", config=Config(max_pool_connections=IMAGE_UPLOAD_WORKERS)
+            )
+    return _s3_client
+
 
 def upload_to_s3(bucket_name, bucket_file_path, file_path):
     """Uploads a file to an S3 bucket using boto3
@@ -29,8 +58,28 @@ def upload_to_s3(bucket_name, bucket_file_path, file_path):
         bool: True if upload was succesful, False otherwise
     """
     try:
-        s3 = boto3.resource("s3")
-        s3.Object(bucket_name, bucket_file_path).upload_file(Filename=file_path)
+        get_s3_client().upload_file(file_path, bucket_name, bucket_file_path)
+        return True
+    except Exception:
+        logging.exception("Problem uploading to S3")
+        return False
+
+
+def upload_bytes_to_s3(bucket_name, bucket_file_path, content):
+    """Uploads in-memory content to an S3 bucket
+
+    Args:
+        bucket_name (str): Name of S3 bucket
+        bucket_file_path (str): Path to file in the bucket, including file name
+        content (bytes): File content
+
+    Returns:
+        bool: True if upload was succesful, False otherwise
+    """
+    try:
+        get_s3_client().put_object(
+            Bucket=bucket_name, Key=bucket_file_path, Body=content
+        )
         return True
     except Exception:
         logging.exception("Problem uploading to S3")
@@ -39,65 +88,121 @@ def upload_to_s3(bucket_name, bucket_file_path, file_path):
 
 def remove_from_s3(filepath):
     try:
-        s3 = boto3.resource("s3")
-        s3.Object(settings.S3_BUCKET, filepath).delete()
+        get_s3_client().delete_object(Bucket=settings.S3_BUCKET, Key=filepath)
         return True
     except Exception as error:
         logging.exception(error)
         return False
 
 
+def thumbnail_filename(filename):
+    filename, ext = os.path.splitext(filename)
+    return "thumbnails/" + filename + "-thumbnail.jpg"
+
+
+def image_format(image_name):
+    """Format an image is stored in, JPEG unless image_name has an extension"""
+    if image_name == "tmp_im":
+        return "JPEG"
+    ext = os.path.splitext(image_name)[1].lower()
+    if ext not in Image.registered_extensions():
+        raise ValueError(f"unknown file extension: {ext}")
+    return Image.registered_extensions()[ext]
+
+
+def _encode(image, format):
+    buffer = BytesIO()
+    image.save(buffer, format=format)
+    return buffer.getvalue()
+
+
+def encode_image(image, image_name="tmp_im", upload_thumbnail=False):
+    """Encodes an image, and its thumbnail, the way they are stored on S3
+
+    Tested for PNG, JPG, JPEG and HEIC image formats
+
+    Args:
+        image (Image): The image object
+        image_name (str): Name of the image, its extension decides the format
+        upload_thumbnail (boolean): Whether to encode a thumbnail too
+
+    Returns:
+        (bytes, bytes) the image and the thumbnail, None if not requested
+    """
+    format = image_format(image_name)
+    image = image.convert("RGB")
+    encoded = _encode(image, format)
+
+    thumbnail = None
+    if upload_thumbnail:
+        if image.width < image.height:
+            box_width = image.width
+            box = (0, image.height / 2 - (box_width / 2), box_width, box_width)
+        else:
+            box_width = image.height
+            box = (image.width / 2 - (box_width / 2), 0, box_width, box_width)
+        thumbnail = _encode(image.resize(THUMBNAIL_SIZE, box=box), format)
+    return encoded, thumbnail
+
+
+def _submit_uploads(filename, encoded, thumbnail=None):
+    uploads = [(filename, encoded)]
+    if thumbnail is not None:
+        uploads.append((thumbnail_filename(filename), thumbnail))
+    return [
+        _upload_pool.submit(upload_bytes_to_s3, settings.S3_BUCKET, key, content)
+        for key, content in uploads
+    ]
+
+
+def upload_encoded_image(filename, encoded, thumbnail=None):
+    """Uploads an encoded image and its thumbnail concurrently
+
+    Raises:
+        ImageUploadException: If either upload fails
+    """
+    futures = _submit_uploads(filename, encoded, thumbnail)
+    if not all([future.result() for future in futures]):
+        raise ImageUploadException("An upload error has occurred")
+
+
 def upload_image(image, filename, image_name="tmp_im", upload_thumbnail=False):
     """Uploads image to cloud
     Args:
         image (Image): The image object
         filename (str): Filename of the image
+        image_name (str): Name of the image, its extension decides the format
         upload_thumbnail (boolean): Whether to upload a thumbnail for the image or not
 
     Raises:
         ImageUploadException: If fails to upload, reason in message
     """
-    # If image name is not passed in then use tmp_im as the name
-    # When trying to use multiple threads to save different images, we cannot use the same image name and hence had to bring in the image_name field
-    # If image name is not passed in then use tmp_im as the name
-    # When trying to use multiple threads to save different images, we cannot use the same image name and hence had to bring in the image_name field
-    # Tested for PNG, JPG, JPEG and HEIC image formats
+    upload_encoded_image(filename, *encode_image(image, image_name, upload_thumbnail))
 
-    try:
-        image = image.convert("RGB")
-        if image_name == "tmp_im":
-            image.save(image_name, format="JPEG")
-        else:
-            image.save(image_name)
 
-        if not upload_to_s3(settings.S3_BUCKET, filename, image_name):
-            raise ImageUploadException("An upload error has occurred")
-
-        if upload_thumbnail:
-            filename, ext = os.path.splitext(filename)
-            filename = "thumbnails/" + filename + "-thumbnail.jpg"
-            if image.width < image.height:
-                box_width = image.width
-                box = (0, image.height / 2 - (box_width / 2), box_width, box_width)
-            else:
-                box_width = image.height
-                box = (image.width / 2 - (box_width / 2), 0, box_width, box_width)
-            image = image.resize(THUMBNAIL_SIZE, box=box)
+def _open_and_encode(image_content, upload_thumbnail):
+    image = Image.open(image_content)
+    return encode_image(image, image_content.name, upload_thumbnail)
 
-            if image_name == "tmp_im":
-                image.save(image_name, format="JPEG")
-            else:
-                image.save(image_name)
 
-            if not upload_to_s3(settings.S3_BUCKET, filename, image_name):
-                raise ImageUploadException("An upload error has occurred")
-    finally:
-        os.remove(image_name)
-    return
+def _upload_failure(err):
+    """Logs why an image failed and returns its upload status"""
+    if isinstance(err, IllegalImageException):
+        logging.error("Illegal Image", exc_info=err)
+        return exception_response[IllegalImageException]
+    if isinstance(err, ImageUploadException):
+        logging.error("Image upload exception", exc_info=err)
+        return exception_response[ImageUploadException]
+    logging.error("Some problem uploading the image", exc_info=err)
+    return exception_response["default"]
 
 
 def upload_images_async(data, upload_thumbnail=False):
-    """Uploads image to cloud asynchronously
+    """Uploads images to cloud concurrently
+
+    Images are decoded and encoded on the encode pool, and each one is
+    uploaded, along with its thumbnail, on the upload pool as soon as it is
+    encoded. Failure to upload one image does not affect another.
 
     Args: (A list of lists with the following as expected values for each list)
         image_name (str) : The image name
@@ -109,52 +214,36 @@ def upload_images_async(data, upload_thumbnail=False):
     """
     image_upload_status = defaultdict(lambda: "Failed")
     try:
-
-        queue = (upload_image_helper(d, upload_thumbnail) for d in data)
-
-        image_upload_status = dict(asyncio.run(async_requests(*queue)))
+        encodes = {
+            _encode_pool.submit(_open_and_encode, image_content, upload_thumbnail): (
+                image_name,
+                filename,
+            )
+            for image_name, image_content, filename in data
+        }
+        statuses = {}
+        uploads = {}
+        for future in as_completed(encodes):
+            image_name, filename = encodes[future]
+            try:
+                uploads[image_name] = _submit_uploads(filename, *future.result())
+            except Exception as err:
+                statuses[image_name] = _upload_failure(err)
+
+        for image_name, futures in uploads.items():
+            if all([future.result() for future in futures]):
+                statuses[image_name] = "Success"
+            else:
+                statuses[image_name] = _upload_failure(
+                    ImageUploadException("An upload error has occurred")
+                )
+        image_upload_status = statuses
     except Exception:
         logging.exception("Problem uploading to S3")
     finally:
         return image_upload_status
 
 
-async def async_requests(*args):
-    return await asyncio.gather(*args)
-
-
-async def upload_image_helper(data, upload_thumbnail=False):
-    """Helper that provides an abstraction to the actual upload_image method
-
-    Args: (A list of arguments with the following as expected values)
-       image_name (str) : The image name
-       image (Image): The image object
-       filename (str): Folder structure to be followed on S3
-
-    Returns:
-       Image name with upload status
-    """
-    image_name, image_content, filename = data
-    try:
-        image = Image.open(image_content)
-        upload_image(
-            image=image,
-            filename=filename,
-            image_name=image_content.name,
-            upload_thumbnail=upload_thumbnail,
-        )
-        return image_name, "Success"
-    except IllegalImageException:
-        logging.exception("Illegal Image")
-        return image_name, exception_response[IllegalImageException]
-    except ImageUploadException:
-        logging.exception("Image upload exception")
-        return image_name, exception_response[ImageUploadException]
-    except Exception as err:
-        logging.exception("Some problem uploading the image")
-        return image_name, exception_response["default"]
-
-
 def generate_s3_image_filepaths(images, prepath):
     """Generate s3 filepaths for a given list of image object.
     * E.g. s3://bucket/folder/hash
@@ -198,12 +287,13 @@ def profile_pic_url(resource_id):
     return f"https://{settings.S3_BUCKET}.{settings.S3_PRE_OBJECT_URI}/{settings.S3_SMALL_PROFILE_PIC_FOLDER}/spp-{resource_id}.jpeg"
 
 
-def profile_thumbnail_url(resource_id):
+def profile_thumbnail_url(resource_id, active_skin=None):
     """
     https://tagg-dev.s3.us-east-2.amazonaws.com/thumbnails/smallProfilePicture/{resource_id}-thumbnail.jpg
     """
     # logger.info("Trying to get skin for user: {}".format(resource_id))
-    active_skin = Skin.objects.filter(owner__id=resource_id, active=True).first()
+    if active_skin is None:
+        active_skin = Skin.objects.filter(owner__id=resource_id, active=True).first()
     if active_skin:
         subfolder = f"{settings.S3_LARGE_PROFILE_PIC_FOLDER if active_skin.template_type == TemplateType.THREE else settings.S3_SMALL_PROFILE_PIC_FOLDER}"
         filename_prefix = (
@@ -217,6 +307,24 @@ def profile_thumbnail_url(resource_id):
     return f"https://{settings.S3_BUCKET}.{settings.S3_PRE_OBJECT_URI}/{settings.S3_THUMBNAILS_FOLDER}/{subfolder}/{filename_prefix}-{resource_id}-thumbnail.jpg"
 
 
+def profile_thumbnail_urls(resource_ids):
+    """
+    Batched profile_thumbnail_url, returns {resource_id: url} using a single
+    Skin query
+    """
+    active_skins = {}
+    for skin in Skin.objects.filter(owner__in=resource_ids, active=True).order_by(
+        "pk"
+    ):
+        active_skins.setdefault(skin.owner_id, skin)
+    return {
+        resource_id: profile_thumbnail_url(
+            resource_id, active_skins.get(resource_id, False)
+        )
+        for resource_id in resource_ids
+    }
+
+
 def header_pic_url(resource_id):
     """
     https://tagg-dev.s3.us-east-2.amazonaws.com/largeProfilePicture/{resource_id}-thumbnail.jpg
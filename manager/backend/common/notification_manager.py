@@ -3,16 +3,44 @@
 """
 
 
-from ..notifications.models import Notification, NotificationList, NotificationType
+from ..notifications.models import (
+    DismissedBroadcast,
+    Notification,
+    NotificationDigest,
+    NotificationList,
+    NotificationType,
+    UnreadNotificationCount,
+)
 from firebase_admin.messaging import Message
 # from firebase_admin.messaging import Notification as Firebase_notification
 from fcm_django.models import FCMDevice
-from ..models import TaggUser
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, DateTimeField, F, IntegerField, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from ..models import TaggUser, TaggUserMeta
+from .push_manager import enqueue_push
+from .utils import iter_chunks
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Notifications older than this are not counted as unread
+UNREAD_NOTIFICATIONS_WINDOW = timedelta(days=7)
+UNREAD_COUNTS_BATCH_SIZE = 1000
+
+# High volume notifications, folded into a single digest per receiver and type
+# for NOTIFICATION_DIGEST_WINDOW seconds
+DIGEST_NOTIFICATION_TYPES = {
+    NotificationType.PROFILE_VIEW,
+    NotificationType.CLICK_TAG,
+    NotificationType.MOMENT_VIEW,
+}
+DIGEST_VERBAGE = "{verbage} (x{count})"
+
 notifications_with_titles = {
     NotificationType.FRIEND_REQUEST,
     NotificationType.FRIEND_ACCEPTANCE,
@@ -31,6 +59,9 @@ def handle_bulk_notification(
     notification_type, actor, verbage, notification_object=None
 ):
     """notify all active users
+
+    The notification is stored once as a broadcast, listed at read time for
+    every user who joined before it, see broadcast_notifications.
     Args:
         notification_type: Type of the notification
         actor: Tagg User responsible for the notification, to be excluded from bulk notification
@@ -64,14 +95,11 @@ def handle_bulk_notification(
             notification_type=notification_type,
             notification_object=get_notification_id(),
             object=notification_object,
+            broadcast=True,
         )
-        notification.save()
-
-        for userB in TaggUser.objects.all().exclude(username=actor.username):
-            notification_list = NotificationList(user=userB, notification=notification)
-            notification_list.save()
-
-        notify_all_users(verbage, actor, title)
+        with transaction.atomic():
+            notification.save()
+            notify_all_users(verbage, actor, title)
         return True
     except NotifyNotificationException as e:
         logger.error("Failed to send notification")
@@ -80,6 +108,214 @@ def handle_bulk_notification(
     return False
 
 
+def broadcast_notifications(user):
+    """Broadcast notifications listed for the user
+
+    Broadcasts sent before the user joined, sent by the user, or dismissed by
+    the user are left out, as they would have had no NotificationList row.
+    """
+    return (
+        Notification.objects.filter(broadcast=True, timestamp__gte=user.date_joined)
+        .exclude(actor=user)
+        .exclude(dismissedbroadcast__user=user)
+    )
+
+
+def user_notifications(user):
+    """Personal and broadcast notifications of the user, most recent first
+
+    Every notification is annotated with list_id, the id of its
+    NotificationList row, None for broadcasts.
+    """
+    personal = Notification.objects.filter(notificationlist__user=user).annotate(
+        list_id=F("notificationlist__id")
+    )
+    broadcasts = broadcast_notifications(user).annotate(
+        list_id=Value(None, output_field=IntegerField())
+    )
+    return personal.union(broadcasts, all=True).order_by("-timestamp")
+
+
+def increment_unread_count(user, notification_type):
+    """Counts a new personal notification as unread
+
+    The counter is created or incremented by a single INSERT ... ON CONFLICT
+    DO UPDATE, so concurrent notifications are not lost.
+    """
+    table = connection.ops.quote_name(UnreadNotificationCount._meta.db_table)
+    user_field, type_field, count_field = [
+        UnreadNotificationCount._meta.get_field(name)
+        for name in ["user", "notification_type", "count"]
+    ]
+    user_column, type_column, count_column = [
+        connection.ops.quote_name(field.column)
+        for field in [user_field, type_field, count_field]
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({user_column}, {type_column}, {count_column}) "
+            f"VALUES (%s, %s, 1) "
+            f"ON CONFLICT ({user_column}, {type_column}) "
+            f"DO UPDATE SET {count_column} = {table}.{count_column} + 1",
+            [user_field.get_db_prep_save(user.pk, connection), notification_type],
+        )
+
+
+def get_unread_counts(user):
+    """
+    Returns:
+        {notification_type: count}, types without unread notifications are left out
+    """
+    return dict(
+        UnreadNotificationCount.objects.filter(user=user, count__gt=0).values_list(
+            "notification_type", "count"
+        )
+    )
+
+
+def clear_unread_counts(user):
+    UnreadNotificationCount.objects.filter(user=user).update(count=0)
+
+
+def get_badge_count(user):
+    """Unread personal notifications plus broadcasts since the user's last visit"""
+    return sum(get_unread_counts(user).values()) + (
+        broadcast_notifications(user)
+        .filter(timestamp__gt=user.taggusermeta.last_seen_notifications)
+        .count()
+    )
+
+
+def reconcile_unread_counts(user_ids=None):
+    """Rebuilds unread counters from the notification lists
+
+    Notifications count as unread if they are newer than the user's last
+    visit and than UNREAD_NOTIFICATIONS_WINDOW, which counters incremented
+    since then may not account for.
+
+    Args:
+        user_ids: Users to reconcile, every user if None
+
+    Returns:
+        Number of counters that were off
+    """
+    if user_ids is None:
+        user_ids = TaggUser.objects.values_list("id", flat=True).iterator()
+    window_start = timezone.now() - UNREAD_NOTIFICATIONS_WINDOW
+
+    fixed = 0
+    for chunk in iter_chunks(user_ids, UNREAD_COUNTS_BATCH_SIZE):
+        expected = {
+            (row["user_id"], row["notification__notification_type"]): row["count"]
+            for row in NotificationList.objects.filter(user_id__in=chunk)
+            .annotate(
+                since=Greatest(
+                    F("user__taggusermeta__last_seen_notifications"),
+                    Value(window_start, output_field=DateTimeField()),
+                )
+            )
+            .filter(notification__timestamp__gt=F("since"))
+            .values("user_id", "notification__notification_type")
+            .annotate(count=Count("id"))
+        }
+        counters = {
+            (counter.user_id, counter.notification_type): counter
+            for counter in UnreadNotificationCount.objects.filter(user_id__in=chunk)
+        }
+
+        stale = []
+        for key, counter in counters.items():
+            count = expected.get(key, 0)
+            if counter.count != count:
+                counter.count = count
+                stale.append(counter)
+        missing = [
+            UnreadNotificationCount(
+                user_id=user_id, notification_type=notification_type, count=count
+            )
+            for (user_id, notification_type), count in expected.items()
+            if (user_id, notification_type) not in counters
+        ]
+        UnreadNotificationCount.objects.bulk_update(stale, ["count"])
+        UnreadNotificationCount.objects.bulk_create(missing, ignore_conflicts=True)
+        fixed += len(stale) + len(missing)
+    return fixed
+
+
+def prune_notification_digests():
+    """Deletes the digests whose window is over, nothing is folded into them
+    anymore
+
+    Returns:
+        Number of digests deleted
+    """
+    expired = NotificationDigest.objects.filter(window_end__lte=timezone.now())
+    return expired.delete()[0]
+
+
+def list_notification(notification, receiver):
+    """Saves a notification to the receiver's list
+
+    Notifications of DIGEST_NOTIFICATION_TYPES are folded into the receiver's
+    open digest of the same type if there is one: the digest takes their
+    message and object, counts them and moves back to the top of the list.
+
+    Returns:
+        True if a new notification was listed, False if it was folded into a
+        digest, which has already been pushed
+    """
+    notification_type = notification.notification_type
+    if notification_type in DIGEST_NOTIFICATION_TYPES:
+        # the receiver's row lock serializes its digests, so that concurrent
+        # first notifications of a window can't both open one
+        meta = TaggUserMeta.objects.select_for_update().get(user=receiver)
+        digest = (
+            NotificationDigest.objects.select_related("notification")
+            .filter(
+                user=receiver,
+                notification__notification_type=notification_type,
+                window_end__gt=timezone.now(),
+            )
+            .order_by("-window_end")
+            .first()
+        )
+        if digest:
+            folded = digest.notification
+            if folded.timestamp <= meta.last_seen_notifications:
+                # unread again
+                increment_unread_count(receiver, notification_type)
+            digest.count += 1
+            digest.save(update_fields=["count"])
+            folded.verbage = DIGEST_VERBAGE.format(
+                verbage=notification.verbage, count=digest.count
+            )
+            folded.content_type_id = notification.content_type_id
+            folded.notification_object = notification.notification_object
+            folded.timestamp = timezone.now()
+            folded.save(
+                update_fields=[
+                    "verbage",
+                    "content_type",
+                    "notification_object",
+                    "timestamp",
+                ]
+            )
+            return False
+
+    notification.save()
+    notification_list = NotificationList(user=receiver, notification=notification)
+    notification_list.save()
+    increment_unread_count(receiver, notification_type)
+    if notification_type in DIGEST_NOTIFICATION_TYPES:
+        NotificationDigest.objects.create(
+            notification=notification,
+            user=receiver,
+            window_end=notification.timestamp
+            + timedelta(seconds=settings.NOTIFICATION_DIGEST_WINDOW),
+        )
+    return True
+
+
 def handle_notification(
     notification_type, actor, receiver, verbage, notification_object=None
 ):
@@ -121,9 +357,6 @@ def handle_notification(
             notification_object=get_notification_id(),
             object=notification_object,
         )
-        notification.save()
-        notification_list = NotificationList(user=receiver, notification=notification)
-        notification_list.save()
         if notification_type == NotificationType.CLICK_TAG:
             title = "Tagg Click Count"
         elif notification_type == NotificationType.PROFILE_VIEW:
@@ -136,7 +369,9 @@ def handle_notification(
                 if notification_type in notifications_with_titles
                 else None
             )
-        notify_user(receiver, verbage, title)
+        with transaction.atomic():
+            if list_notification(notification, receiver):
+                notify_user(receiver, verbage, title)
         return True
     except NotifyNotificationException:
         logger.error("Failed to send notification")
@@ -186,11 +421,9 @@ def handle_notification_with_images(
             notification_object=get_notification_id(),
             object=notification_object,
         )
-        notification.save()
-        notification_list = NotificationList(user=receiver, notification=notification)
-        notification_list.save()
-
-        notify_user_with_image(receiver, verbage, title, image_url)
+        with transaction.atomic():
+            if list_notification(notification, receiver):
+                notify_user_with_image(receiver, verbage, title, image_url)
         return True
     except NotifyNotificationException:
         logger.error("Failed to send notification")
@@ -202,30 +435,25 @@ def handle_notification_with_images(
 def update_notification(
     user_id, actor_id, current_notification_type, notification_type, verbage
 ):
+    """Changes the type and message of the notifications actor sent to user
+
+    Returns:
+        Number of notifications updated
+    """
     try:
-        if NotificationList.objects.filter(user=user_id).exists():
-            notifications_list = NotificationList.objects.filter(user=user_id).values(
+        updated = Notification.objects.filter(
+            id__in=NotificationList.objects.filter(user_id=user_id).values(
                 "notification_id"
-            )
-            for notification_list_obj in notifications_list:
-                if Notification.objects.filter(
-                    id=notification_list_obj["notification_id"],
-                    notification_type=current_notification_type,
-                    actor_id=actor_id,
-                ).exists():
-                    notification = Notification.objects.filter(
-                        id=notification_list_obj["notification_id"],
-                        notification_type=current_notification_type,
-                        actor_id=actor_id,
-                    )
-                    notification.update(
-                        notification_type=notification_type, verbage=verbage
-                    )
-            return True
-        else:
-            return False
+            ),
+            notification_type=current_notification_type,
+            actor_id=actor_id,
+        ).update(notification_type=notification_type, verbage=verbage)
+        if updated:
+            reconcile_unread_counts([user_id])
+        return updated
     except Exception as err:
         logging.exception("Error while updating relationship")
+        return 0
 
 
 def get_all_notification_types():
@@ -245,38 +473,48 @@ def get_all_notification_types():
 
 
 def delete_notification(user_id, actor_id, notification_types=[]):
+    """Removes the notifications actor sent to user
+
+    Personal notifications are deleted, broadcasts are only dismissed for
+    the user as other users still list them.
+
+    Returns:
+        Number of notifications removed
+    """
     try:
-        if NotificationList.objects.filter(user=user_id).exists():
-            notifications_list = NotificationList.objects.filter(user=user_id).values(
-                "notification_id"
-            )
+        if len(notification_types) == 0:
+            notification_types = get_all_notification_types()
+
+        user = TaggUser.objects.get(id=user_id)
+        dismissed = DismissedBroadcast.objects.bulk_create(
+            [
+                DismissedBroadcast(notification_id=notification_id, user=user)
+                for notification_id in broadcast_notifications(user)
+                .filter(notification_type__in=notification_types, actor_id=actor_id)
+                .values_list("id", flat=True)
+            ],
+            ignore_conflicts=True,
+        )
 
-            if len(notification_types) == 0:
-                notification_types = get_all_notification_types()
-
-            for notification_list_obj in notifications_list:
-                if Notification.objects.filter(
-                    id=notification_list_obj["notification_id"],
-                    notification_type__in=notification_types,
-                    actor_id=actor_id,
-                ).exists():
-                    notification = Notification.objects.filter(
-                        id=notification_list_obj["notification_id"],
-                        notification_type__in=notification_types,
-                        actor_id=actor_id,
-                    )
-                    notification.delete()
-                    # delete corresponding notification list item
-            return True
-        else:
-            return False
+        _, deleted = Notification.objects.filter(
+            id__in=NotificationList.objects.filter(user_id=user_id).values(
+                "notification_id"
+            ),
+            notification_type__in=notification_types,
+            actor_id=actor_id,
+        ).delete()
+        deleted = deleted.get(Notification._meta.label, 0)
+        if deleted:
+            reconcile_unread_counts([user_id])
+        return deleted + len(dismissed)
     except Exception as err:
         logging.exception("Error while updating relationship")
+        return 0
 
 
 def notify_all_users(verbage, excludeReceiver=None, title=None):
     try:
-        FCMDevice.objects.filter(active=1).exclude(user=excludeReceiver).send_message(title=title, body=verbage)
+        enqueue_push(verbage, title, exclude_user=excludeReceiver)
     except Exception as err:
         logger.error(err)
         raise NotifyNotificationException
@@ -284,27 +522,18 @@ def notify_all_users(verbage, excludeReceiver=None, title=None):
 
 def notify_user(receiver, verbage, title=None):
     try:
-        device = FCMDevice.objects.filter(user=receiver, active=1)[0]
-        last_seen = receiver.taggusermeta.last_seen_notifications
-        unread_count = NotificationList.objects.filter(
-            user=receiver, notification__timestamp__gt=last_seen
-        ).count()
-        device.send_message(title=title, body=verbage, badge=unread_count)
+        if not FCMDevice.objects.filter(user=receiver, active=1).exists():
+            return
+        enqueue_push(verbage, title, user=receiver, badge=get_badge_count(receiver))
     except Exception as err:
         raise NotifyNotificationException
 
 
 def notify_user_with_image(receiver, verbage, title=None, image_url=None):
     try:
-        device = FCMDevice.objects.filter(user=receiver, active=1)[0]
-        device.send_message(title=title, body=verbage)
-
-        # device.send_message(
-        #     Message(
-        #         notification=Firebase_notification(
-        #             title=title, body=verbage, image=image_url
-        #         )
-        #     )
-        # )
+        if not FCMDevice.objects.filter(user=receiver, active=1).exists():
+            return
+        # images are not sent yet, the payload only carries the message
+        enqueue_push(verbage, title, user=receiver)
     except Exception as err:
-        raise NotifyNotificationException
\ No newline at end of file
+        raise NotifyNotificationException
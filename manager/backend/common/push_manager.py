@@ -0,0 +1,412 @@
+"""
+Delivery of the push outbox: pending pushes are claimed by a pool of
+workers and sent to FCM in multicast batches
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import firebase_admin
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from fcm_django.models import FCMDevice
+from firebase_admin import exceptions, messaging
+
+from ..notifications.models import PushOutbox, PushState
+from .utils import iter_chunks
+
+logger = logging.getLogger(__name__)
+
+# FCM accepts at most 500 tokens per multicast
+PUSH_BATCH_SIZE = 500
+PUSH_WORKERS = 8
+# pushes claimed by a worker are hidden from the others this many seconds,
+# the lease is renewed before every batch
+PUSH_LEASE_SECONDS = 120
+PUSH_MAX_ATTEMPTS = 6
+PUSH_BACKOFF_SECONDS = 10
+PUSH_BACKOFF_MAX_SECONDS = 60 * 60
+PUSH_POLL_SECONDS = 1
+PUSH_METRICS_INTERVAL = 60
+# delivered and failed pushes are kept this long for inspection
+PUSH_RETENTION_DAYS = 7
+
+# per token errors, see
+# https://firebase.google.com/docs/reference/fcm/rest/v1/ErrorCode
+# the devices are dropped on the same errors as fcm_django
+DEAD_TOKEN_ERRORS = (
+    messaging.UnregisteredError,
+    messaging.SenderIdMismatchError,
+    exceptions.InvalidArgumentError,
+)
+RETRY_TOKEN_ERRORS = (
+    exceptions.UnavailableError,
+    exceptions.InternalError,
+    exceptions.ResourceExhaustedError,
+    exceptions.DeadlineExceededError,
+)
+
+_firebase_app_lock = threading.Lock()
+
+
+class PushLeaseLost(Exception):
+    """The lease of a push expired and another worker may have claimed it"""
+
+    pass
+
+
+class PushMetrics:
+    """Delivery counters and the latency of the most recent batches"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._counts = dict.fromkeys(
+            [
+                "batches",
+                "failed_batches",
+                "delivered",
+                "retried",
+                "failed",
+                "pruned",
+            ],
+            0,
+        )
+
+    def record_batch(self, seconds, delivered, retried, failed, pruned):
+        with self._lock:
+            self._latencies.append(seconds)
+            self._counts["batches"] += 1
+            self._counts["delivered"] += delivered
+            self._counts["retried"] += retried
+            self._counts["failed"] += failed
+            self._counts["pruned"] += pruned
+
+    def record_failed_batch(self, seconds, size):
+        with self._lock:
+            self._latencies.append(seconds)
+            self._counts["batches"] += 1
+            self._counts["failed_batches"] += 1
+            self._counts["retried"] += size
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self._counts)
+            latencies = sorted(self._latencies)
+        if latencies:
+            metrics.update(
+                latency_avg_ms=round(sum(latencies) / len(latencies) * 1000, 1),
+                latency_p95_ms=round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+                latency_max_ms=round(latencies[-1] * 1000, 1),
+            )
+        return metrics
+
+
+push_metrics = PushMetrics()
+
+
+def enqueue_push(body, title=None, user=None, exclude_user=None, badge=None):
+    """Adds a push to the outbox, in the caller's transaction
+
+    Args:
+        body: Message displayed on the device
+        title: Title displayed on the device, if any
+        user: Receiver, every active device if None
+        exclude_user: User left out of a push to every device
+        badge: Badge count set on the app icon
+    """
+    return PushOutbox.objects.create(
+        user=user,
+        exclude_user=exclude_user,
+        title=title,
+        body=body,
+        badge=badge,
+    )
+
+
+def firebase_app():
+    """The default Firebase app, initialized from the environment's
+    credentials as fcm_django does"""
+    with _firebase_app_lock:
+        try:
+            return firebase_admin.get_app()
+        except ValueError:
+            return firebase_admin.initialize_app()
+
+
+def send_multicast(tokens, title, body, badge=None):
+    """Sends one message to up to PUSH_BATCH_SIZE devices through the FCM
+    HTTP v1 API, one request per device as FCM dropped its batch endpoint
+
+    Returns:
+        The FirebaseError of every token, None for delivered tokens
+
+    Raises:
+        FirebaseError: FCM rejected the whole batch
+    """
+    response = messaging.send_each_for_multicast(
+        messaging.MulticastMessage(
+            tokens=list(tokens),
+            notification=messaging.Notification(title=title, body=body),
+            android=messaging.AndroidConfig(priority="high"),
+            apns=(
+                messaging.APNSConfig(
+                    payload=messaging.APNSPayload(aps=messaging.Aps(badge=badge))
+                )
+                if badge is not None
+                else None
+            ),
+        ),
+        app=firebase_app(),
+    )
+    return [result.exception for result in response.responses]
+
+
+def _target_tokens(push):
+    devices = FCMDevice.objects.filter(active=True)
+    if push.user_id:
+        devices = devices.filter(user_id=push.user_id)
+    elif push.exclude_user_id:
+        devices = devices.exclude(user_id=push.exclude_user_id)
+    return devices.values_list("registration_id", flat=True).iterator()
+
+
+def prune_dead_devices(tokens):
+    """Drops devices FCM no longer knows about, as fcm_django would"""
+    devices = FCMDevice.objects.filter(registration_id__in=tokens)
+    if settings.FCM_DJANGO_SETTINGS.get("DELETE_INACTIVE_DEVICES"):
+        return devices.delete()[0]
+    return devices.update(active=False)
+
+
+def renew_push_lease(push):
+    """Extends the lease of a claimed push, as long as the caller still holds it
+
+    Returns:
+        True if the lease was renewed
+    """
+    lease_until = timezone.now() + timedelta(seconds=PUSH_LEASE_SECONDS)
+    renewed = PushOutbox.objects.filter(
+        pk=push.pk, state=PushState.PENDING, next_attempt=push.lease_until
+    ).update(next_attempt=lease_until)
+    if renewed:
+        push.lease_until = lease_until
+    return bool(renewed)
+
+
+def deliver_push(push):
+    """Sends a push to its targets in multicast batches, renewing its lease
+    before every batch so a long broadcast isn't claimed again mid-delivery
+
+    If the delivery breaks off, push.tokens is narrowed to the targets that
+    weren't sent yet so the next attempt doesn't send the push twice.
+
+    Returns:
+        (tokens to retry, last error)
+
+    Raises:
+        PushLeaseLost: the push was left to the worker that claimed it next
+    """
+    tokens = push.tokens if push.tokens is not None else _target_tokens(push)
+    retry = []
+    # tokens sent or queued for retry
+    handled = set()
+    last_error = ""
+    try:
+        for batch in iter_chunks(tokens, PUSH_BATCH_SIZE):
+            if not renew_push_lease(push):
+                raise PushLeaseLost(push.id)
+            start = time.perf_counter()
+            try:
+                errors = send_multicast(batch, push.title, push.body, push.badge)
+            except (exceptions.FirebaseError, ValueError) as err:
+                push_metrics.record_failed_batch(
+                    time.perf_counter() - start, len(batch)
+                )
+                logger.warning(f"Push {push.id}: batch of {len(batch)} failed: {err}")
+                retry.extend(batch)
+                handled.update(batch)
+                last_error = str(err)
+                continue
+            seconds = time.perf_counter() - start
+
+            dead = []
+            retried = failed = 0
+            for token, error in zip(batch, errors):
+                if error is None:
+                    continue
+                if isinstance(error, DEAD_TOKEN_ERRORS):
+                    dead.append(token)
+                elif isinstance(error, RETRY_TOKEN_ERRORS):
+                    retry.append(token)
+                    retried += 1
+                    last_error = f"{error.code}: {error}"
+                else:
+                    failed += 1
+                    last_error = f"{error.code}: {error}"
+            handled.update(batch)
+            pruned = prune_dead_devices(dead) if dead else 0
+            delivered = len(batch) - len(dead) - retried - failed
+            push_metrics.record_batch(seconds, delivered, retried, failed, pruned)
+            logger.info(
+                f"Push {push.id}: batch of {len(batch)} in {seconds * 1000:.0f}ms, "
+                f"{delivered} delivered, {retried} to retry, {failed} failed, "
+                f"{pruned} devices pruned"
+            )
+    except PushLeaseLost:
+        raise
+    except Exception:
+        if handled:
+            targets = push.tokens if push.tokens is not None else _target_tokens(push)
+            push.tokens = retry + [token for token in targets if token not in handled]
+        raise
+    return retry, last_error
+
+
+def push_backoff(attempts):
+    """Seconds to wait before the next attempt, exponential with jitter"""
+    delay = min(PUSH_BACKOFF_SECONDS * 2 ** (attempts - 1), PUSH_BACKOFF_MAX_SECONDS)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def process_push(push):
+    """Delivers a claimed push and records the outcome on its row
+
+    Returns:
+        The new state of the push
+    """
+    try:
+        retry, push.last_error = deliver_push(push)
+        done = not retry
+    except PushLeaseLost:
+        logger.warning(f"Push {push.id}: lease lost, left to another worker")
+        return push.state
+    except Exception as err:
+        logger.exception(f"Push {push.id}: delivery failed")
+        # the targets deliver_push didn't get to are retried
+        retry, push.last_error = push.tokens, str(err)
+        done = False
+
+    push.attempts += 1
+    if done:
+        push.state = PushState.DELIVERED
+        push.tokens = None
+        push.delivered_on = timezone.now()
+    elif push.attempts >= PUSH_MAX_ATTEMPTS:
+        push.state = PushState.FAILED
+        logger.error(f"Push {push.id}: giving up after {push.attempts} attempts")
+    else:
+        push.tokens = retry
+        push.next_attempt = timezone.now() + timedelta(
+            seconds=push_backoff(push.attempts)
+        )
+    # only recorded while the lease is held
+    saved = PushOutbox.objects.filter(pk=push.pk, next_attempt=push.lease_until).update(
+        state=push.state,
+        tokens=push.tokens,
+        attempts=push.attempts,
+        next_attempt=push.next_attempt,
+        last_error=push.last_error,
+        delivered_on=push.delivered_on,
+    )
+    if not saved:
+        logger.warning(f"Push {push.id}: lease lost, outcome not recorded")
+    return push.state
+
+
+def claim_pushes(limit):
+    """Leases up to limit due pushes to the caller
+
+    The lease moves next_attempt forward so other workers skip the pushes,
+    a worker dying mid-delivery only delays them until the lease expires.
+    Every push is returned with its lease_until, the holder's proof of lease.
+    """
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=PUSH_LEASE_SECONDS)
+    with transaction.atomic():
+        pushes = list(
+            PushOutbox.objects.select_for_update(skip_locked=True)
+            .filter(state=PushState.PENDING, next_attempt__lte=now)
+            .order_by("next_attempt")[:limit]
+        )
+        PushOutbox.objects.filter(pk__in=[push.pk for push in pushes]).update(
+            next_attempt=lease_until
+        )
+    for push in pushes:
+        push.lease_until = lease_until
+    return pushes
+
+
+def prune_push_outbox(days=PUSH_RETENTION_DAYS):
+    """Deletes the delivered and failed pushes older than days
+
+    The next_attempt of a finished push is the lease of its last attempt, so
+    the (state, next_attempt) index serves the lookup.
+
+    Returns:
+        Number of pushes deleted
+    """
+    finished = PushOutbox.objects.filter(
+        state__in=[PushState.DELIVERED, PushState.FAILED],
+        next_attempt__lt=timezone.now() - timedelta(days=days),
+    )
+    return finished.delete()[0]
+
+
+def _process_push_in_thread(push):
+    try:
+        return process_push(push)
+    finally:
+        connection.close()
+
+
+def drain_push_outbox(workers=PUSH_WORKERS):
+    """Sends every due push of the outbox
+
+    Returns:
+        {state: number of pushes}
+    """
+    outcomes = {}
+    executor = ThreadPoolExecutor(workers) if workers > 1 else None
+    try:
+        while True:
+            pushes = claim_pushes(workers * 4)
+            if not pushes:
+                break
+            if executor:
+                states = executor.map(_process_push_in_thread, pushes)
+            else:
+                states = map(process_push, pushes)
+            for state in states:
+                outcomes[state] = outcomes.get(state, 0) + 1
+    finally:
+        if executor:
+            executor.shutdown()
+    return outcomes
+
+
+def run_push_worker(workers=PUSH_WORKERS):
+    """Drains the outbox forever, logging delivery metrics and pruning the
+    finished pushes periodically"""
+    last_report = time.monotonic()
+    while True:
+        try:
+            outcomes = drain_push_outbox(workers)
+        except Exception:
+            logger.exception("Failed to drain the push outbox")
+            outcomes = None
+        if time.monotonic() - last_report >= PUSH_METRICS_INTERVAL:
+            logger.info(f"Push metrics: {push_metrics.metrics()}")
+            try:
+                prune_push_outbox()
+            except Exception:
+                logger.exception("Failed to prune the push outbox")
+            last_report = time.monotonic()
+        if not outcomes:
+            time.sleep(PUSH_POLL_SECONDS)
@@ -0,0 +1,254 @@
+"""
+    Proxy for moment thumbnails stored on S3, backed by a two tier LRU cache:
+    a memory tier and a disk tier, both bounded in bytes
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date, parse_etags, quote_etag
+
+from .image_manager import get_s3_client
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# last_modified is a timestamp, content is set for memory entries and path for
+# disk entries
+CachedThumbnail = namedtuple(
+    "CachedThumbnail", ["etag", "last_modified", "size", "content", "path"]
+)
+
+
+class ThumbnailCache:
+    """Size-bounded LRU cache of thumbnails keyed by their S3 key
+
+    Every thumbnail is written to both tiers, each tier evicting its least
+    recently used entries once it holds more than its budget. Disk entries
+    are named after a digest of the key and their ETag, and carry their
+    Last-Modified as mtime, so the disk tier is picked back up on restart.
+    Budgets are per process, processes sharing a directory may evict each
+    other's files, which is then a miss.
+    """
+
+    def __init__(self, directory, memory_bytes, disk_bytes):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._disk = OrderedDict()
+        self._disk_size = 0
+        self._lock = threading.Lock()
+        self._metrics = dict.fromkeys(
+            ["memory_hits", "disk_hits", "misses", "not_modified", "bytes_served"], 0
+        )
+        os.makedirs(directory, exist_ok=True)
+        self._load_disk_index()
+
+    def _load_disk_index(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            digest, _, etag = name.partition(".")
+            # skips partially written files
+            if not digest or not etag:
+                continue
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            entries.append((stat.st_atime, digest, etag, stat, path))
+        for _, digest, etag, stat, path in sorted(entries):
+            self._disk[digest] = CachedThumbnail(
+                etag, stat.st_mtime, stat.st_size, None, path
+            )
+            self._disk_size += stat.st_size
+        self._evict()
+
+    @staticmethod
+    def _digest(key):
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def get(self, key):
+        """Returns the cached thumbnail, None on a miss"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._metrics["memory_hits"] += 1
+                return entry
+            digest = self._digest(key)
+            entry = self._disk.get(digest)
+            if entry is not None:
+                self._disk.move_to_end(digest)
+                self._metrics["disk_hits"] += 1
+                return entry
+            self._metrics["misses"] += 1
+            return None
+
+    def put(self, key, content, etag, last_modified):
+        digest = self._digest(key)
+        path = os.path.join(self.directory, f"{digest}.{etag}")
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".")
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.utime(tmp_path, (last_modified, last_modified))
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.exception(f"Could not write thumbnail {key} to disk")
+            path = None
+
+        with self._lock:
+            replaced = self._memory.pop(key, None)
+            if replaced:
+                self._memory_size -= replaced.size
+            if len(content) <= self.memory_bytes:
+                self._memory[key] = CachedThumbnail(
+                    etag, last_modified, len(content), content, None
+                )
+                self._memory_size += len(content)
+            if path:
+                replaced = self._disk.pop(digest, None)
+                if replaced:
+                    self._disk_size -= replaced.size
+                    if replaced.path != path:
+                        self._remove_file(replaced.path)
+                self._disk[digest] = CachedThumbnail(
+                    etag, last_modified, len(content), None, path
+                )
+                self._disk_size += len(content)
+            self._evict()
+
+    def discard(self, key):
+        """Drops a thumbnail from both tiers"""
+        with self._lock:
+            entry = self._memory.pop(key, None)
+            if entry:
+                self._memory_size -= entry.size
+            entry = self._disk.pop(self._digest(key), None)
+            if entry:
+                self._disk_size -= entry.size
+                self._remove_file(entry.path)
+
+    def _evict(self):
+        while self._memory_size > self.memory_bytes:
+            _, entry = self._memory.popitem(last=False)
+            self._memory_size -= entry.size
+        while self._disk_size > self.disk_bytes:
+            _, entry = self._disk.popitem(last=False)
+            self._disk_size -= entry.size
+            self._remove_file(entry.path)
+
+    @staticmethod
+    def _remove_file(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def record(self, metric, value=1):
+        with self._lock:
+            self._metrics[metric] += value
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics.update(
+                memory_entries=len(self._memory),
+                memory_bytes=self._memory_size,
+                disk_entries=len(self._disk),
+                disk_bytes=self._disk_size,
+            )
+        lookups = metrics["memory_hits"] + metrics["disk_hits"] + metrics["misses"]
+        metrics["hit_rate"] = (
+            round((metrics["memory_hits"] + metrics["disk_hits"]) / lookups, 4)
+            if lookups
+            else 0
+        )
+        return metrics
+
+
+_thumbnail_cache = None
+_thumbnail_cache_lock = threading.Lock()
+
+
+def get_thumbnail_cache():
+    global _thumbnail_cache
+    with _thumbnail_cache_lock:
+        if _thumbnail_cache is None:
+            _thumbnail_cache = ThumbnailCache(
+                settings.THUMBNAIL_CACHE_DIR,
+                settings.THUMBNAIL_CACHE_MEMORY_BYTES,
+                settings.THUMBNAIL_CACHE_DISK_BYTES,
+            )
+    return _thumbnail_cache
+
+
+def _not_modified(request, etag):
+    etags = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+    return "*" in etags or any(
+        tag.replace("W/", "", 1) == quote_etag(etag) for tag in etags
+    )
+
+
+def _stream_and_cache(cache, key, body, etag, last_modified):
+    chunks = []
+    for chunk in body.iter_chunks(STREAM_CHUNK_SIZE):
+        chunks.append(chunk)
+        yield chunk
+    body.close()
+    cache.put(key, b"".join(chunks), etag, last_modified)
+
+
+def thumbnail_response(request, key):
+    """Serves the thumbnail stored at key on S3
+
+    Hits are served from memory or streamed from disk, misses are streamed
+    from S3 and cached on the way. Responses carry ETag and Last-Modified,
+    and a matching If-None-Match is answered with a 304.
+    """
+    cache = get_thumbnail_cache()
+    entry = cache.get(key)
+    if entry is None:
+        s3_object = get_s3_client().get_object(Bucket=settings.S3_BUCKET, Key=key)
+        etag = s3_object["ETag"].strip('"')
+        last_modified = s3_object["LastModified"].timestamp()
+        if _not_modified(request, etag):
+            cache.put(key, s3_object["Body"].read(), etag, last_modified)
+            response = HttpResponse(status=304)
+            cache.record("not_modified")
+        else:
+            response = StreamingHttpResponse(
+                _stream_and_cache(cache, key, s3_object["Body"], etag, last_modified),
+                content_type="image/jpeg",
+            )
+            response["Content-Length"] = s3_object["ContentLength"]
+            cache.record("bytes_served", s3_object["ContentLength"])
+    else:
+        etag, last_modified = entry.etag, entry.last_modified
+        if _not_modified(request, etag):
+            response = HttpResponse(status=304)
+            cache.record("not_modified")
+        elif entry.content is not None:
+            response = HttpResponse(entry.content, content_type="image/jpeg")
+            cache.record("bytes_served", entry.size)
+        else:
+            try:
+                response = FileResponse(
+                    open(entry.path, "rb"), content_type="image/jpeg"
+                )
+            except FileNotFoundError:
+                # evicted by another process
+                cache.discard(key)
+                return thumbnail_response(request, key)
+            cache.record("bytes_served", entry.size)
+
+    response["ETag"] = quote_etag(etag)
+    response["Last-Modified"] = http_date(last_modified)
+    return response
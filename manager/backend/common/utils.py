@@ -1,5 +1,6 @@
 import logging
 import random
+from itertools import islice
 
 from ..messaging.models import Chat
 
@@ -76,6 +77,15 @@ def chunks(lst, n):
         yield lst[i : i + n]
 
 
+def iter_chunks(iterable, n):
+    """Yield successive n-sized lists from any iterable, consuming it lazily."""
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, n))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, n))
+
+
 def light_shuffle(l, chunk_size=5, seed=0):
     """
     Performs a "light" shuffle. Using the seed to shuffle each chunk to make
@@ -89,6 +99,17 @@ def light_shuffle(l, chunk_size=5, seed=0):
     return out
 
 
+def light_shuffle_page(l, offset, limit, chunk_size=5, seed=0):
+    """
+    Returns l[offset:offset + limit] of light_shuffle(l, chunk_size, seed),
+    only shuffling the chunks the page overlaps.
+    """
+    start = offset - offset % chunk_size
+    end = -(-(offset + limit) // chunk_size) * chunk_size
+    window = light_shuffle(l[start:end], chunk_size=chunk_size, seed=seed)
+    return window[offset - start : offset - start + limit]
+
+
 def permission_by_action(original_class):
     """
     A class decorator for allowing permission classes by action.
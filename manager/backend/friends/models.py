@@ -1,7 +1,10 @@
 from django.contrib.auth.base_user import BaseUserManager
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from ..models import TaggUser
 import logging
+from ..common.friend_graph_manager import record_friendship_change
 from ..common.notification_manager import delete_notification
 
 """
@@ -37,18 +40,17 @@ class FriendsManager(BaseUserManager):
     # Updating relationship status to "friends" from "requested"
     def update_relationship(self, requester, requested, status):
         try:
-            if Friends.objects.filter(
+            relationship = Friends.objects.filter(
                 requester=requester, requested=requested, status="requested"
-            ).exists():
-                relationship = Friends.objects.filter(
-                    requester=requester, requested=requested, status="requested"
-                )
-                relationship.update(status=status)
-                return True
-
-            else:
+            ).first()
+            if relationship is None:
                 return False
 
+            # saved through the model so the friend graph hears about it
+            relationship.status = status
+            relationship.save(update_fields=["status"])
+            return True
+
         except Exception as err:
             logging.exception("Error while updating relationship")
 
@@ -59,7 +61,7 @@ class FriendsManager(BaseUserManager):
             # user A is the actor, delete the notification sent to user = user A, actor = user B
             if reason == "cancelled" or reason == "declined":
                 delete_notification(
-                    user_id=userA.id, actor_id=userB.id, notification_type="FRD_REQ"
+                    user_id=userA.id, actor_id=userB.id, notification_types=["FRD_REQ"]
                 )
             return True
 
@@ -68,7 +70,7 @@ class FriendsManager(BaseUserManager):
             # user B is the actor, delete the notification sent to user = user B, actor = user A
             if reason == "cancelled" or reason == "declined":
                 delete_notification(
-                    user_id=userB.id, actor_id=userA.id, notification_type="FRD_REQ"
+                    user_id=userB.id, actor_id=userA.id, notification_types=["FRD_REQ"]
                 )
             return True
 
@@ -99,3 +101,17 @@ class Friends(models.Model):
 
     class Meta:
         unique_together = ("requester", "requested")
+
+
+@receiver([post_save, post_delete], sender=Friends)
+def friendship_changed(sender, instance, **kwargs):
+    # friend requests being sent, cancelled or declined don't change the graph,
+    # a request being accepted does
+    if (
+        instance.status != FriendshipStatusType.FRIENDS
+        and kwargs.get("created") is not False
+    ):
+        return
+    transaction.on_commit(
+        lambda: record_friendship_change(instance.requester_id, instance.requested_id)
+    )
@@ -1,11 +1,43 @@
-from itertools import chain
+import uuid
 
 from django.db.models import Q
 
+from ..common.friend_graph_manager import friend_count, friend_ids
 from ..models import TaggUser
 from .models import Friends
 
 
+def get_friendship_statuses(request_user, pks):
+    """Figures out the current friendship status between a user and many
+    others in a single query, along with the requester if a friend request is
+    in progress
+
+    Args:
+        request_user (TaggUser): the requester user
+        pks (list): the target users' ids
+
+    Returns:
+        {pk: (status, requester_id)} for every pk, ("no_record", "") when
+        there is no record
+    """
+    targets = {uuid.UUID(str(pk)): pk for pk in pks}
+    statuses = dict.fromkeys(pks, ("no_record", ""))
+    if not targets:
+        return statuses
+
+    records = Friends.objects.filter(
+        Q(requester=request_user.id, requested__in=targets)
+        | Q(requested=request_user.id, requester__in=targets)
+    ).values_list("requester_id", "requested_id", "status")
+    for requester_id, requested_id, status in records:
+        if requester_id == request_user.id:
+            statuses[targets[requested_id]] = (status, request_user.id)
+        elif statuses[targets[requester_id]][0] == "no_record":
+            # the request_user's own request wins if both exist
+            statuses[targets[requester_id]] = (status, targets[requester_id])
+    return statuses
+
+
 def get_friendship_status(request_user, pk):
     """Figures out the current friendship status between two users,
     optionally looks for the requester if a friend request is in progress/
@@ -14,64 +46,24 @@ def get_friendship_status(request_user, pk):
         request_user (TaggUser): the requester user
         pk (str): the target user
     """
-    friendship_status = "no_record"
-    friendship_requester_id = ""
-    if Friends.objects.filter(requested=pk, requester=request_user.id).exists():
-        record = Friends.objects.filter(requested=pk, requester=request_user.id).values(
-            "status"
-        )
-        friendship_status = record[0]["status"]
-        friendship_requester_id = request_user.id
-
-    elif Friends.objects.filter(requested=request_user.id, requester=pk).exists():
-        record = (
-            Friends.objects.filter(requested=request_user.id, requester=pk)
-            .values("status")
-            .values("status")
-        )
-        friendship_status = record[0]["status"]
-        friendship_requester_id = pk
-    return friendship_status, friendship_requester_id
+    return get_friendship_statuses(request_user, [pk])[pk]
 
 
 def find_user_friends(user_id):
     """Finds the user's friends.
     Args:
-        user_id: the id of the user
+        user_id: the id of the user, or the user
     """
     # Remove blocked users from list of the requesting user
     # TODO TMA 540: Remove blocked person from their friends list the momen they are blocked
     # if BlockedUser.objects.filter(blocked__id=user_id).exists():
     #     blocked = BlockedUser.objects.filter(blocked__id=user_id)
 
-    friends = []
-
-    # list of friends who the user received the friend request
-    requester_friends = Friends.objects.filter(
-        requested=user_id, status="friends"
-    ).values("requester")
-
-    # list of friends who the user sent the friend request
-    requested_friends = Friends.objects.filter(
-        requester=user_id, status="friends"
-    ).values("requested")
-
-    # Retriving the corresponding TaggUsers for both the user lists
-    friends = set(
-        chain(
-            TaggUser.objects.filter(Q(requester__requester__in=requester_friends)),
-            TaggUser.objects.filter(Q(requested__requested__in=requested_friends)),
-        )
-    )
-
-    return friends
+    ids = friend_ids(user_id)
+    if not ids:
+        return set()
+    return set(TaggUser.objects.filter(id__in=ids))
 
 
 def get_user_friend_count(user):
-    requested_friends_count = Friends.objects.filter(
-        requested=user, status="friends"
-    ).count()
-    requester_friends_count = Friends.objects.filter(
-        requester=user, status="friends"
-    ).count()
-    return requested_friends_count + requester_friends_count
+    return friend_count(user)
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...models import TaggUserMeta
+from ...moments.feed.utils import rebuild_discover_feeds
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized discover feed of every onboarded user"
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        rebuilt = rebuild_discover_feeds(
+            TaggUserMeta.objects.filter(is_onboarded=True).values_list(
+                "user_id", flat=True
+            )
+        )
+        self.stdout.write(
+            f"Rebuilt {rebuilt} discover feeds in {time.monotonic() - start:.1f}s"
+        )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from ...models import TaggUser
+from ...moments.feed.utils import check_discover_feeds
+
+
+class Command(BaseCommand):
+    help = "Compare materialized discover feeds against the moments users can see"
+
+    def add_arguments(self, parser):
+        parser.add_argument("usernames", nargs="*", help="Only check these users")
+        parser.add_argument(
+            "--fix", action="store_true", help="Rebuild inconsistent feeds"
+        )
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options["usernames"]:
+            user_ids = TaggUser.objects.filter(
+                username__in=options["usernames"]
+            ).values_list("id", flat=True)
+        stats = check_discover_feeds(user_ids, fix=options["fix"])
+        self.stdout.write(
+            f"{stats['checked']} feeds checked, {stats['inconsistent']} "
+            f"inconsistent, {stats['rebuilt']} rebuilt"
+        )
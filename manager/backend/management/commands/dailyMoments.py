@@ -5,5 +5,18 @@ from ...moments.utils import dailyMoments
 class Command(BaseCommand):
     help = "dailyMoments"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Spread user chunks across this many processes",
+        )
+
     def handle(self, *args, **options):
-        dailyMoments()
\ No newline at end of file
+        stats = dailyMoments(workers=options["workers"])
+        self.stdout.write(
+            f"{stats['rows']} daily moments for {stats['users']} users in "
+            f"{stats['seconds']}s ({stats['rows_per_second']} rows/sec), "
+            f"peak memory {stats['peak_memory_kb']} KB"
+        )
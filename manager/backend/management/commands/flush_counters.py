@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...common.counter_manager import flush_all_counters
+
+# registers the counters
+from ...moments.shares import utils as _shares  # noqa: F401
+from ...moments.views import utils as _views  # noqa: F401
+
+
+class Command(BaseCommand):
+    help = "Write the queued write-behind counters to the database"
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        updated = flush_all_counters()
+        self.stdout.write(
+            f"Flushed {updated} counters in {time.monotonic() - start:.1f}s"
+        )
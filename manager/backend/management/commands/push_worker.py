@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from ...common.push_manager import (
+    PUSH_WORKERS,
+    drain_push_outbox,
+    prune_push_outbox,
+    push_metrics,
+    run_push_worker,
+)
+
+
+class Command(BaseCommand):
+    help = "Send the pending push notifications of the outbox to FCM"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=PUSH_WORKERS)
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help=(
+                "Exit once the outbox is drained instead of polling it, "
+                "after pruning the old delivered and failed pushes"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if not options["once"]:
+            run_push_worker(options["workers"])
+            return
+        outcomes = drain_push_outbox(options["workers"])
+        self.stdout.write(f"Pushes: {outcomes}")
+        self.stdout.write(f"Metrics: {push_metrics.metrics()}")
+        self.stdout.write(f"Pruned {prune_push_outbox()} finished pushes")
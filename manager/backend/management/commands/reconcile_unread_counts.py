@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...common.notification_manager import (
+    prune_notification_digests,
+    reconcile_unread_counts,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the unread notification counters from the notification lists "
+        "and prune the expired notification digests"
+    )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        fixed = reconcile_unread_counts()
+        self.stdout.write(
+            f"Fixed {fixed} unread counters in {time.monotonic() - start:.1f}s"
+        )
+
+        start = time.monotonic()
+        pruned = prune_notification_digests()
+        self.stdout.write(
+            f"Pruned {pruned} notification digests in {time.monotonic() - start:.1f}s"
+        )
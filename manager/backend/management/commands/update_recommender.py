@@ -1,3 +1,6 @@
+import time
+
+from ...suggested_people.features import update_mutual_features
 from ...suggested_people.utils import (
     compute_recommender_feature_values,
     insert_recommender_missing_rows,
@@ -8,6 +11,25 @@ from django.core.management.base import BaseCommand
 class Command(BaseCommand):
     help = "Populate missing rows and recommender feature values"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--mutual",
+            action="store_true",
+            help="Also recompute the mutual friend and badge features of every row",
+        )
+
+    def report(self, step, rows, start):
+        elapsed = time.monotonic() - start
+        rate = rows / elapsed if elapsed else 0
+        self.stdout.write(f"{step}: {rows} rows in {elapsed:.1f}s ({rate:.0f} rows/s)")
+
     def handle(self, *args, **options):
-        insert_recommender_missing_rows()
-        compute_recommender_feature_values()
+        start = time.monotonic()
+        self.report("Candidates", insert_recommender_missing_rows(), start)
+
+        start = time.monotonic()
+        self.report("Dirty features", compute_recommender_feature_values(), start)
+
+        if options["mutual"]:
+            start = time.monotonic()
+            self.report("Mutual features", update_mutual_features(), start)
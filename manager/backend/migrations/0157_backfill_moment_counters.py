@@ -0,0 +1,38 @@
+# Generated by Django 3.2.11 on 2026-10-18 10:12
+
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_moment_counters(apps, schema_editor):
+    Moment = apps.get_model("backend", "Moment")
+    MomentViews = apps.get_model("backend", "MomentViews")
+    MomentShares = apps.get_model("backend", "MomentShares")
+
+    def count_of(model, field):
+        return Coalesce(
+            Subquery(
+                model.objects.filter(**{field: OuterRef("pk")})
+                .values(field)
+                .annotate(count=Count("id"))
+                .values("count")
+            ),
+            0,
+        )
+
+    Moment.objects.update(
+        view_count=count_of(MomentViews, "moment_viewed"),
+        share_count=count_of(MomentShares, "moment_shared"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0156_auto_20220407_1005"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_moment_counters, migrations.RunPython.noop),
+    ]
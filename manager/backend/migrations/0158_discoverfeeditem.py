@@ -0,0 +1,48 @@
+# Generated by Django 3.2.11 on 2026-10-18 11:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("backend", "0157_backfill_moment_counters"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DiscoverFeedItem",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("date_created", models.DateTimeField()),
+                (
+                    "moment",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="discover_feed_items",
+                        to="backend.moment",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="discover_feed",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("user", "moment")},
+            },
+        ),
+        migrations.AddIndex(
+            model_name="discoverfeeditem",
+            index=models.Index(
+                fields=["user", "-date_created"], name="backend_dis_user_id_fe8923_idx"
+            ),
+        ),
+    ]
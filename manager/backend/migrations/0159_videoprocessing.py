@@ -0,0 +1,46 @@
+# Generated by Django 3.2.11 on 2026-10-18 12:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0158_discoverfeeditem"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VideoProcessing",
+            fields=[
+                (
+                    "moment",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="video_processing",
+                        serialize=False,
+                        to="backend.moment",
+                    ),
+                ),
+                ("key", models.CharField(max_length=256, unique=True)),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("uploaded", "Uploaded"),
+                            ("processing", "Processing"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="uploaded",
+                        max_length=16,
+                    ),
+                ),
+                ("video_ready", models.BooleanField(default=False)),
+                ("thumbnail_ready", models.BooleanField(default=False)),
+                ("updated_on", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 3.2.11 on 2026-10-18 13:40
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def merge_daily_scores(apps, schema_editor):
+    """Buckets existing scores by day, merging duplicate buckets of a moment"""
+    MomentScores = apps.get_model("backend", "MomentScores")
+    MomentScores.objects.update(day=TruncDate("timestamp"))
+
+    duplicates = (
+        MomentScores.objects.values("moment", "day")
+        .annotate(rows=Count("id"), total=Sum("score"))
+        .filter(rows__gt=1)
+    )
+    for bucket in duplicates.iterator():
+        rows = MomentScores.objects.filter(
+            moment=bucket["moment"], day=bucket["day"]
+        ).order_by("id")
+        keep = rows.first()
+        rows.exclude(id=keep.id).delete()
+        MomentScores.objects.filter(id=keep.id).update(score=bucket["total"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0159_videoprocessing"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="momentscores",
+            name="day",
+            field=models.DateField(null=True),
+        ),
+        migrations.RunPython(merge_daily_scores, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="momentscores",
+            name="day",
+            field=models.DateField(),
+        ),
+        migrations.RemoveIndex(
+            model_name="momentscores",
+            name="backend_mom_moment__5b675d_idx",
+        ),
+        migrations.AddConstraint(
+            model_name="momentscores",
+            constraint=models.UniqueConstraint(
+                fields=("moment", "day"), name="unique_moment_score_day"
+            ),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 3.2.11 on 2026-10-18 16:05
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DateTimeField, F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def seed_unread_counts(apps, schema_editor):
+    NotificationList = apps.get_model("backend", "NotificationList")
+    UnreadNotificationCount = apps.get_model("backend", "UnreadNotificationCount")
+
+    window_start = timezone.now() - timedelta(days=7)
+    UnreadNotificationCount.objects.bulk_create(
+        [
+            UnreadNotificationCount(
+                user_id=row["user_id"],
+                notification_type=row["notification__notification_type"],
+                count=row["count"],
+            )
+            for row in NotificationList.objects.annotate(
+                since=Greatest(
+                    F("user__taggusermeta__last_seen_notifications"),
+                    Value(window_start, output_field=DateTimeField()),
+                )
+            )
+            .filter(notification__timestamp__gt=F("since"))
+            .values("user_id", "notification__notification_type")
+            .annotate(count=Count("id"))
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("backend", "0162_pushoutbox"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UnreadNotificationCount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "notification_type",
+                    models.CharField(
+                        choices=[
+                            ("DFT", "Default"),
+                            ("FRD_REQ", "Friend Request"),
+                            ("FRD_ACPT", "Friend Acceptance"),
+                            ("CMT", "Comment"),
+                            ("LKT", "Link Taggs"),
+                            ("MOM_3+", "Moment 3P"),
+                            ("MOM_FRIEND", "Moment Friend"),
+                            ("INVT_ONBRD", "Invitee Onboarded"),
+                            ("MOM_TAG", "Moment Tag"),
+                            ("SYSTEM_MSG", "System Msg"),
+                            ("P_VIEW", "Profile View"),
+                            ("M_VIEW", "Moment View"),
+                            ("CLICK_TAG", "Click Tag"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="unread_notification_counts",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="unreadnotificationcount",
+            constraint=models.UniqueConstraint(
+                fields=("user", "notification_type"),
+                name="unique_unread_notification_count",
+            ),
+        ),
+        migrations.RunPython(seed_unread_counts, migrations.RunPython.noop),
+    ]
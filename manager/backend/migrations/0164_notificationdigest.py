@@ -0,0 +1,46 @@
+# Generated by Django 3.2.11 on 2026-10-18 17:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("backend", "0163_unreadnotificationcount"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationDigest",
+            fields=[
+                (
+                    "notification",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="digest",
+                        serialize=False,
+                        to="backend.notification",
+                    ),
+                ),
+                ("count", models.IntegerField(default=1)),
+                ("window_end", models.DateTimeField()),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="notificationdigest",
+            index=models.Index(
+                fields=["user", "-window_end"], name="backend_not_user_id_29a451_idx"
+            ),
+        ),
+    ]
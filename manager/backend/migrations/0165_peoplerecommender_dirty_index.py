@@ -0,0 +1,21 @@
+# Generated by Django 3.2.11 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0164_notificationdigest"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="peoplerecommender",
+            index=models.Index(
+                condition=models.Q(("dirty", True)),
+                fields=["recipient"],
+                name="backend_peo_dirty_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.11 on 2026-10-18 18:40
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def compute_scores(apps, schema_editor):
+    PeopleRecommender = apps.get_model("backend", "PeopleRecommender")
+    # SpRecommenderFeatureWeights at the time of this migration
+    PeopleRecommender.objects.update(
+        score=F("friend_feature") * 0.5
+        + F("university_feature") * 0.05
+        + F("badge_feature") * 0.2
+        + F("class_year_feature") * 0.05
+        + F("interested_feature") * 0.2
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0165_peoplerecommender_dirty_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="peoplerecommender",
+            name="score",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name="peoplerecommender",
+            index=models.Index(
+                fields=["recipient", "-score"], name="backend_peo_recipie_852bfc_idx"
+            ),
+        ),
+        migrations.RunPython(compute_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.11 on 2026-10-18 19:30
+
+from django.db import migrations
+
+# icontains and istartswith compile to UPPER("column"::text) LIKE UPPER(...) on
+# Postgres, the indexes are on that expression so the planner can use them.
+# They are built concurrently, backend_tagguser takes writes meanwhile
+SEARCH_COLUMNS = ["username", "first_name", "last_name"]
+
+
+def is_invalid_index(schema_editor, name):
+    """An interrupted concurrent build leaves an invalid index behind"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)",
+            [name],
+        )
+        row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for column in SEARCH_COLUMNS:
+        name = f"backend_tagguser_{column}_trgm"
+        if is_invalid_index(schema_editor, name):
+            schema_editor.execute(f"DROP INDEX CONCURRENTLY {name}")
+        schema_editor.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+            f'ON backend_tagguser USING gin ((UPPER("{column}"::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for column in SEARCH_COLUMNS:
+        schema_editor.execute(
+            f"DROP INDEX CONCURRENTLY IF EXISTS backend_tagguser_{column}_trgm"
+        )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY can't run in a transaction
+    atomic = False
+
+    dependencies = [
+        ("backend", "0166_peoplerecommender_score"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
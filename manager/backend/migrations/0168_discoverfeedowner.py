@@ -0,0 +1,47 @@
+# Generated by Django 3.2.11 on 2026-10-18 21:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def add_feed_owners(apps, schema_editor):
+    DiscoverFeedItem = apps.get_model("backend", "DiscoverFeedItem")
+    DiscoverFeedOwner = apps.get_model("backend", "DiscoverFeedOwner")
+    DiscoverFeedOwner.objects.bulk_create(
+        [
+            DiscoverFeedOwner(user_id=user_id)
+            for user_id in DiscoverFeedItem.objects.order_by()
+            .values_list("user_id", flat=True)
+            .distinct()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("backend", "0167_tagguser_search_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DiscoverFeedOwner",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="discover_feed_owner",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(add_feed_owners, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.11 on 2026-10-18 22:10
+
+from django.db import migrations
+from django.db.models import Count, Max
+
+
+def delete_duplicate_devices(apps, schema_editor):
+    # fcm_django 2 makes registration_id unique, only the latest device of a
+    # token is kept
+    FCMDevice = apps.get_model("fcm_django", "FCMDevice")
+    duplicates = (
+        FCMDevice.objects.order_by()
+        .values("registration_id")
+        .annotate(devices=Count("id"), latest=Max("id"))
+        .filter(devices__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        FCMDevice.objects.filter(
+            registration_id=duplicate["registration_id"]
+        ).exclude(id=duplicate["latest"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("backend", "0168_discoverfeedowner"),
+        ("fcm_django", "0009_alter_fcmdevice_user"),
+    ]
+
+    run_before = [
+        ("fcm_django", "0010_unique_registration_id"),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_devices, migrations.RunPython.noop),
+    ]
@@ -6,8 +6,9 @@ import uuid
 from django.conf import settings
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser
-from django.db import models
-from django.db.models.signals import post_save
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 import pytz
 from rest_framework.authtoken.models import Token
@@ -248,6 +249,22 @@ class BlockedUser(models.Model):
         unique_together = ("blocked", "blocker")
 
 
+def blocked_relation_cache_key(user_id):
+    """
+    Cache key of the ids of users who blocked, or were blocked by, user_id
+    """
+    return f"blocked_relation_ids:{user_id}"
+
+
+@receiver([post_save, post_delete], sender=BlockedUser)
+def invalidate_blocked_relation_ids(sender, instance, **kwargs):
+    keys = [
+        blocked_relation_cache_key(instance.blocker_id),
+        blocked_relation_cache_key(instance.blocked_id),
+    ]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
 class WaitlistUser(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     first_name = models.CharField(max_length=50)
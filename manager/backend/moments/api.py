@@ -1,21 +1,22 @@
 import json
 import logging
 import os
+from collections import defaultdict
 from datetime import datetime, timedelta
 from pickle import OBJ
 from twilio.rest import Client
 import boto3
 import pytz
-import requests
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.http.response import HttpResponse
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
 from ..common.image_manager import profile_pic_url
+from ..common.thumbnail_manager import get_thumbnail_cache, thumbnail_response
 from ..common import image_manager, validator
 from ..common.utils import permission_by_action
 from ..common.validator import check_is_valid_parameter, get_response
@@ -30,9 +31,12 @@ from ..gamification.utils import (
 from ..models import DMViewStage, TaggUser, TaggUserMeta,InvitedUser
 from ..notifications.utils import notify_mentioned_users
 from ..profile.utils import allow_to_view_private_content
+from .feed.utils import get_discover_feed
 from .models import DailyMoment, Moment
 from .moment_category.models import MomentCategory
 from .paginators import DiscoverMomentsPaginator
+from .processing.models import VideoProcessingState
+from .processing.utils import start_video_processing, video_processing_state
 from .serializers import (
     MomentPostSerializer,
     MomentSerializer,
@@ -49,7 +53,7 @@ from .utils import (
     get_user_moments,
     suggest_moments_naive,
 )
-from .views.models import MomentViews
+from .views.utils import add_moment_views
 from ..widget.models import Widget
 
 
@@ -262,15 +266,30 @@ class MomentsViewSet(viewsets.ViewSet):
                 return Response("Not sufficient tagg score to post moment", status=400)
 
             # Create moment object, since upload in frontend was successful
-            moment = Moment.objects.create(
-                user_id=user,
-                caption=caption,
-                date_created=datetime.now(),
-                moment_url=f"{settings.S3_VIDEO_BUCKET_URL}{settings.S3_MOMENTS_FOLDER}/{os.path.splitext(filename)[0]}.mp4",
-                thumbnail_url=f"{settings.S3_VIDEO_BUCKET_URL}{settings.S3_THUMBNAILS_FOLDER}/{os.path.splitext(filename)[0]}-thumbnail.0000000.jpg",
-                resource_path="don't think we're using",
-                moment_category=category,
+            moment, created = start_video_processing(
+                filename,
+                lambda: Moment.objects.create(
+                    user_id=user,
+                    caption=caption,
+                    date_created=datetime.now(),
+                    moment_url=f"{settings.S3_VIDEO_BUCKET_URL}{settings.S3_MOMENTS_FOLDER}/{os.path.splitext(filename)[0]}.mp4",
+                    thumbnail_url=f"{settings.S3_VIDEO_BUCKET_URL}{settings.S3_THUMBNAILS_FOLDER}/{os.path.splitext(filename)[0]}-thumbnail.0000000.jpg",
+                    resource_path="don't think we're using",
+                    moment_category=category,
+                ),
             )
+            if not created and moment.user_id_id != user.id:
+                self.logger.error("filename belongs to another user's moment")
+                return get_response(data="filename is already in use", type=400)
+            if not created:
+                # a retry of an upload that was already recorded
+                return Response(
+                    {
+                        "response_msg": "Success: Created video moment object",
+                        "moment_id": moment.moment_id,
+                    },
+                    status=status.HTTP_200_OK,
+                )
 
             # Reward user with recent moment tagg
             game_profile = GameProfile.objects.get(tagg_user=user.id)
@@ -424,16 +443,17 @@ class MomentsViewSet(viewsets.ViewSet):
         user = user[0]
         categories = list(set(json.loads(user.momentcategory.moments_category)))
         dt = {"moment_category": categories, "moment-list": []}
+        # Serialize every category in one batch, then split per category
+        serialized = MomentPostSerializer(
+            get_user_moments(user, None).filter(moment_category__in=categories),
+            many=True,
+            context={"user": user},
+        ).data
+        moments_by_category = defaultdict(list)
+        for moment in serialized:
+            moments_by_category[moment["moment_category"]].append(moment)
         for category in categories:
-            dt["moment-list"].append(
-                {
-                    category: MomentPostSerializer(
-                        get_user_moments(user, category),
-                        many=True,
-                        context={"user": user},
-                    ).data
-                }
-            )
+            dt["moment-list"].append({category: moments_by_category[category]})
         return Response(dt)
 
     @action(detail=False, methods=["post"])
@@ -470,13 +490,15 @@ class MomentsViewSet(viewsets.ViewSet):
             data = request.query_params
             if not check_is_valid_parameter("moment_id", data):
                 return Response("moment_id is required", 400)
-            moment = Moment.objects.get(moment_id=data["moment_id"])
+            moment = Moment.objects.select_related("video_processing").get(
+                moment_id=data["moment_id"]
+            )
 
-            if (
-                requests.get(moment.thumbnail_url).status_code == 200
-                and requests.get(moment.moment_url).status_code == 200
-            ):
+            state = video_processing_state(moment)
+            if state == VideoProcessingState.DONE:
                 return Response("Done Processing")
+            elif state == VideoProcessingState.FAILED:
+                return Response("Processing failed", 400)
             else:
                 return Response("Still processing", 400)
 
@@ -499,25 +521,19 @@ class MomentThumbnailViewSet(viewsets.ViewSet):
         try:
             moment_object = Moment.objects.filter(moment_id=pk).first()
 
+            if not moment_object:
+                return validator.get_response(data="Moment does not exist", type=404)
+
             # Prevent unauthorized user from viewing a user's thumbnail view of their moment
             user = TaggUser.objects.filter(id=moment_object.user_id_id).first()
             if not allow_to_view_private_content(request.user, user):
                 return Response("Account is private", status=status.HTTP_403_FORBIDDEN)
 
-            if not moment_object:
-                return validator.get_response(data="Moment does not exist", type=404)
-
             moment, ext = os.path.splitext(moment_object.resource_path)
 
             moment = "thumbnails/" + moment + "-thumbnail.jpg"
 
-            client = boto3.client("s3")
-
-            image_obj = client.get_object(
-                Bucket=settings.S3_BUCKET,
-                Key=moment,
-            )["Body"].read()
-            return HttpResponse(image_obj, status=status.HTTP_200_OK)
+            return thumbnail_response(request, moment)
 
         except ValidationError as err:
             self.logger.exception(
@@ -533,6 +549,11 @@ class MomentThumbnailViewSet(viewsets.ViewSet):
                 "Something went wrong", status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=["get"], permission_classes=[IsAdminUser])
+    def cache_metrics(self, request):
+        """Hit rate and bytes served by the thumbnail cache of this process"""
+        return Response(get_thumbnail_cache().metrics())
+
 
 class MomentDiscoverViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
@@ -552,7 +573,7 @@ class MomentDiscoverViewSet(viewsets.ModelViewSet):
             # if not suggested_moments:
             #     suggested_moments = suggest_moments_naive(user)
 
-            suggested_moments = suggest_moments_naive(user)
+            suggested_moments = get_discover_feed(user)
 
             return Response(
                 MomentPostSerializer(
@@ -696,11 +717,7 @@ class MomentCreateViewSet(viewsets.ModelViewSet):
                 moment_id=request.data.get("moment_id")
             ).first()
             if momentsObject:
-                momentsVisitedObject = MomentViews.objects.create(
-                    moment_viewer=user,
-                    moment_viewed=momentsObject,
-                )
-                momentsVisitedObject.save()
+                add_moment_views(momentsObject, user, 1)
 
                 return Response("data got created", status=200)
             else:
@@ -745,15 +762,14 @@ class MomentListViewSet(viewsets.ModelViewSet):
 
         today = datetime.now().date()
         Obj = DailyMoment.objects.filter(user=user, status=False).order_by('-date')[:7]
-        for items in Obj:
-            momentsObject = Moment.objects.filter(moment_id=items.moment_id).first()
-            if momentsObject:
-                data = MomentPostSerializer(
-                    momentsObject,
-                    many=False,
-                    context={"user": user},
-                ).data
-                listMoment.append(data)
+        moments = Moment.objects.in_bulk([items.moment_id for items in Obj])
+        listMoment = list(
+            MomentPostSerializer(
+                [moments[items.moment_id] for items in Obj if items.moment_id in moments],
+                many=True,
+                context={"user": user},
+            ).data
+        )
             
         listMoment.sort(key=itemgetter('date_created'), reverse=True)    
         listMoment.append(lastMoment)
@@ -1,6 +1,9 @@
 import uuid
 
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
 
 from ..models import Moment, TaggUser
 from ...notifications.models import Notification
@@ -43,3 +46,54 @@ class CommentThreads(models.Model):
             models.Index(fields=["parent_comment"]),
             models.Index(fields=["comment_id"]),
         ]
+
+
+def moment_comments_count_key(moment_id):
+    """
+    Cache key of the total number of comments and replies on a moment
+    """
+    return f"moment_comments_count:{moment_id}"
+
+
+def adjust_moment_comments_count(moment_id, delta):
+    def adjust():
+        try:
+            cache.incr(moment_comments_count_key(moment_id), delta)
+        except ValueError:
+            # not cached, the next read computes it
+            pass
+
+    transaction.on_commit(adjust)
+
+
+def invalidate_moment_comments_count(moment_id):
+    transaction.on_commit(lambda: cache.delete(moment_comments_count_key(moment_id)))
+
+
+@receiver(post_save, sender=MomentComments)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        adjust_moment_comments_count(instance.moment_id_id, 1)
+
+
+@receiver(post_save, sender=CommentThreads)
+def thread_created(sender, instance, created, **kwargs):
+    if created:
+        adjust_moment_comments_count(instance.parent_comment.moment_id_id, 1)
+
+
+@receiver(pre_delete, sender=MomentComments)
+def comment_deleted(sender, instance, **kwargs):
+    invalidate_moment_comments_count(instance.moment_id_id)
+
+
+# pre_delete since a cascading delete may remove the parent comment first
+@receiver(pre_delete, sender=CommentThreads)
+def thread_deleted(sender, instance, **kwargs):
+    moment_id = (
+        MomentComments.objects.filter(comment_id=instance.parent_comment_id)
+        .values_list("moment_id", flat=True)
+        .first()
+    )
+    if moment_id:
+        invalidate_moment_comments_count(moment_id)
@@ -8,7 +8,6 @@ from ...reactions.models import (
     Reaction,
 )
 from ..serializers import MomentAndUserSerializer, TaggUserSerializer
-from ..models import Moment
 from .models import MomentComments, CommentThreads
 
 
@@ -20,9 +19,7 @@ class CommentNotificationSerializer(serializers.ModelSerializer):
         fields = ["notification_data", "comment_id"]
 
     def get_notification_data(self, obj):
-        return MomentAndUserSerializer(
-            Moment.objects.filter(moment_id=obj.moment_id_id).first()
-        ).data
+        return MomentAndUserSerializer(obj.moment_id, context=self.context).data
 
 
 class ThreadNotificationSerializer(serializers.ModelSerializer):
@@ -34,7 +31,7 @@ class ThreadNotificationSerializer(serializers.ModelSerializer):
 
     def get_notification_data(self, obj):
         return MomentAndUserSerializer(
-            Moment.objects.filter(moment_id=obj.parent_comment.moment_id_id).first()
+            obj.parent_comment.moment_id, context=self.context
         ).data
 
 
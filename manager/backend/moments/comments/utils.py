@@ -1,6 +1,15 @@
-from django.db.models import Q
+import uuid
 
-from .models import CommentThreads, MomentComments
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from ...models import BlockedUser, blocked_relation_cache_key
+from ..models import Moment
+from .models import MomentComments, moment_comments_count_key
+
+# Cached totals are adjusted on writes, the timeout only bounds drift from races
+COMMENTS_COUNT_CACHE_TIMEOUT = 60 * 60
+BLOCKED_RELATION_CACHE_TIMEOUT = 60 * 60
 
 
 def is_acceptable_comment_length(comment):
@@ -10,32 +19,76 @@ def is_acceptable_comment_length(comment):
 
 
 def get_moment_comments_count(moment_id, request_user=None):
-    def sum_thread(parent_comment):
-        if request_user:
-            return CommentThreads.objects.filter(
-                Q(parent_comment=parent_comment),
-                ~Q(commenter__blocker__blocked=request_user),
-                ~Q(commenter__blocked__blocker=request_user),
-            ).count()
-        else:
-            return CommentThreads.objects.filter(
-                Q(parent_comment=parent_comment),
-            ).count()
-
-    # User should not be able to view comments of the user they are blocked by
-    if request_user:
-        parent_comments = MomentComments.objects.filter(
-            Q(moment_id=moment_id),
-            ~Q(commenter__blocker__blocked=request_user),
-            ~Q(commenter__blocked__blocker=request_user),
+    if isinstance(moment_id, Moment):
+        moment_id = moment_id.moment_id
+    moment_id = uuid.UUID(str(moment_id))
+    return get_moments_comments_counts([moment_id], request_user)[moment_id]
+
+
+def get_blocked_relation_user_ids(request_user):
+    """
+    Ids of users who either blocked, or were blocked by, the request user
+    """
+    if not request_user:
+        return set()
+    key = blocked_relation_cache_key(request_user.id)
+    blocked_ids = cache.get(key)
+    if blocked_ids is None:
+        blocked_ids = set()
+        for blocker_id, blocked_id in BlockedUser.objects.filter(
+            Q(blocker=request_user) | Q(blocked=request_user)
+        ).values_list("blocker_id", "blocked_id"):
+            blocked_ids.add(blocked_id if blocker_id == request_user.id else blocker_id)
+        cache.set(key, blocked_ids, BLOCKED_RELATION_CACHE_TIMEOUT)
+    return blocked_ids
+
+
+def count_moments_comments(moment_ids, blocked_ids=()):
+    """
+    Counts comments and replies on every moment in a single query, leaving out
+    comments by blocked_ids and replies by or under comments by blocked_ids
+    """
+    count = Count("comment_id", distinct=True) + Count("commentthreads")
+    if blocked_ids:
+        count = count - Count(
+            "commentthreads", filter=Q(commentthreads__commenter__in=blocked_ids)
         )
-    else:
-        parent_comments = MomentComments.objects.filter(Q(moment_id=moment_id))
+    counts = {moment_id: 0 for moment_id in moment_ids}
+    for row in (
+        MomentComments.objects.filter(moment_id__in=moment_ids)
+        .exclude(commenter__in=blocked_ids)
+        .values("moment_id")
+        .annotate(count=count)
+    ):
+        counts[row["moment_id"]] = row["count"]
+    return counts
 
-    return (
-        sum([sum_thread(parent_comment) for parent_comment in parent_comments])
-        + parent_comments.count()
-    )
+
+def get_moments_comments_counts(moment_ids, request_user=None):
+    """
+    Batched get_moment_comments_count, returns {moment_id: count}
+
+    Totals are cached per moment and adjusted on comment / reply creation, so
+    a viewer without blocked relations is usually served from the cache alone
+    """
+    blocked_ids = get_blocked_relation_user_ids(request_user)
+    if blocked_ids:
+        return count_moments_comments(moment_ids, blocked_ids)
+
+    keys = {moment_comments_count_key(moment_id): moment_id for moment_id in moment_ids}
+    counts = {keys[key]: count for key, count in cache.get_many(keys).items()}
+    missing = [moment_id for moment_id in moment_ids if moment_id not in counts]
+    if missing:
+        missing_counts = count_moments_comments(missing)
+        cache.set_many(
+            {
+                moment_comments_count_key(moment_id): count
+                for moment_id, count in missing_counts.items()
+            },
+            COMMENTS_COUNT_CACHE_TIMEOUT,
+        )
+        counts.update(missing_counts)
+    return counts
 
 
 def get_moment_comment_preview(moment_id, request_user):
@@ -0,0 +1,65 @@
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ...models import BlockedUser, TaggUser
+from ..models import Moment
+
+
+class DiscoverFeedItem(models.Model):
+    """
+    A moment in a user's materialized discover feed, kept up to date on write
+    so reading a feed is a single range scan of the (user, date_created) index
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        TaggUser, related_name="discover_feed", on_delete=models.CASCADE
+    )
+    moment = models.ForeignKey(
+        Moment, related_name="discover_feed_items", on_delete=models.CASCADE
+    )
+    # copy of moment.date_created, the feed's sort key
+    date_created = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "-date_created"])]
+        unique_together = ("user", "moment")
+
+
+class DiscoverFeedOwner(models.Model):
+    """
+    A user whose discover feed is materialized, new moments are fanned out to
+    these users only
+    """
+
+    user = models.OneToOneField(
+        TaggUser,
+        primary_key=True,
+        related_name="discover_feed_owner",
+        on_delete=models.CASCADE,
+    )
+
+
+# Rows of deleted moments and users go with them through the cascade
+
+
+@receiver(post_save, sender=Moment)
+def moment_created(sender, instance, created, **kwargs):
+    from .utils import fan_out_moment
+
+    if created:
+        transaction.on_commit(lambda: fan_out_moment(str(instance.moment_id)))
+
+
+@receiver([post_save, post_delete], sender=BlockedUser)
+def block_changed(sender, instance, **kwargs):
+    from .utils import rebuild_blocked_discover_feeds
+
+    if kwargs.get("created") is False:
+        return
+    transaction.on_commit(
+        lambda: rebuild_blocked_discover_feeds(
+            [str(instance.blocker_id), str(instance.blocked_id)]
+        )
+    )
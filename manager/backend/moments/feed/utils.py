@@ -0,0 +1,175 @@
+import logging
+
+from background_task import background
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from ...common.constants import (
+    DISCOVER_FEED_BATCH_SIZE,
+    DISCOVER_FEED_LENGTH,
+    NUM_MOMENT_RECOMMENDATAIONS,
+)
+from ...common.utils import chunks
+from ...models import TaggUser
+from ..comments.utils import get_blocked_relation_user_ids
+from ..models import Moment
+from ..utils import suggest_moments_naive
+from .models import DiscoverFeedItem, DiscoverFeedOwner
+
+logger = logging.getLogger(__name__)
+
+
+def get_discover_feed(user, limit=NUM_MOMENT_RECOMMENDATAIONS):
+    """
+    Latest moments from the user's discover feed, building it on first read.
+    A feed that was built empty is left to the fan-out rather than rebuilt on
+    every read
+    """
+
+    def read():
+        return list(
+            Moment.objects.filter(discover_feed_items__user=user).order_by(
+                "-discover_feed_items__date_created"
+            )[:limit]
+        )
+
+    moments = read()
+    if (
+        not moments
+        and not DiscoverFeedOwner.objects.filter(user=user).exists()
+        and rebuild_discover_feed(user)
+    ):
+        moments = read()
+    return moments
+
+
+def rebuild_discover_feed(user):
+    """
+    Replaces the user's feed with the latest DISCOVER_FEED_LENGTH moments of
+    users they have no block relation with
+
+    Returns:
+        Number of moments in the feed
+    """
+    items = [
+        DiscoverFeedItem(user=user, moment_id=moment_id, date_created=date_created)
+        for moment_id, date_created in suggest_moments_naive(
+            user, DISCOVER_FEED_LENGTH
+        ).values_list("moment_id", "date_created")
+    ]
+    with transaction.atomic():
+        DiscoverFeedOwner.objects.get_or_create(user=user)
+        DiscoverFeedItem.objects.filter(user=user).delete()
+        DiscoverFeedItem.objects.bulk_create(items, batch_size=DISCOVER_FEED_BATCH_SIZE)
+    return len(items)
+
+
+def rebuild_discover_feeds(user_ids):
+    """
+    Rebuilds the feed of every user in user_ids
+
+    Returns:
+        Number of feeds rebuilt
+    """
+    rebuilt = 0
+    for user in TaggUser.objects.filter(id__in=user_ids).iterator():
+        rebuild_discover_feed(user)
+        rebuilt += 1
+    return rebuilt
+
+
+@background(schedule=0)
+def rebuild_blocked_discover_feeds(user_ids):
+    """
+    Rebuilds the feeds of the users of a block relation that changed, users
+    without a feed get one built on first read
+
+    Returns:
+        Number of feeds rebuilt
+    """
+    return rebuild_discover_feeds(
+        DiscoverFeedOwner.objects.filter(user__in=user_ids).values_list(
+            "user_id", flat=True
+        )
+    )
+
+
+def trim_discover_feeds(user_ids):
+    """
+    Drops everything past the DISCOVER_FEED_LENGTH latest moments of each feed
+    """
+    cutoff = (
+        DiscoverFeedItem.objects.filter(user=OuterRef("user"))
+        .order_by("-date_created")
+        .values("date_created")[DISCOVER_FEED_LENGTH : DISCOVER_FEED_LENGTH + 1]
+    )
+    DiscoverFeedItem.objects.filter(
+        user__in=user_ids, date_created__lte=Subquery(cutoff)
+    ).delete()
+
+
+@background(schedule=0)
+def fan_out_moment(moment_id):
+    """
+    Pushes a new moment to the feed of every user who has one and no block
+    relation with its owner. Feeds that don't exist yet are built on first read
+
+    Returns:
+        Number of feeds the moment was added to
+    """
+    moment = Moment.objects.filter(moment_id=moment_id).first()
+    if moment is None:
+        # deleted before the task ran
+        return 0
+    blocked_ids = get_blocked_relation_user_ids(moment.user_id)
+    user_ids = list(
+        DiscoverFeedOwner.objects.exclude(user__in=blocked_ids).values_list(
+            "user_id", flat=True
+        )
+    )
+    for user_chunk in chunks(user_ids, DISCOVER_FEED_BATCH_SIZE):
+        DiscoverFeedItem.objects.bulk_create(
+            [
+                DiscoverFeedItem(
+                    user_id=user_id,
+                    moment_id=moment.moment_id,
+                    date_created=moment.date_created,
+                )
+                for user_id in user_chunk
+            ],
+            ignore_conflicts=True,
+        )
+        trim_discover_feeds(user_chunk)
+    return len(user_ids)
+
+
+def check_discover_feeds(user_ids=None, fix=False):
+    """
+    Compares stored feeds against the latest moments the user can see
+
+    Args:
+        user_ids: (list) users to check, every user with a feed by default
+        fix: (bool) rebuild the feeds found to be inconsistent
+
+    Returns:
+        dict of feeds checked, inconsistent and rebuilt
+    """
+    if user_ids is None:
+        user_ids = DiscoverFeedOwner.objects.values_list("user_id", flat=True)
+    stats = {"checked": 0, "inconsistent": 0, "rebuilt": 0}
+    for user in TaggUser.objects.filter(id__in=list(user_ids)).iterator():
+        stored = [moment.moment_id for moment in get_discover_feed(user)]
+        expected = list(suggest_moments_naive(user).values_list("moment_id", flat=True))
+        stats["checked"] += 1
+        if stored == expected:
+            continue
+        stats["inconsistent"] += 1
+        logger.warning(
+            f"Discover feed of {user.username} is inconsistent: "
+            f"{len(set(expected) - set(stored))} missing, "
+            f"{len(set(stored) - set(expected))} unexpected"
+        )
+        if fix:
+            rebuild_discover_feed(user)
+            stats["rebuilt"] += 1
+    return stats
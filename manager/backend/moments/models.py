@@ -49,12 +49,19 @@ class MomentScoreWeights(Enum):
     MOMENTVIEW = 10 #to increase moment score by 10 for every 50 views on a moment
 
 class MomentScores(models.Model):
+    """A moment's score for one day, see increase_moment_scores"""
+
     moment = models.ForeignKey(Moment, related_name="moment", on_delete=models.CASCADE)
     score = models.DecimalField(default=0, decimal_places=4, max_digits=46)
     timestamp = models.DateTimeField(auto_now_add=True)
+    day = models.DateField()
 
     class Meta:
-        indexes = [models.Index(fields=["moment", "timestamp"])]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["moment", "day"], name="unique_moment_score_day"
+            )
+        ]
 
 class DailyMoment(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
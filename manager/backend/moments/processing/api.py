@@ -0,0 +1,82 @@
+import logging
+from hmac import compare_digest
+from urllib.parse import unquote_plus
+
+from django.conf import settings
+from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+
+from ...common.validator import check_is_valid_parameter
+from .models import VideoProcessingState
+from .utils import (
+    mark_video_output_ready,
+    transition_video_processing,
+    video_processing_key,
+)
+
+
+class VideoProcessingViewSet(viewsets.ViewSet):
+    """
+    Called by the transcoder, authenticated with the shared secret in the
+    X-Processing-Secret header
+    """
+
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def __init__(self, *args, **kwargs):
+        super(VideoProcessingViewSet, self).__init__(*args, **kwargs)
+        self.logger = logging.getLogger(__name__)
+
+    def is_authorized(self, request):
+        secret = settings.VIDEO_PROCESSING_CALLBACK_SECRET
+        return bool(secret) and compare_digest(
+            request.headers.get("X-Processing-Secret", ""), secret
+        )
+
+    @action(detail=False, methods=["post"])
+    def callback(self, request):
+        """
+        Moves a video to a new state
+        Args:
+            filename: name of the uploaded video
+            state: processing, done or failed
+        """
+        try:
+            if not self.is_authorized(request):
+                return Response("Unauthorized", 401)
+
+            data = request.data
+            if not check_is_valid_parameter("filename", data):
+                return Response("filename is required", 400)
+            if data.get("state") not in VideoProcessingState.values:
+                return Response("state is invalid", 400)
+
+            moved = transition_video_processing(
+                video_processing_key(data["filename"]), data["state"]
+            )
+            return Response({"updated": moved})
+        except Exception as e:
+            self.logger.exception(e)
+            return Response("Something went wrong", 500)
+
+    @action(detail=False, methods=["post"])
+    def s3_event(self, request):
+        """Marks the outputs in an S3 ObjectCreated event notification as ready"""
+        try:
+            if not self.is_authorized(request):
+                return Response("Unauthorized", 401)
+
+            object_keys = [
+                unquote_plus(record["s3"]["object"]["key"])
+                for record in request.data.get("Records", [])
+            ]
+            updated = sum(mark_video_output_ready(key) for key in object_keys)
+            return Response({"updated": updated})
+        except (KeyError, TypeError):
+            return Response("Invalid event", 400)
+        except Exception as e:
+            self.logger.exception(e)
+            return Response("Something went wrong", 500)
@@ -0,0 +1,56 @@
+from django.db import models
+
+from ..models import Moment
+
+
+class VideoProcessingState(models.TextChoices):
+    """
+    UPLOADED: The client finished uploading, the transcoder has not reported yet
+    PROCESSING: The transcoder picked the video up
+    DONE: Both the transcoded video and its thumbnail are on S3
+    FAILED: The transcoder gave up, it may retry
+    """
+
+    UPLOADED = "uploaded"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+
+
+# States each state can move to
+VIDEO_PROCESSING_TRANSITIONS = {
+    VideoProcessingState.UPLOADED: {
+        VideoProcessingState.PROCESSING,
+        VideoProcessingState.DONE,
+        VideoProcessingState.FAILED,
+    },
+    VideoProcessingState.PROCESSING: {
+        VideoProcessingState.DONE,
+        VideoProcessingState.FAILED,
+    },
+    VideoProcessingState.FAILED: {
+        VideoProcessingState.PROCESSING,
+        VideoProcessingState.DONE,
+    },
+    VideoProcessingState.DONE: set(),
+}
+
+
+class VideoProcessing(models.Model):
+    """Processing status of a video moment, keyed by the uploaded file name"""
+
+    moment = models.OneToOneField(
+        Moment,
+        related_name="video_processing",
+        on_delete=models.CASCADE,
+        primary_key=True,
+    )
+    key = models.CharField(max_length=256, unique=True)
+    state = models.CharField(
+        max_length=16,
+        choices=VideoProcessingState.choices,
+        default=VideoProcessingState.UPLOADED,
+    )
+    video_ready = models.BooleanField(default=False)
+    thumbnail_ready = models.BooleanField(default=False)
+    updated_on = models.DateTimeField(auto_now=True)
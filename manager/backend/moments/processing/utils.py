@@ -0,0 +1,139 @@
+import logging
+import os
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .models import VIDEO_PROCESSING_TRANSITIONS, VideoProcessing, VideoProcessingState
+
+logger = logging.getLogger(__name__)
+
+# Fallback HEAD checks are cached this many seconds per moment
+VIDEO_HEAD_CACHE_TIMEOUT = 5
+VIDEO_HEAD_TIMEOUT = 3
+
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=32))
+_session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=32))
+
+
+def video_processing_key(filename):
+    """Key of an uploaded video, its file name without extension"""
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def start_video_processing(filename, create_moment):
+    """
+    Creates the moment of an uploaded video with create_moment() along with
+    its processing status, atomically. Retries of the same upload return the
+    moment created the first time
+
+    Returns:
+        (moment, created)
+    """
+    key = video_processing_key(filename)
+    existing = VideoProcessing.objects.select_related("moment").filter(key=key).first()
+    if existing is not None:
+        return existing.moment, False
+    try:
+        with transaction.atomic():
+            moment = create_moment()
+            VideoProcessing.objects.create(moment=moment, key=key)
+    except IntegrityError:
+        # a concurrent retry won the key, this moment was rolled back
+        existing = (
+            VideoProcessing.objects.select_related("moment").filter(key=key).first()
+        )
+        if existing is None:
+            raise
+        return existing.moment, False
+    return moment, True
+
+
+def transition_video_processing(key, state, **filters):
+    """
+    Moves a video to state if the state machine allows it, in a single
+    conditional update so concurrent callbacks can't go backwards
+
+    Returns:
+        True if the video moved to state
+    """
+    sources = [
+        source
+        for source, targets in VIDEO_PROCESSING_TRANSITIONS.items()
+        if state in targets
+    ]
+    updates = {"state": state, "updated_on": timezone.now()}
+    if state == VideoProcessingState.DONE:
+        updates.update(video_ready=True, thumbnail_ready=True)
+    return bool(
+        VideoProcessing.objects.filter(key=key, state__in=sources, **filters).update(
+            **updates
+        )
+    )
+
+
+def mark_video_output_ready(object_key):
+    """
+    Records that the transcoder wrote object_key, the video is done once both
+    the video and its thumbnail are written
+
+    Returns:
+        True if object_key is a known output
+    """
+    folder, name = os.path.split(object_key)
+    if folder == settings.S3_THUMBNAILS_FOLDER:
+        key, output = name.rsplit("-thumbnail", 1)[0], "thumbnail_ready"
+    elif folder == settings.S3_MOMENTS_FOLDER:
+        key, output = video_processing_key(name), "video_ready"
+    else:
+        return False
+
+    if not VideoProcessing.objects.filter(key=key).update(
+        **{output: True, "updated_on": timezone.now()}
+    ):
+        return False
+    transition_video_processing(
+        key, VideoProcessingState.DONE, video_ready=True, thumbnail_ready=True
+    )
+    return True
+
+
+def _url_exists(url):
+    try:
+        return _session.head(url, timeout=VIDEO_HEAD_TIMEOUT).status_code == 200
+    except requests.RequestException:
+        logger.exception(f"HEAD {url} failed")
+        return False
+
+
+def video_processing_state(moment):
+    """
+    Processing state of a video moment. Until the transcoder reports back the
+    outputs are checked with HEAD requests, cached for a few seconds
+
+    Args:
+        moment: (Moment) with video_processing selected
+    """
+    processing = getattr(moment, "video_processing", None)
+    if processing and processing.state in (
+        VideoProcessingState.DONE,
+        VideoProcessingState.FAILED,
+    ):
+        return processing.state
+
+    cache_key = f"video_outputs_available:{moment.moment_id}"
+    available = cache.get(cache_key)
+    if available is None:
+        available = _url_exists(moment.thumbnail_url) and _url_exists(moment.moment_url)
+        cache.set(cache_key, available, VIDEO_HEAD_CACHE_TIMEOUT)
+
+    if not available:
+        return processing.state if processing else VideoProcessingState.PROCESSING
+    if processing:
+        transition_video_processing(processing.key, VideoProcessingState.DONE)
+    return VideoProcessingState.DONE
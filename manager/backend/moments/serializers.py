@@ -1,10 +1,11 @@
+from django.db import models
 from rest_framework import serializers
 
+from ..common.image_manager import profile_thumbnail_urls
+from ..models import TaggUser
 from ..serializers import TaggUserSerializer
-from .comments.utils import get_moment_comments_count
+from .comments.utils import get_moment_comments_count, get_moments_comments_counts
 from .models import Moment
-from .shares.models import MomentShares
-from .views.models import MomentViews
 
 
 class MomentSerializer(serializers.ModelSerializer):
@@ -25,10 +26,27 @@ class MomentSerializer(serializers.ModelSerializer):
         ]
 
     def get_view_count(self, obj):
-        return MomentViews.objects.filter(moment_viewed=obj.moment_id).count()
+        return obj.view_count
 
     def get_share_count(self, obj):
-        return MomentShares.objects.filter(moment_shared=obj.moment_id).count()
+        return obj.share_count
+
+
+class MomentPostListSerializer(serializers.ListSerializer):
+    """
+    Serializes a page of moments in a fixed number of queries: comment counts
+    and owner cards are resolved for the whole page up front
+    """
+
+    def to_representation(self, data):
+        moments = list(data.all() if isinstance(data, models.Manager) else data)
+        if not moments:
+            return []
+        self.child.batch = self.child.get_batch(moments)
+        try:
+            return [self.child.to_representation(moment) for moment in moments]
+        finally:
+            self.child.batch = None
 
 
 class MomentPostSerializer(serializers.ModelSerializer):
@@ -38,6 +56,9 @@ class MomentPostSerializer(serializers.ModelSerializer):
     # added "user" here since "user_id" is a bad variable name
     user = serializers.SerializerMethodField()
 
+    # set by MomentPostListSerializer while serializing a page of moments
+    batch = None
+
     class Meta:
         model = Moment
         fields = [
@@ -52,25 +73,47 @@ class MomentPostSerializer(serializers.ModelSerializer):
             "comments_count",
             "user",
         ]
+        list_serializer_class = MomentPostListSerializer
 
-    def get_comments_count(self, obj):
+    def get_comments_user(self):
         if not self.context.get("user"):
             raise NotImplementedError("user context is required")
-        return get_moment_comments_count(obj.moment_id, self.context.get("user"))
+        return self.context.get("user")
+
+    def get_batch(self, moments):
+        moment_ids = [moment.moment_id for moment in moments]
+        owner_ids = list({moment.user_id_id for moment in moments})
+        return {
+            "comments_counts": get_moments_comments_counts(
+                moment_ids, self.get_comments_user()
+            ),
+            "owners": TaggUser.objects.in_bulk(owner_ids),
+            "thumbnail_urls": profile_thumbnail_urls(owner_ids),
+        }
+
+    def get_comments_count(self, obj):
+        if self.batch:
+            return self.batch["comments_counts"][obj.moment_id]
+        return get_moment_comments_count(obj.moment_id, self.get_comments_user())
 
     def get_user(self, obj):
+        if self.batch:
+            return TaggUserSerializer(
+                self.batch["owners"][obj.user_id_id],
+                context={"thumbnail_urls": self.batch["thumbnail_urls"]},
+            ).data
         return TaggUserSerializer(obj.user_id).data
 
     def get_view_count(self, obj):
-        return MomentViews.objects.filter(moment_viewed=obj.moment_id).count()
+        return obj.view_count
 
     def get_share_count(self, obj):
-        return MomentShares.objects.filter(moment_shared=obj.moment_id).count()
+        return obj.share_count
 
 
 class PublicMomentPostSerializer(MomentPostSerializer):
-    def get_comments_count(self, obj):
-        return get_moment_comments_count(obj.moment_id, None)
+    def get_comments_user(self):
+        return None
 
 
 # consider banner_info serializer - TODO -
@@ -101,7 +144,7 @@ class MomentBannerInfoSerializer(serializers.ModelSerializer):
         return get_moment_comments_count(obj.moment_id, self.context.get("user"))
 
     def get_view_count(self, obj):
-        return MomentViews.objects.filter(moment_viewed=obj.moment_id).count()
+        return obj.view_count
 
 
 class MomentAndUserSerializer(serializers.ModelSerializer):
@@ -114,10 +157,10 @@ class MomentAndUserSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
     def get_user(self, obj):
-        return TaggUserSerializer(obj.user_id).data
+        return TaggUserSerializer(obj.user_id, context=self.context).data
 
     def get_view_count(self, obj):
-        return MomentViews.objects.filter(moment_viewed=obj.moment_id).count()
+        return obj.view_count
 
     def get_share_count(self, obj):
-        return MomentShares.objects.filter(moment_shared=obj.moment_id).count()
+        return obj.share_count
@@ -6,7 +6,6 @@ from rest_framework.response import Response
 
 from ...profile.utils import allow_to_view_private_content
 from ..models import Moment
-from .models import MomentShares
 from .utils import record_moment_share
 
 
@@ -43,9 +42,7 @@ class MomentShareViewSet(viewsets.ViewSet):
 
             # Add view if requester is not the moment poster themselves
             # if not request.user == moment.user_id:
-            record_moment_share(moment, request.user)
-
-            share_count = MomentShares.objects.filter(moment_shared=moment).count()
+            share_count = record_moment_share(moment, request.user)
 
             # self.logger.info("test TOTAL: {}".format(share_count))
 
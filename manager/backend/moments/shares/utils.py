@@ -1,21 +1,42 @@
 import logging
 
-from ...moments.models import MomentScoreWeights
+from ...common.counter_manager import WriteBehindCounter
+from ...moments.models import Moment, MomentScoreWeights
 from ..utils import increase_moment_score
 from .models import MomentShares
 
+moment_share_counter = WriteBehindCounter(
+    "moment_shares",
+    seed=lambda pk: MomentShares.objects.filter(moment_shared=pk).count(),
+    model=Moment,
+    field="share_count",
+)
+
 
 def record_moment_share(moment, sharer):
     """
-    To record a view for the given moment by a given user
+    To record a share for the given moment by a given user
+
+    Returns:
+        Share count of the moment after the share
     """
     try:
-
-        share = MomentShares.objects.create(moment_shared=moment, moment_sharer=sharer)
+        # bumped before the insert, a cold counter is seeded from MomentShares
+        share_count = moment_share_counter.incr(moment.moment_id)
+        try:
+            share = MomentShares.objects.create(
+                moment_shared=moment, moment_sharer=sharer
+            )
+        except Exception:
+            # the flush never lowers the column, undo the bump before it's
+            # written
+            moment_share_counter.incr(moment.moment_id, -1)
+            raise
 
         # Update moment score table
         if share:
             increase_moment_score(moment, MomentScoreWeights.SHARE.value)
+            return share_count
 
         else:
             raise Exception
@@ -14,6 +14,7 @@ from .api import (
     SkinPermissionViewSet
 )
 
+from .processing.api import VideoProcessingViewSet
 from .shares.api import MomentShareViewSet
 from .views.api import MomentViewsViewSet, MomentCoinDisplayViewSet
 
@@ -29,6 +30,7 @@ router.register("api/rewardCheck", ProfileRewardViewSet, "rewardadmin")
 router.register("api/momentList", MomentListViewSet, "moment")
 router.register("api/moment-view", MomentViewsViewSet, "moment-view")
 router.register("api/moment-share", MomentShareViewSet, "moment-share")
+router.register("api/video-processing", VideoProcessingViewSet, "video-processing")
 router.register("api/moment-daily",DailyMomentViewSet, "daily-moments")
 router.register("api/moment-coin-display", MomentCoinDisplayViewSet, "moment-coin-display")
 router.register("api/invite-users",InvitedViewSet , "users-invite")
@@ -1,17 +1,31 @@
 import decimal
 import logging
+import multiprocessing
 import re
+import resource
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from telnetlib import STATUS
 
 import pytz
+from django.db import connection, connections
 from django.db.models import Q
+from django.utils import timezone
 import random
 from backend.models import TaggUserMeta,TaggUser
 
-from ..common.constants import NUM_MOMENT_RECOMMENDATAIONS
+from ..common.constants import (
+    DAILY_MOMENTS_BATCH_SIZE,
+    DAILY_MOMENTS_PER_USER,
+    DAILY_MOMENTS_USER_CHUNK,
+    MOMENT_SCORES_BATCH_SIZE,
+    NUM_MOMENT_RECOMMENDATAIONS,
+)
 from ..common.image_manager import moment_thumbnail_url
 from ..common.tagg_data_science import calculate_engagement_value
+from ..common.utils import chunks
 from .models import Moment, MomentEngagement, MomentScores,DailyMoment
 
 logger = logging.getLogger(__name__)
@@ -65,7 +79,7 @@ def get_user_moments(user, category):
         return Moment.objects.filter(user_id=user).order_by("-date_created")
 
 
-def suggest_moments_naive(user):
+def suggest_moments_naive(user, limit=NUM_MOMENT_RECOMMENDATAIONS):
     # recent_moments = Moment.objects.filter(~Q(user_id=user)).order_by("-date_created")[
     #     :50
     # ]
@@ -74,7 +88,7 @@ def suggest_moments_naive(user):
         ~Q(user_id__blocked__blocker=user.id),
         ~Q(user_id__blocker__blocked=user.id),
     ).order_by("-date_created")
-    return recent_moments[:NUM_MOMENT_RECOMMENDATAIONS]
+    return recent_moments[:limit]
 
 
 def keep_only_top_x_engaged_moment_posts(user, x):
@@ -86,57 +100,189 @@ def keep_only_top_x_engaged_moment_posts(user, x):
         me.delete()
 
 
-def increase_moment_score(moment, score):
+# Columns written by increase_moment_scores
+SCORE_COLUMNS = ["moment", "day", "score", "timestamp"]
+
+
+def increase_moment_scores(deltas):
     """
-    To record a view for the given moment by a given user
+    Adds score deltas to today's bucket of each moment. Buckets are created or
+    incremented by a single INSERT ... ON CONFLICT DO UPDATE per batch, so
+    concurrent callers neither lose updates nor create duplicate buckets
+
+    Args:
+        deltas: iterable of (moment or moment id, score delta)
     """
-    try:
-        lowerbound = pytz.UTC.localize(datetime.now()).replace(
-            hour=0, minute=0, second=0
-        )
-        upperbound = pytz.UTC.localize(datetime.now()).replace(
-            hour=23, minute=59, second=59
-        )
-        if MomentScores.objects.filter(
-            moment=moment, timestamp__lte=upperbound, timestamp__gte=lowerbound
-        ).exists():
-            score_card = MomentScores.objects.filter(
-                moment=moment, timestamp__lte=upperbound, timestamp__gte=lowerbound
-            )[0]
-            score_card.score = score_card.score + decimal.Decimal(score)
-            score_card.save()
-        else:
-            MomentScores.objects.create(
-                moment=moment,
-                score=score,
+    totals = defaultdict(decimal.Decimal)
+    for moment, delta in deltas:
+        moment_id = moment.pk if isinstance(moment, Moment) else moment
+        totals[Moment._meta.pk.to_python(moment_id)] += decimal.Decimal(str(delta))
+    if not totals:
+        return
+
+    now = timezone.now()
+    table = connection.ops.quote_name(MomentScores._meta.db_table)
+    fields = [MomentScores._meta.get_field(name) for name in SCORE_COLUMNS]
+    moment, day, score, timestamp = [
+        connection.ops.quote_name(field.column) for field in fields
+    ]
+    for batch in chunks(list(totals.items()), MOMENT_SCORES_BATCH_SIZE):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({moment}, {day}, {score}, {timestamp}) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s)'] * len(batch))} "
+                f"ON CONFLICT ({moment}, {day}) "
+                f"DO UPDATE SET {score} = {table}.{score} + EXCLUDED.{score}",
+                [
+                    field.get_db_prep_save(value, connection)
+                    for moment_id, delta in batch
+                    for field, value in zip(
+                        fields, (moment_id, now.date(), delta, now)
+                    )
+                ],
             )
 
+
+def increase_moment_score(moment, score):
+    """
+    To add score to today's bucket of the given moment
+    """
+    try:
+        increase_moment_scores([(moment, score)])
     except Exception as err:
         logging.error("There was a problem while recording a moment view ", err)
         raise Exception
 
-def dailyMoments():
-        today=datetime.now().date()
-        users= TaggUserMeta.objects.filter(is_onboarded=True)
-        for user in users:
-            if user.user_id:
-                taggUser=TaggUser.objects.filter(id=user.user_id).first()
-                if taggUser:
-                    dailyObj=DailyMoment.objects.filter(date=today,user=taggUser)
-                    if not dailyObj:
-                        momentsObj=Moment.objects.filter(~Q(user_id=taggUser))
-                        moments = list(momentsObj)
-                        random.shuffle(moments)
-                        for momentObj in moments:
-                            if momentObj.user_id_id:
-                                owner=TaggUser.objects.filter(id=momentObj.user_id_id).first()
-                                if owner:
-                                    ObjCheck=DailyMoment.objects.filter(user=taggUser,moment=momentObj)
-                                    objCheck3=DailyMoment.objects.filter(user=taggUser,date=today,owner_id=owner)
-                                    ObjCheck2=DailyMoment.objects.filter(user=taggUser,date=today).count()
-                                    if ObjCheck2==7:
-                                        break
-                                    if not ObjCheck and ObjCheck2<7:
-                                        if not objCheck3:
-                                            DailyMoment.objects.create(date=today,user=taggUser,moment=momentObj,status=False,owner_id=owner)
-                                            
\ No newline at end of file
+
+def _lazy_permutation(n, rng):
+    """
+    Yields a uniformly random permutation of range(n), one index at a time, so
+    that callers stopping early only pay for what they consume
+    """
+    swapped = {}
+    for i in range(n):
+        j = rng.randrange(i, n)
+        yield swapped.get(j, j)
+        swapped[j] = swapped.get(i, i)
+
+
+def _pick_daily_moments(user_id, seen, moments, rng):
+    """
+    Picks up to DAILY_MOMENTS_PER_USER random moments from distinct owners that
+    the user neither owns nor has been given before
+
+    Args:
+        seen: (set) ids of moments the user was given on previous days
+        moments: (list) (moment_id, owner_id) of every moment
+    """
+    picked = []
+    owners = set()
+    for index in _lazy_permutation(len(moments), rng):
+        moment_id, owner_id = moments[index]
+        if owner_id == user_id or owner_id in owners or moment_id in seen:
+            continue
+        picked.append((moment_id, owner_id))
+        owners.add(owner_id)
+        if len(picked) == DAILY_MOMENTS_PER_USER:
+            break
+    return picked
+
+
+def _generate_daily_moments(user_ids, moments, today):
+    """
+    Generates and writes today's daily moments for a chunk of users
+
+    Returns:
+        Number of rows written
+    """
+    seen = defaultdict(set)
+    for user_id, moment_id in DailyMoment.objects.filter(user__in=user_ids).values_list(
+        "user_id", "moment_id"
+    ):
+        seen[user_id].add(moment_id)
+
+    rng = random.Random()
+    daily_moments = [
+        DailyMoment(
+            user_id=user_id,
+            moment_id=moment_id,
+            owner_id_id=owner_id,
+            date=today,
+            status=False,
+        )
+        for user_id in user_ids
+        for moment_id, owner_id in _pick_daily_moments(
+            user_id, seen[user_id], moments, rng
+        )
+    ]
+    DailyMoment.objects.bulk_create(daily_moments, batch_size=DAILY_MOMENTS_BATCH_SIZE)
+    return len(daily_moments)
+
+
+# Moment pool shared with process pool workers, set by the worker initializer
+_worker_moments = None
+
+
+def _init_daily_moments_worker(moments):
+    global _worker_moments
+    _worker_moments = moments
+
+
+def _generate_daily_moments_in_worker(user_ids, today):
+    return _generate_daily_moments(user_ids, _worker_moments, today)
+
+
+def dailyMoments(workers=None):
+    """
+    Gives every onboarded user without daily moments for today up to
+    DAILY_MOMENTS_PER_USER unseen moments from distinct owners
+
+    Args:
+        workers: (int) spread user chunks across this many processes
+
+    Returns:
+        dict of rows written, elapsed seconds, rows/sec and peak memory in KB
+    """
+    start = time.monotonic()
+    today = datetime.now().date()
+
+    user_ids = list(
+        TaggUserMeta.objects.filter(is_onboarded=True)
+        .exclude(user__dailymoment__date=today)
+        .values_list("user_id", flat=True)
+    )
+    moments = list(Moment.objects.values_list("moment_id", "user_id"))
+    user_chunks = list(chunks(user_ids, DAILY_MOMENTS_USER_CHUNK))
+
+    rows = 0
+    if workers and workers > 1 and len(user_chunks) > 1:
+        # forked workers must open their own database connections
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_daily_moments_worker,
+            initargs=(moments,),
+        ) as executor:
+            rows = sum(
+                executor.map(
+                    _generate_daily_moments_in_worker,
+                    user_chunks,
+                    [today] * len(user_chunks),
+                )
+            )
+    else:
+        for user_chunk in user_chunks:
+            rows += _generate_daily_moments(user_chunk, moments, today)
+
+    elapsed = time.monotonic() - start
+    stats = {
+        "users": len(user_ids),
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed else rows,
+        "peak_memory_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }
+    logger.info(f"Generated daily moments: {stats}")
+    return stats
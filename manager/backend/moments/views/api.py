@@ -14,7 +14,7 @@ from ...common.tagg_data_science import calculate_engagement_value
 from ...moments.models import Moment, MomentEngagement
 from ...moments.views.models import MomentViews
 from ...moments.utils import keep_only_top_x_engaged_moment_posts
-from ...moments.views.utils import record_moment_view
+from ...moments.views.utils import moment_view_counter, record_moment_view
 from ...models import TaggUser
 
 
@@ -104,9 +104,7 @@ class MomentCoinDisplayViewSet(viewsets.ViewSet):
 
             momentId = request.query_params.get('moment_id')
             #tma-2115 we take out moment views and take the score from those views, after that we round of the score so user see growth of 10 coins per 50 views
-            moment_view_count = MomentViews.objects.filter(
-                moment_viewed=momentId
-            ).count()
+            moment_view_count = moment_view_counter.get(momentId)
             total_score = moment_view_count//5
             round_off = total_score - (total_score % 10)
             data = {
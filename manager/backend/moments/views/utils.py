@@ -1,3 +1,4 @@
+from collections import defaultdict
 from datetime import datetime, timedelta
 import logging
 import random
@@ -11,24 +12,97 @@ from ...common.notification_manager import (
     NotificationType,
     handle_notification_with_images,
 )
+from ...common.counter_manager import WriteBehindCounter
 from ...common.image_manager import profile_pic_url
+from ...common.utils import iter_chunks
 from ...gamification.constants import TAGG_SCORE_ALLOTMENT
 from ...gamification.utils import TaggScoreUpdateException, increase_tagg_score
 
 
+moment_view_counter = WriteBehindCounter(
+    "moment_views",
+    seed=lambda pk: MomentViews.objects.filter(moment_viewed=pk).count(),
+    model=Moment,
+    field="view_count",
+)
+
+# Total views across all of a user's moments, never flushed
+owner_moment_view_counter = WriteBehindCounter(
+    "owner_moment_views",
+    seed=lambda pk: MomentViews.objects.filter(moment_viewed__user_id=pk).count(),
+)
+
+
+def crossed_multiples(old_value, new_value, step):
+    """
+    Multiples of step in (old_value, new_value]
+    """
+    return range((old_value // step + 1) * step, new_value + 1, step)
+
+
+def add_moment_views(moment, viewer, count):
+    """
+    Inserts count view records and bumps the view counters
+
+    Returns:
+        (moment views, owner's total moment views) before and after the views
+    """
+    # Counters are bumped first since a cold counter is seeded from the
+    # MomentViews rows, which must not include the new views yet
+    moment_views = moment_view_counter.incr(moment.moment_id, count)
+    total_views = owner_moment_view_counter.incr(moment.user_id_id, count)
+    now = pytz.UTC.localize(datetime.now())
+    MomentViews.objects.bulk_create(
+        [
+            MomentViews(moment_viewed=moment, moment_viewer=viewer, timestamp=now)
+            for _ in range(count)
+        ]
+    )
+    return (moment_views - count, moment_views), (total_views - count, total_views)
+
+
+def boost_moment_views(viewer, chunk_size=1000):
+    """
+    Adds 1 to 10 views by viewer to every moment viewer doesn't own, without
+    notifications. Moments are streamed and written a chunk at a time
+
+    Returns:
+        Number of view records written
+    """
+    rows = 0
+    moments = Moment.objects.exclude(user_id=viewer).values_list(
+        "moment_id", "user_id"
+    )
+    for chunk in iter_chunks(moments.iterator(chunk_size=chunk_size), chunk_size):
+        now = pytz.UTC.localize(datetime.now())
+        views = {moment_id: random.randint(1, 10) for moment_id, _ in chunk}
+        owner_views = defaultdict(int)
+        for moment_id, owner_id in chunk:
+            owner_views[owner_id] += views[moment_id]
+
+        moment_view_counter.incr_many(views)
+        owner_moment_view_counter.incr_many(owner_views)
+        MomentViews.objects.bulk_create(
+            [
+                MomentViews(
+                    moment_viewed_id=moment_id, moment_viewer=viewer, timestamp=now
+                )
+                for moment_id, count in views.items()
+                for _ in range(count)
+            ],
+            batch_size=chunk_size,
+        )
+        rows += sum(views.values())
+    return rows
+
+
 def record_moment_view_no_notif(moment, viewer):
     """
     To record a view for the given moment by a given user - no notifs sent; this is used for auto processes like boosts, that must not add notifs
     """
     try:
         if moment.user_id != viewer:
-            count = random.randint(1, 10)
-            for i in range(count):
-                MomentViews.objects.create(
-                    moment_viewed=moment,
-                    moment_viewer=viewer,
-                    timestamp=pytz.UTC.localize(datetime.now()),
-                )
+            add_moment_views(moment, viewer, random.randint(1, 10))
 
     except TaggScoreUpdateException as err:
         self.logger.exception("Tagg score update exception")
@@ -45,42 +119,28 @@ def record_moment_view(moment, viewer):
     try:
 
         if moment.user_id != viewer:
-            count = random.randint(1, 10)
-            for i in range(count):
-                MomentViews.objects.create(
-                    moment_viewed=moment,
-                    moment_viewer=viewer,
-                    timestamp=pytz.UTC.localize(datetime.now()),
-                )
+            (old_views, moment_views), (old_total, total_views) = add_moment_views(
+                moment, viewer, random.randint(1, 10)
+            )
+
+            for moment_view_count in crossed_multiples(old_views, moment_views, 50):
+                # Update moment score table increase moment score by 10 for every 50 views on a moment
+                # increase_moment_score(moment, count * MomentScoreWeights.VIEW.value) ---> Old functionality: Patched below
+                increase_moment_score(moment, MomentScoreWeights.MOMENTVIEW.value)
 
-                moment_view_count = MomentViews.objects.filter(
-                    moment_viewed=moment
-                ).count()
-                if moment_view_count % 50 == 0:
-
-                    # Update moment score table increase moment score by 10 for every 50 views on a moment
-                    # increase_moment_score(moment, count * MomentScoreWeights.VIEW.value) ---> Old functionality: Patched below
-                    increase_moment_score(moment, MomentScoreWeights.MOMENTVIEW.value)
-
-                    # send notification for every 50 views
-                    handle_notification_with_images(
-                        NotificationType.MOMENT_VIEW,
-                        moment.user_id,
-                        moment.user_id,
-                        "Moment Views",
-                        f"Congrats, the moment you posted has {moment_view_count}+ views!! Here’s some Tagg coin!",
-                        profile_pic_url(moment.user_id),
-                        moment,
-                    )
-                # tma-1888 allow user to earn 10 points per 50 views on total moment views
-                total_views = MomentViews.objects.filter(
-                    moment_viewed__user_id=moment.user_id,
-                ).count()
-                # calculate the total views and if it is multiple of 50 tha user will get 10 points rewarded
-                if total_views % 50 == 0:
-                    increase_tagg_score(
-                        moment.user_id, TAGG_SCORE_ALLOTMENT["MOMENT_VIEW"]
-                    )
+                # send notification for every 50 views
+                handle_notification_with_images(
+                    NotificationType.MOMENT_VIEW,
+                    moment.user_id,
+                    moment.user_id,
+                    "Moment Views",
+                    f"Congrats, the moment you posted has {moment_view_count}+ views!! Here’s some Tagg coin!",
+                    profile_pic_url(moment.user_id),
+                    moment,
+                )
+            # tma-1888 allow user to earn 10 points per 50 views on total moment views
+            for _ in crossed_multiples(old_total, total_views, 50):
+                increase_tagg_score(moment.user_id, TAGG_SCORE_ALLOTMENT["MOMENT_VIEW"])
 
     except TaggScoreUpdateException as err:
         self.logger.exception("Tagg score update exception")
@@ -1,7 +1,7 @@
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
-import pytz
 
+from django.db import transaction
 from django.db.models import Q
 from rest_framework import viewsets
 from rest_framework.decorators import action
@@ -9,6 +9,11 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from ..common.notification_manager import (
+    clear_unread_counts,
+    get_unread_counts,
+    user_notifications,
+)
 from .models import NotificationList, NotificationType
 from .serializers import NotificationListSerializer
 from rest_framework.pagination import LimitOffsetPagination
@@ -23,11 +28,18 @@ class NotificationListViewSet(viewsets.ModelViewSet):
         self.logger = logging.getLogger(__name__)
 
     def list(self, request):
-        notifications = NotificationList.objects.filter(user=request.user).order_by(
-            "-notification__timestamp"
-        )
-
-        paginated_notification_list = self.paginate_queryset(notifications)
+        notifications = user_notifications(request.user)
+
+        paginated_notifications = self.paginate_queryset(notifications)
+        # broadcasts have no NotificationList row, they are listed with a null id
+        paginated_notification_list = [
+            NotificationList(
+                id=notification.list_id,
+                notification=notification,
+                user=request.user,
+            )
+            for notification in paginated_notifications
+        ]
 
         return self.get_paginated_response(
             NotificationListSerializer(paginated_notification_list, many=True).data
@@ -50,57 +62,25 @@ class NotificationListViewSet(viewsets.ModelViewSet):
         try:
             user = request.user
 
-            # Retrieve user's last seen time for notifications (2021 jan 1st || last seen in the last 7 days (both being true we should get a list of unread notifications))
-            retrieved_last_seen = user.taggusermeta.last_seen_notifications
-            past_week = pytz.UTC.localize(datetime.now() - timedelta(days=7))
-
-            if retrieved_last_seen > past_week:
-                last_seen = retrieved_last_seen
-            else:
-                last_seen = past_week
-
-            # Retireve user's notifications from notifications list, TODO: Filter unread using last seen time:  and Q(notification__timestamp__gt=last_seen)
-            unread_comment_count = NotificationList.objects.filter(
-                user=user,
-                notification__notification_type=NotificationType.COMMENT,
-                notification__timestamp__gt=last_seen,
-            ).count()
-            unread_friend_count = NotificationList.objects.filter(
-                user=user,
-                notification__notification_type__in=[
-                    NotificationType.FRIEND_ACCEPTANCE,
-                    NotificationType.FRIEND_REQUEST,
-                ],
-                notification__timestamp__gt=last_seen,
-            ).count()
-            unread_view_count = NotificationList.objects.filter(
-                user=user,
-                notification__notification_type=NotificationType.PROFILE_VIEW,
-                notification__timestamp__gt=last_seen,
-            ).count()
-            unread_tag_count = NotificationList.objects.filter(
-                user=user,
-                notification__notification_type=NotificationType.MOMENT_TAG,
-                notification__timestamp__gt=last_seen,
-            ).count()
-            unread_click_count = NotificationList.objects.filter(
-                user=user,
-                notification__notification_type=NotificationType.CLICK_TAG,
-                notification__timestamp__gt=last_seen,
-            ).count()
-            unread_moment_view_count = NotificationList.objects.filter(
-                user=user,
-                notification__notification_type=NotificationType.MOMENT_VIEW,
-                notification__timestamp__gt=last_seen,
-            ).count()
+            # counters only hold notifications of the last week, see
+            # reconcile_unread_counts
+            counts = get_unread_counts(user)
 
             response = {
-                NotificationType.COMMENT: unread_comment_count,
-                NotificationType.FRIEND_REQUEST: unread_friend_count,  # Includes FriendAccept
-                NotificationType.PROFILE_VIEW: unread_view_count,
-                NotificationType.MOMENT_TAG: unread_tag_count,
-                NotificationType.CLICK_TAG: unread_click_count,
-                NotificationType.MOMENT_VIEW: unread_moment_view_count,
+                NotificationType.COMMENT: counts.get(NotificationType.COMMENT, 0),
+                # Includes FriendAccept
+                NotificationType.FRIEND_REQUEST: counts.get(
+                    NotificationType.FRIEND_REQUEST, 0
+                )
+                + counts.get(NotificationType.FRIEND_ACCEPTANCE, 0),
+                NotificationType.PROFILE_VIEW: counts.get(
+                    NotificationType.PROFILE_VIEW, 0
+                ),
+                NotificationType.MOMENT_TAG: counts.get(NotificationType.MOMENT_TAG, 0),
+                NotificationType.CLICK_TAG: counts.get(NotificationType.CLICK_TAG, 0),
+                NotificationType.MOMENT_VIEW: counts.get(
+                    NotificationType.MOMENT_VIEW, 0
+                ),
             }
 
             return Response(response, status=200)
@@ -126,8 +106,10 @@ class NotificationListViewSet(viewsets.ModelViewSet):
         try:
             user = request.user
 
-            user.taggusermeta.last_seen_notifications = datetime.now()
-            user.taggusermeta.save()
+            with transaction.atomic():
+                user.taggusermeta.last_seen_notifications = datetime.now()
+                user.taggusermeta.save()
+                clear_unread_counts(user)
 
             return Response("Successfully recorded timestamp", status=204)
 
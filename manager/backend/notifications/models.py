@@ -1,5 +1,6 @@
 import uuid
 from django.db import models
+from django.utils import timezone
 from ..models import TaggUser
 from django.contrib.contenttypes.fields import GenericForeignKey, ContentType
 
@@ -33,6 +34,12 @@ class Notification(models.Model):
     notification_object = models.UUIDField(null=True)
     object = GenericForeignKey("content_type", "notification_object")
     timestamp = models.DateTimeField(auto_now_add=True)
+    # broadcasts have no NotificationList rows, they are listed for every user
+    # who joined before them, see DismissedBroadcast
+    broadcast = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [models.Index(fields=["broadcast", "-timestamp"])]
 
 
 class NotificationList(models.Model):
@@ -43,6 +50,101 @@ class NotificationList(models.Model):
         indexes = [models.Index(fields=["notification", "user"])]
 
 
+class DismissedBroadcast(models.Model):
+    """A broadcast notification removed from one user's list"""
+
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE)
+    user = models.ForeignKey(TaggUser, on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ("user", "notification")
+
+
+class NotificationDigest(models.Model):
+    """A notification that same-type notifications to its user are folded
+    into until window_end, see list_notification"""
+
+    notification = models.OneToOneField(
+        Notification, on_delete=models.CASCADE, primary_key=True, related_name="digest"
+    )
+    user = models.ForeignKey(TaggUser, on_delete=models.CASCADE)
+    # notifications folded in, the first one included
+    count = models.IntegerField(default=1)
+    window_end = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "-window_end"])]
+
+
+class UnreadNotificationCount(models.Model):
+    """Unread personal notifications of a user, by type
+
+    Incremented as notifications are listed, cleared when the user sees their
+    notifications and rebuilt periodically by reconcile_unread_counts.
+    Broadcasts are not counted, see broadcast_notifications.
+    """
+
+    user = models.ForeignKey(
+        TaggUser, on_delete=models.CASCADE, related_name="unread_notification_counts"
+    )
+    notification_type = models.CharField(
+        max_length=10, choices=NotificationType.choices
+    )
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "notification_type"],
+                name="unique_unread_notification_count",
+            )
+        ]
+
+
 class ProfileViewNotificationTrigger(models.Model):
     user = models.ForeignKey(TaggUser, on_delete=models.CASCADE)
     count = models.IntegerField(default=0)
+
+
+class PushState(models.TextChoices):
+    """
+    PENDING: Waiting to be sent, or to be retried at next_attempt
+    DELIVERED: Every target device was handled
+    FAILED: Gave up after PUSH_MAX_ATTEMPTS attempts
+    """
+
+    PENDING = "pending"
+    DELIVERED = "delivered"
+    FAILED = "failed"
+
+
+class PushOutbox(models.Model):
+    """A push notification waiting to be sent by the push worker
+
+    Rows are written in the same transaction as their Notification, and sent
+    by common/push_manager.py. A push without user goes to every active
+    device but exclude_user's.
+    """
+
+    user = models.ForeignKey(
+        TaggUser, on_delete=models.CASCADE, null=True, related_name="+"
+    )
+    exclude_user = models.ForeignKey(
+        TaggUser, on_delete=models.SET_NULL, null=True, related_name="+"
+    )
+    title = models.CharField(max_length=255, null=True)
+    body = models.TextField()
+    badge = models.IntegerField(null=True)
+    state = models.CharField(
+        max_length=16, choices=PushState.choices, default=PushState.PENDING
+    )
+    # device tokens left to retry after a partial failure, None for all targets
+    tokens = models.JSONField(null=True)
+    attempts = models.IntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(default="")
+    created_on = models.DateTimeField(auto_now_add=True)
+    delivered_on = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["state", "next_attempt"])]
@@ -1,5 +1,11 @@
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 
+from ..common.image_manager import profile_thumbnail_urls
 from ..moments.models import Moment
 from ..moments.comments.models import CommentThreads, MomentComments
 from ..moments.comments.serializers import (
@@ -10,22 +16,105 @@ from ..serializers import TaggUserSerializer
 from ..moments.serializers import MomentSerializer
 from .models import Notification, NotificationList
 
+# Notification objects that are serialized, with the relations they render
+NOTIFICATION_OBJECT_RELATED = {
+    MomentComments: ["moment_id__user_id"],
+    CommentThreads: ["parent_comment__moment_id__user_id"],
+    Moment: [],
+}
+
+
+def notification_object_owner_id(obj):
+    """The owner of the moment a notification object renders, if any"""
+    if isinstance(obj, MomentComments):
+        return obj.moment_id.user_id_id
+    elif isinstance(obj, CommentThreads):
+        return obj.parent_comment.moment_id.user_id_id
+    return None
+
+
+class NotificationBatchListSerializer(serializers.ListSerializer):
+    """
+    Serializes a page of notifications in a fixed number of queries: objects
+    are fetched per content type, actors and thumbnails for the whole page up
+    front
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.Manager) else data)
+        if not items:
+            return []
+        self.child.batch = self.child.get_batch(items)
+        try:
+            return [self.child.to_representation(item) for item in items]
+        finally:
+            self.child.batch = None
+
 
 class NotificationSerializer(serializers.ModelSerializer):
     notification_object = serializers.SerializerMethodField()
-    actor = TaggUserSerializer()
+    actor = serializers.SerializerMethodField()
+
+    # set by NotificationBatchListSerializer while serializing a page
+    batch = None
 
     class Meta:
         model = Notification
         fields = "__all__"
+        list_serializer_class = NotificationBatchListSerializer
+
+    def get_batch(self, notifications):
+        prefetch_related_objects(notifications, "actor")
+
+        ids_by_type = defaultdict(set)
+        for notification in notifications:
+            if notification.content_type_id and notification.notification_object:
+                ids_by_type[notification.content_type_id].add(
+                    notification.notification_object
+                )
+        objects = {}
+        for content_type_id, ids in ids_by_type.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            if model not in NOTIFICATION_OBJECT_RELATED:
+                continue
+            queryset = model.objects.select_related(*NOTIFICATION_OBJECT_RELATED[model])
+            for pk, obj in queryset.in_bulk(list(ids)).items():
+                objects[(content_type_id, pk)] = obj
+
+        user_ids = {notification.actor_id for notification in notifications}
+        user_ids.update(
+            owner_id
+            for owner_id in map(notification_object_owner_id, objects.values())
+            if owner_id
+        )
+        return {
+            "objects": objects,
+            "thumbnail_urls": profile_thumbnail_urls(list(user_ids)),
+        }
+
+    def get_actor(self, obj):
+        if self.batch:
+            return TaggUserSerializer(
+                obj.actor, context={"thumbnail_urls": self.batch["thumbnail_urls"]}
+            ).data
+        return TaggUserSerializer(obj.actor).data
 
     def get_notification_object(self, obj):
-        if isinstance(obj.object, MomentComments):
-            return CommentNotificationSerializer(obj.object).data
-        elif isinstance(obj.object, CommentThreads):
-            return ThreadNotificationSerializer(obj.object).data
-        elif isinstance(obj.object, Moment):
-            return MomentSerializer(obj.object).data
+        if self.batch:
+            target = self.batch["objects"].get(
+                (obj.content_type_id, obj.notification_object)
+            )
+            context = {"thumbnail_urls": self.batch["thumbnail_urls"]}
+        else:
+            target = obj.object
+            context = {}
+
+        if isinstance(target, MomentComments):
+            return CommentNotificationSerializer(target, context=context).data
+        elif isinstance(target, CommentThreads):
+            return ThreadNotificationSerializer(target, context=context).data
+        elif isinstance(target, Moment):
+            return MomentSerializer(target).data
 
 
 class NotificationListSerializer(serializers.ModelSerializer):
@@ -34,3 +123,18 @@ class NotificationListSerializer(serializers.ModelSerializer):
     class Meta:
         model = NotificationList
         fields = "__all__"
+        list_serializer_class = NotificationBatchListSerializer
+
+    @property
+    def batch(self):
+        return self.fields["notification"].batch
+
+    @batch.setter
+    def batch(self, batch):
+        self.fields["notification"].batch = batch
+
+    def get_batch(self, notification_lists):
+        prefetch_related_objects(notification_lists, "notification")
+        return self.fields["notification"].get_batch(
+            [notification_list.notification for notification_list in notification_lists]
+        )
@@ -1,8 +1,9 @@
 import logging
 import re
-from datetime import datetime, timedelta
+import time
+from datetime import timedelta
 
-from django.db.models import Q
+from django.db.models import Count, OuterRef, Subquery
 from django.utils import timezone
 
 from ..common.notification_manager import (
@@ -14,12 +15,11 @@ from ..common.notification_manager import (
 from ..friends.models import Friends, FriendshipStatusType
 from ..models import TaggUser
 from ..moments.models import Moment
+from .models import Notification
 from ..social_linking.models import SocialLink
 from ..widget.models import Widget
-from ..analytics.widgets.utils import (
-    record_widget_click,
-)
-from ..moments.views.utils import record_moment_view_no_notif
+from ..analytics.widgets.utils import boost_widget_clicks
+from ..moments.views.utils import boost_moment_views
 
 
 def link_taggs_reminder():
@@ -57,57 +57,101 @@ def link_taggs_reminder():
 def widget_view_boost():
     logger = logging.getLogger("widget_view_boost")
     logger.info("Started widget_view_boost")
+    start = time.monotonic()
     user = TaggUser.objects.all().first()
-    for widget in Widget.objects.filter(active=True):
-        try:
-            record_widget_click(widget, user)
-            # msg = f"Recorded widget click for widget: {widget.id}"
-            # logger.info(msg)
-        except Exception as error:
-            logger.exception(error)
-            logger.error(f"Failed to record widget for widget: {widget.id}")
-            continue
+    rows = 0
+    try:
+        rows += boost_widget_clicks(user)
+    except Exception as error:
+        logger.exception(error)
+        logger.error("Failed to record widget clicks")
     logger.info("Started moment_view_boost")
-    for momentObj in Moment.objects.all():
-        try:
-            record_moment_view_no_notif(momentObj, user)
-        except Exception as error:
-            logger.exception(error)
-            logger.error(
-                f"Failed to record moment view for moment: {momentObj.moment_id}"
-            )
-            continue
+    try:
+        rows += boost_moment_views(user)
+    except Exception as error:
+        logger.exception(error)
+        logger.error("Failed to record moment views")
+    logger.info(
+        f"Finished widget_view_boost: {rows} rows written in "
+        f"{time.monotonic() - start:.1f}s"
+    )
+
+
+def recent_posters(since):
+    """
+    Users who posted a moment since the given time, most recent first, from a
+    single query grouped by user
+
+    Returns:
+        [(latest moment, number of moments posted)], moments come with their user
+    """
+    posters = (
+        Moment.objects.filter(date_created__gt=since)
+        .values("user_id")
+        .annotate(
+            count=Count("moment_id"),
+            latest_id=Subquery(
+                Moment.objects.filter(
+                    user_id=OuterRef("user_id"), date_created__gt=since
+                )
+                .order_by("-date_created")
+                .values("moment_id")[:1]
+            ),
+        )
+        .order_by()
+    )
+    counts = {poster["latest_id"]: poster["count"] for poster in posters}
+    latest_moments = Moment.objects.select_related("user_id").in_bulk(counts.keys())
+    return sorted(
+        [(moment, counts[moment_id]) for moment_id, moment in latest_moments.items()],
+        key=lambda poster: poster[0].date_created,
+        reverse=True,
+    )
+
+
+def moment_already_announced(moment, since):
+    """
+    Whether a moment broadcast was already sent since the given time for this
+    moment, the hourly jobs send at most one per latest moment
+    """
+    return Notification.objects.filter(
+        broadcast=True,
+        timestamp__gt=since,
+        notification_type__in=[
+            NotificationType.MOMENT_3P,
+            NotificationType.MOMENT_FRIEND,
+        ],
+        notification_object=moment.moment_id,
+    ).exists()
 
 
 def moments_posted_reminder():
     """
     For every user on tagg, send them a notification if 2 or more users posted a moment in the last 1 hour
+
+    No longer scheduled, moment_posted_friend sends the combined notification.
+    Skipped if it already announced the same moment.
     """
     logger = logging.getLogger("moments_posted_reminder")
     logger.info(f"Started : {NotificationType.MOMENT_3P}")
     try:
         message = lambda count: f"And {count} others posted a moment!"
-        time_threshold = datetime.now() - timedelta(hours=1)
-        relevant_friends = __fetch_relevant_friends(time_threshold)
-        if len(relevant_friends) >= 2:
-            # Sort and find the user who posted a moment in the most recent past
-            relevant_friends = sorted(
-                relevant_friends,
-                key=lambda object: object[1].date_created,
-                reverse=True,
-            )
-            relevant_friend = relevant_friends[0]
+        since = timezone.now() - timedelta(hours=1)
+        posters = recent_posters(since)
+        if len(posters) >= 2 and not moment_already_announced(posters[0][0], since):
+            # Sent on behalf of the user who posted a moment in the most recent past
+            moment, _ = posters[0]
 
             if handle_bulk_notification(
                 NotificationType.MOMENT_3P,
-                relevant_friend[0],
-                message(len(relevant_friends)),
-                relevant_friend[1],
+                moment.user_id,
+                message(len(posters)),
+                moment,
             ):
-                logger.info(f"Sent notification for {relevant_friend[0].username}")
+                logger.info(f"Sent notification for {moment.user_id.username}")
             else:
                 logger.info(
-                    f"Failed sending notification for {relevant_friend[0].username}"
+                    f"Failed sending notification for {moment.user_id.username}"
                 )
     except Exception as error:
         logger.exception(error)
@@ -115,61 +159,40 @@ def moments_posted_reminder():
     logger.info(f"Finished : {NotificationType.MOMENT_3P}")
 
 
-def __fetch_relevant_friends(time_threshold):
-    """
-    Find users who posted a moment in the recent past
-    """
-    # We could get away with using an array, but since we will need this information later, using it anyways
-    valid_friends = []
-
-    # Fetch all friends of the user
-    friends = TaggUser.objects.all()
-    for object in friends:
-        friend = object
-
-        # Fetch the latest moment posted by the friend if any
-        moment = (
-            Moment.objects.filter(Q(date_created__gt=time_threshold), Q(user_id=friend))
-            .order_by("-date_created")
-            .first()
-        )
-        if moment:
-            valid_friends.append([friend, moment])
-    return valid_friends
-
-
 def moment_posted_friend():
     """
-    For every user on tagg, send a notification to all other users if the user posted 1+ moments to the same category in the last 1 hours
+    Send a notification to all users if a user posted 1+ moments in the last 1 hours.
+    Posters are coalesced into a single notification per run, sent on behalf
+    of the most recent one, so every user gets at most one notification.
+    This is the only hourly moment notification, it covers the others who
+    posted that moments_posted_reminder used to announce separately.
     """
 
     logger = logging.getLogger("moments_posted_reminder")
     logger.info(f"Started : {NotificationType.MOMENT_FRIEND}")
     try:
         message = lambda count, category: f"Posted {count} moments to {category}!"
-        check_for_same_category = (
-            lambda moment1, moment2: moment1.moment_category == moment2.moment_category
-        )
-        for user in TaggUser.objects.all():
-            time_threshold = datetime.now() - timedelta(hours=1)
-
-            # Fetch the moments posted by user
-            moments = Moment.objects.filter(
-                Q(date_created__gt=time_threshold), Q(user_id=user)
-            ).order_by("-date_created")
-            if len(moments) >= 1:
-                # Send a notification for the latest moment
-                moment = moments[0]
-
-                if handle_bulk_notification(
-                    NotificationType.MOMENT_FRIEND,
-                    user,
-                    message(len(moments), moment.moment_category),
-                    moment,
-                ):
-                    logger.info(f"Sent notification for {user.username}")
-                else:
-                    logger.info(f"Failed sending notification for {user.username}")
+        others_message = lambda others: f" And {others} others posted too!"
+        since = timezone.now() - timedelta(hours=1)
+        posters = recent_posters(since)
+        if posters and not moment_already_announced(posters[0][0], since):
+            # Send a notification for the latest moment
+            moment, count = posters[0]
+            verbage = message(count, moment.moment_category)
+            if len(posters) > 1:
+                verbage += others_message(len(posters) - 1)
+
+            if handle_bulk_notification(
+                NotificationType.MOMENT_FRIEND,
+                moment.user_id,
+                verbage,
+                moment,
+            ):
+                logger.info(f"Sent notification for {moment.user_id.username}")
+            else:
+                logger.info(
+                    f"Failed sending notification for {moment.user_id.username}"
+                )
     except Exception as error:
         logger.exception(error)
         logger.info(f"Failed : {NotificationType.MOMENT_FRIEND}")
@@ -1,9 +1,10 @@
 import logging
 from ..suggested_people.models import Badge
 from ..suggested_people.serializers import BadgeSerializer
-from ..friends.utils import find_user_friends, get_friendship_status
+from ..common.friend_graph_manager import friend_ids
+from ..common.image_manager import profile_thumbnail_urls
+from ..friends.utils import find_user_friends
 
-from django.db.models import Q
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
@@ -13,6 +14,7 @@ from ..discover.models import DiscoverCategory
 from ..discover.serializers import DiscoverCategorySerializer
 from ..models import TaggUser
 from ..serializers import TaggUserSerializer
+from .utils import SEARCH_MAX_PAGE_SIZE, SEARCH_PAGE_SIZE, InvalidCursor, search_users
 from random import shuffle
 
 
@@ -29,7 +31,6 @@ class SearchViewSet(viewsets.ViewSet):
         version ^1.12
         Handles a GET request to this endpoint.
         """
-        user = request.user
         try:
             query = request.GET.get("query", "")
             if len(query) == 0:
@@ -53,29 +54,31 @@ class SearchViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        return self.search_page(request, query)
+
+    def search_page(self, request, query, user_ids=None):
+        """
+        Responds with a page of the users matching the query, see search_users.
+        Takes the page's cursor and limit as query parameters.
+        """
         try:
-            """
-            Look up users:
-                Whose either first_name or last_name or username matches the query
-                AND
-                The logged in user is not blocked by the user.
-            """
-            user_matches = TaggUser.objects.filter(
-                Q(username__icontains=query)
-                | Q(first_name__icontains=query)
-                | Q(last_name__icontains=query),
-                ~Q(blocker__blocked=request.user),
-                ~Q(blocked__blocker=request.user),
-                Q(taggusermeta__is_onboarded=True),
+            limit = min(
+                int(request.GET.get("limit", SEARCH_PAGE_SIZE)), SEARCH_MAX_PAGE_SIZE
+            )
+            if limit < 1:
+                raise ValueError(limit)
+            users, next_cursor = search_users(
+                request.user,
+                query,
+                cursor=request.GET.get("cursor"),
+                limit=limit,
+                user_ids=user_ids,
+            )
+        except (ValueError, InvalidCursor):
+            self.logger.exception("Invalid pagination parameter.")
+            return Response(
+                "Invalid pagination parameter.", status=status.HTTP_400_BAD_REQUEST
             )
-
-            user_serialized = TaggUserSerializer(user_matches, many=True)
-
-            response = {
-                "users": user_serialized.data,
-            }
-
-            return Response(response)
         except Exception:
             self.logger.exception("Problem fetching search results")
             return Response(
@@ -83,10 +86,22 @@ class SearchViewSet(viewsets.ViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+        user_serialized = TaggUserSerializer(
+            users,
+            many=True,
+            context={
+                "thumbnail_urls": profile_thumbnail_urls([user.id for user in users])
+            },
+        )
+        response = {
+            "users": user_serialized.data,
+            "next": next_cursor,
+        }
+        return Response(response)
+
     @action(detail=False, methods=["get"])
     def messages(self, request):
         """Handles a GET request to this endpoint."""
-        """TODO: Add Pagination"""
         user = request.user
         try:
             query = request.GET.get("query", "")
@@ -112,39 +127,8 @@ class SearchViewSet(viewsets.ViewSet):
         #         "Entered value should be greater than 2 characters")
         #     return Response("Entered value should be greater than 2 characters", status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            """
-            Look up users:
-                Whose either first_name or last_name or username matches the query
-                AND
-                The logged in user is not blocked by the user.
-            """
-            user_matches = TaggUser.objects.filter(
-                Q(username__icontains=query)
-                | Q(first_name__icontains=query)
-                | Q(last_name__icontains=query),
-                ~Q(blocker__blocked=request.user),
-                Q(taggusermeta__is_onboarded=True),
-            )
-
-            suggested_users = []
-            for current_user in user_matches:
-                if user == current_user:
-                    continue
-                if get_friendship_status(current_user, user)[0] == "friends":
-                    suggested_users.append(current_user)
-
-            user_serialized = TaggUserSerializer(suggested_users, many=True)
-            response = {
-                "users": user_serialized.data,
-            }
-            return Response(response)
-        except Exception:
-            self.logger.exception("Problem fetching search results")
-            return Response(
-                "Problem fetching search results",
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
+        # only friends can be messaged, they are read from the friend graph
+        return self.search_page(request, query, user_ids=friend_ids(user))
 
     @action(detail=False, methods=["get"])
     def suggested(self, request):
@@ -0,0 +1,89 @@
+import base64
+import json
+
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from ..models import TaggUser
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+# Ranks of a match, best first
+EXACT_USERNAME = 0
+PREFIX = 1
+SUBSTRING = 2
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(rank, username):
+    return base64.urlsafe_b64encode(json.dumps([rank, username]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        rank, username = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return int(rank), str(username)
+    except Exception:
+        raise InvalidCursor(cursor)
+
+
+def search_users(viewer, query, cursor=None, limit=SEARCH_PAGE_SIZE, user_ids=None):
+    """
+    Looks up the onboarded users whose username, first_name or last_name
+    contains the query, leaving out users who blocked or were blocked by the
+    viewer.
+
+    The lookups are served by the trigram indexes of these columns. Matches
+    are ranked exact username first, then prefix matches, then substring
+    matches, by username within a rank, and returned a page at a time.
+
+    Args:
+        viewer (TaggUser): the user searching
+        query (str): the text searched for
+        cursor (str): the cursor of the page, as returned for the previous
+            one, None for the first page
+        limit (int): the page size
+        user_ids (list): only look among these users
+
+    Returns:
+        (users, next_cursor), next_cursor being None on the last page
+
+    Raises:
+        InvalidCursor: the cursor wasn't returned by search_users
+    """
+    matches = TaggUser.objects.filter(
+        Q(username__icontains=query)
+        | Q(first_name__icontains=query)
+        | Q(last_name__icontains=query),
+        ~Q(blocker__blocked=viewer),
+        ~Q(blocked__blocker=viewer),
+        Q(taggusermeta__is_onboarded=True),
+    ).annotate(
+        search_rank=Case(
+            When(username__iexact=query, then=Value(EXACT_USERNAME)),
+            When(
+                Q(username__istartswith=query)
+                | Q(first_name__istartswith=query)
+                | Q(last_name__istartswith=query),
+                then=Value(PREFIX),
+            ),
+            default=Value(SUBSTRING),
+            output_field=IntegerField(),
+        )
+    )
+    if user_ids is not None:
+        matches = matches.filter(id__in=user_ids)
+    if cursor:
+        rank, username = decode_cursor(cursor)
+        matches = matches.filter(
+            Q(search_rank__gt=rank) | Q(search_rank=rank, username__gt=username)
+        )
+
+    users = list(matches.order_by("search_rank", "username")[: limit + 1])
+    if len(users) <= limit:
+        return users, None
+    last = users[limit - 1]
+    return users[:limit], encode_cursor(last.search_rank, last.username)
@@ -13,6 +13,10 @@ class TaggUserSerializer(serializers.ModelSerializer):
         fields = ["id", "username", "first_name", "last_name", "thumbnail_url"]
 
     def get_thumbnail_url(self, obj):
+        # Batched callers may pass precomputed urls, see profile_thumbnail_urls
+        thumbnail_urls = self.context.get("thumbnail_urls")
+        if thumbnail_urls and obj.id in thumbnail_urls:
+            return thumbnail_urls[obj.id]
         return profile_thumbnail_url(obj.id)
 
 
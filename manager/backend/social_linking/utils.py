@@ -178,9 +178,11 @@ def _regenerate_ig_token(link, logger):
         logger.error(f"{link_id_debug} - {username_debug}: IG - Something went wrong")
 
 
-def get_linked_socials(user):
+def linked_socials(social_link):
+    """Names of the socials linked in a SocialLink, none if there's no row"""
     linked_socials = []
-    social_link, social_link_created = SocialLink.objects.get_or_create(user_id=user)
+    if social_link is None:
+        return linked_socials
     if social_link.fb_user_id:
         linked_socials.append("Facebook")
     if social_link.ig_user_id:
@@ -192,3 +194,22 @@ def get_linked_socials(user):
     if social_link.tiktok_username:
         linked_socials.append("TikTok")
     return linked_socials
+
+
+def get_linked_socials(user):
+    social_link, social_link_created = SocialLink.objects.get_or_create(user_id=user)
+    return linked_socials(social_link)
+
+
+def get_linked_socials_by_user(user_ids):
+    """
+    Batched get_linked_socials, returns {user_id: linked socials} using a
+    single query. Users without a SocialLink have none, no row is created.
+    """
+    social_links = {
+        social_link.user_id_id: social_link
+        for social_link in SocialLink.objects.filter(user_id__in=user_ids)
+    }
+    return {
+        user_id: linked_socials(social_links.get(user_id)) for user_id in user_ids
+    }
@@ -19,9 +19,10 @@ from .serializers import SuggestedPeopleSerializer
 from .utils import (
     get_image_and_file_name,
     get_mutual_friends,
-    get_suggested_people,
+    get_suggested_people_ranking,
     mark_user_dirty,
     mark_users_uninterested_1_count,
+    order_suggested_people,
 )
 
 
@@ -60,21 +61,28 @@ class SuggestedPeopleViewSet(viewsets.ModelViewSet):
 
             cache_time = 600
 
-            sp_cache_key = f"sp_{user.id}_{seed}"
+            # only the ranked IDs are cached, the order a seed shows them in
+            # is applied to each page
+            sp_cache_key = f"sp_{user.id}"
 
-            suggested_people = cache.get(sp_cache_key)
+            ranking = cache.get(sp_cache_key)
 
-            if not suggested_people:
-                suggested_people = get_suggested_people(user, seed)
-                cache.set(sp_cache_key, suggested_people, cache_time)
+            if ranking is None:
+                ranking = get_suggested_people_ranking(user)
+                cache.set(sp_cache_key, ranking, cache_time)
+
+            page = self.paginate_queryset(ranking[0])
+            page_ids = order_suggested_people(
+                ranking, seed, self.paginator.offset, len(page)
+            )
 
             if offset != -1 and limit != -1:
                 mark_users_uninterested_1_count(
-                    str(user.id),
-                    [str(u.id) for u in suggested_people[offset : offset + limit]],
+                    str(user.id), [str(user_id) for user_id in page_ids]
                 )
 
-            suggested_people = self.paginate_queryset(suggested_people)
+            users = TaggUser.objects.in_bulk(page_ids)
+            suggested_people = [users[pk] for pk in page_ids if pk in users]
 
             serialized_response = SuggestedPeopleSerializer(
                 suggested_people, many=True, context={"user": user}
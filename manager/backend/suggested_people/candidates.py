@@ -0,0 +1,193 @@
+"""
+    Candidate generation for the people recommender: rather than a row for
+    every ordered pair of onboarded users, PeopleRecommender only holds each
+    recipient's top RECOMMENDER_TOP_K plausible recommendations
+
+    Candidates come from friends of friends, users of the same university and
+    class year and users sharing a badge. Only users of the recipient's
+    university are considered, as get_suggested_people never recommends
+    anyone else.
+"""
+
+import heapq
+import logging
+from collections import defaultdict
+
+from ..common.constants import (
+    SpRecommenderFeatureThresholds,
+    SpRecommenderFeatureWeights,
+)
+from ..common.friend_graph_manager import friend_graph
+from ..models import SuggestedPeopleLinked, TaggUser
+from .features import RECOMMENDER_BATCH_SIZE, badge_matrix
+from .models import PeopleRecommender
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDER_TOP_K = 100
+# users taken from a single class year or badge group, the members of a group
+# are only told apart by their other sources
+RECOMMENDER_GROUP_LIMIT = 1000
+# recipients whose rows are written together
+RECOMMENDER_CHUNK_SIZE = 100
+
+
+def _badge_ids(bits):
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def generate_candidates(
+    users, graph, badges, top_k=RECOMMENDER_TOP_K, group_limit=RECOMMENDER_GROUP_LIMIT
+):
+    """Picks the top `top_k` candidates of every user
+
+    Candidates are ranked by the features known up front, weighted as the
+    recommender weights them.
+
+    Args:
+        users (list): (id, university, university_class) of every user,
+            ordered by id
+        graph (FriendGraph): The friend graph
+        badges (dict): {user_id: badge bitset}, see badge_matrix
+
+    Yields:
+        (recipient_id, [recommendation_id]) for every user
+    """
+    universities = {}
+    by_class_year = defaultdict(list)
+    by_badge = defaultdict(list)
+    for user_id, university, university_class in users:
+        universities[user_id] = university
+        by_class_year[(university, university_class)].append(user_id)
+        for badge_id in _badge_ids(badges.get(user_id, 0)):
+            by_badge[(university, badge_id)].append(user_id)
+    # groups are cut at group_limit, users come ordered by their random uuid4
+    # ids so the cut is spread over the group and stays the same between runs
+    class_year_members = {key: set(group) for key, group in by_class_year.items()}
+
+    for recipient_id, university, university_class in users:
+        mutual_friends = {
+            user_id: count
+            for user_id, count in graph.mutual_friend_counts(recipient_id).items()
+            if universities.get(user_id, ()) == university
+        }
+        recipient_badges = badges.get(recipient_id, 0)
+        same_class_year = class_year_members[(university, university_class)]
+
+        pool = set(mutual_friends)
+        pool.update(by_class_year[(university, university_class)][:group_limit])
+        for badge_id in _badge_ids(recipient_badges):
+            pool.update(by_badge[(university, badge_id)][:group_limit])
+        pool.discard(recipient_id)
+        pool.difference_update(graph.friend_ids(recipient_id))
+
+        def score(user_id):
+            mutual_badges = bin(recipient_badges & badges.get(user_id, 0)).count("1")
+            return (
+                SpRecommenderFeatureWeights.FRIEND
+                * min(
+                    1,
+                    mutual_friends.get(user_id, 0)
+                    / SpRecommenderFeatureThresholds.FRIEND,
+                )
+                + SpRecommenderFeatureWeights.BADGE
+                * min(1, mutual_badges / SpRecommenderFeatureThresholds.BADGE)
+                + SpRecommenderFeatureWeights.CLASS_YEAR * (user_id in same_class_year)
+            )
+
+        # many candidates tie, the id breaks the ties the same way every run
+        yield recipient_id, heapq.nlargest(
+            top_k, pool, key=lambda user_id: (score(user_id), user_id)
+        )
+
+
+def _write_candidates(candidates, prune):
+    """Inserts the rows of a chunk of recipients' candidates, returns the
+    number of stale rows of these recipients pruned
+
+    Rows whose interested_feature decayed below 1 are never pruned, the
+    recipient skipped these users and the decay must outlive the candidate
+    set.
+    """
+    PeopleRecommender.objects.bulk_create(
+        [
+            PeopleRecommender(
+                recipient_id=recipient_id,
+                recommendation_id=recommendation_id,
+                friend_feature=0,
+                university_feature=0,
+                badge_feature=0,
+                class_year_feature=0,
+                interested_feature=0,
+                dirty=True,
+            )
+            for recipient_id, recommendation_ids in candidates.items()
+            for recommendation_id in recommendation_ids
+        ],
+        batch_size=RECOMMENDER_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    if not prune:
+        return 0
+
+    stale = [
+        pk
+        for pk, recipient_id, recommendation_id in PeopleRecommender.objects.filter(
+            recipient_id__in=candidates
+        )
+        .exclude(interested_feature__gt=0, interested_feature__lt=1)
+        .values_list("id", "recipient_id", "recommendation_id")
+        if recommendation_id not in candidates[recipient_id]
+    ]
+    if not stale:
+        return 0
+    return PeopleRecommender.objects.filter(id__in=stale).delete()[0]
+
+
+def refresh_recommender_candidates(top_k=RECOMMENDER_TOP_K, prune=True):
+    """Inserts the missing PeopleRecommender rows of every onboarded user's
+    top candidates, marked dirty so their features get computed
+
+    Args:
+        top_k (int): Candidates kept per recipient
+        prune (bool): Delete the rows of pairs that are no longer candidates,
+            but for the ones the recipient skipped
+
+    Returns:
+        (number of candidate pairs, number of rows pruned)
+    """
+    onboarded_users = TaggUser.objects.filter(
+        taggusermeta__is_onboarded=True,
+        taggusermeta__suggested_people_linked=SuggestedPeopleLinked.FINAL_TUTORIAL,
+    )
+    users = list(
+        onboarded_users.order_by("id").values_list(
+            "id", "university", "university_class"
+        )
+    )
+
+    total = pruned = 0
+    if prune:
+        # recipients who are no longer onboarded keep no rows
+        pruned += PeopleRecommender.objects.exclude(
+            recipient__in=onboarded_users.values("id")
+        ).delete()[0]
+    chunk = {}
+    for recipient_id, recommendation_ids in generate_candidates(
+        users, friend_graph.get(), badge_matrix(), top_k=top_k
+    ):
+        chunk[recipient_id] = set(recommendation_ids)
+        total += len(recommendation_ids)
+        if len(chunk) >= RECOMMENDER_CHUNK_SIZE:
+            pruned += _write_candidates(chunk, prune)
+            chunk = {}
+    if chunk:
+        pruned += _write_candidates(chunk, prune)
+
+    logger.info(
+        f"{total} recommender candidates for {len(users)} users, pruned {pruned} rows"
+    )
+    return total, pruned
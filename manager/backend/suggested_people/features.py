@@ -0,0 +1,153 @@
+"""
+    Mutual friend and mutual badge counts of PeopleRecommender pairs, computed
+    for many pairs at once
+
+    Friendships are the sparse user x user matrix A held by the friend graph,
+    the mutual friend counts of a recipient are its row of A·A, accumulated
+    over its friends' rows. Badges are a user x badge matrix B stored as one
+    bitset per user, the mutual badges of a pair are the popcount of the AND
+    of their two rows.
+"""
+
+import logging
+
+from django.db.models import F
+from django.utils import timezone
+
+from ..common.constants import (
+    SpRecommenderFeatureThresholds,
+    SpRecommenderFeatureWeights,
+)
+from ..common.friend_graph_manager import friend_graph
+from .models import PeopleRecommender, UserBadge
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDER_BATCH_SIZE = 1000
+
+
+def recommender_score(pr):
+    """The weighted sum of a PeopleRecommender row's features"""
+    return sum(
+        [
+            pr.friend_feature * SpRecommenderFeatureWeights.FRIEND,
+            pr.university_feature * SpRecommenderFeatureWeights.UNIVERSITY,
+            pr.badge_feature * SpRecommenderFeatureWeights.BADGE,
+            pr.class_year_feature * SpRecommenderFeatureWeights.CLASS_YEAR,
+            pr.interested_feature * SpRecommenderFeatureWeights.INTERESTED,
+        ]
+    )
+
+
+def recommender_score_expression(interested_feature=F("interested_feature")):
+    """recommender_score as an SQL expression, for updates of the score along
+    with the features"""
+    return (
+        F("friend_feature") * SpRecommenderFeatureWeights.FRIEND
+        + F("university_feature") * SpRecommenderFeatureWeights.UNIVERSITY
+        + F("badge_feature") * SpRecommenderFeatureWeights.BADGE
+        + F("class_year_feature") * SpRecommenderFeatureWeights.CLASS_YEAR
+        + interested_feature * SpRecommenderFeatureWeights.INTERESTED
+    )
+
+
+def badge_matrix():
+    """Returns {user_id: bitset of the user's badge ids} for every user with
+    a badge, in a single query"""
+    badges = {}
+    for user_id, badge_id in UserBadge.objects.values_list(
+        "user_id", "badge_id"
+    ).iterator():
+        badges[user_id] = badges.get(user_id, 0) | (1 << badge_id)
+    return badges
+
+
+def compute_mutual_features(prs, graph=None, badges=None):
+    """Fills in friend_feature and badge_feature of PeopleRecommender rows
+
+    A recipient's row of mutual friend counts is computed once for its run of
+    consecutive rows, so rows should be ordered by recipient.
+
+    Args:
+        prs (iterable): PeopleRecommender rows, only their recipient_id and
+            recommendation_id are read
+        graph (FriendGraph): Defaults to the current friend graph
+        badges (dict): Defaults to badge_matrix()
+
+    Yields:
+        Every row, with its features set
+    """
+    graph = graph or friend_graph.get()
+    badges = badge_matrix() if badges is None else badges
+
+    recipient_id = None
+    for pr in prs:
+        if pr.recipient_id != recipient_id:
+            recipient_id = pr.recipient_id
+            mutual_friends = graph.mutual_friend_counts(recipient_id)
+            recipient_badges = badges.get(recipient_id, 0)
+
+        pr.friend_feature = min(
+            1,
+            mutual_friends.get(pr.recommendation_id, 0)
+            / SpRecommenderFeatureThresholds.FRIEND,
+        )
+        pr.badge_feature = min(
+            1,
+            bin(recipient_badges & badges.get(pr.recommendation_id, 0)).count("1")
+            / SpRecommenderFeatureThresholds.BADGE,
+        )
+        yield pr
+
+
+def bulk_update_recommenders(prs, fields, batch_size=RECOMMENDER_BATCH_SIZE):
+    """Writes `fields` of PeopleRecommender rows back in batches, along with
+    their score, stamping last_updated as save() would
+
+    Returns:
+        Number of rows written
+    """
+    fields = list(fields) + ["score", "last_updated"]
+    batch = []
+    written = 0
+    for pr in prs:
+        pr.score = recommender_score(pr)
+        pr.last_updated = timezone.now()
+        batch.append(pr)
+        if len(batch) >= batch_size:
+            PeopleRecommender.objects.bulk_update(batch, fields)
+            written += len(batch)
+            batch = []
+    if batch:
+        PeopleRecommender.objects.bulk_update(batch, fields)
+        written += len(batch)
+    return written
+
+
+def update_mutual_features(queryset=None):
+    """Recomputes friend_feature and badge_feature of every row of
+    `queryset`, all rows by default
+
+    Returns:
+        Number of rows written
+    """
+    if queryset is None:
+        queryset = PeopleRecommender.objects.all()
+    prs = (
+        queryset.only(
+            "id",
+            "recipient_id",
+            "recommendation_id",
+            # read back to compute the score
+            "university_feature",
+            "class_year_feature",
+            "interested_feature",
+        )
+        .order_by("recipient_id")
+        .iterator(chunk_size=RECOMMENDER_BATCH_SIZE)
+    )
+    written = bulk_update_recommenders(
+        compute_mutual_features(prs), ["friend_feature", "badge_feature"]
+    )
+    logger.info(f"Updated mutual features of {written} recommender rows")
+    return written
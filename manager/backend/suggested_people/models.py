@@ -36,10 +36,20 @@ class PeopleRecommender(models.Model):
     interested_feature = models.FloatField()
     last_updated = models.DateTimeField(auto_now=True)
     dirty = models.BooleanField(default=False)
+    # weighted sum of the features, kept up to date with them
+    score = models.FloatField(default=0)
 
     class Meta:
         unique_together = ("recipient", "recommendation")
         indexes = [
             models.Index(fields=["id"]),
             models.Index(fields=["recipient"]),
+            # suggested people are ranked by score
+            models.Index(fields=["recipient", "-score"]),
+            # the feature refresh only reads dirty rows, by recipient
+            models.Index(
+                fields=["recipient"],
+                condition=models.Q(dirty=True),
+                name="backend_peo_dirty_idx",
+            ),
         ]
@@ -1,18 +1,17 @@
 import random
+from collections import defaultdict
 
-from django.core.cache import cache
+from django.db import models
 from rest_framework import serializers
 
+from ..common.friend_graph_manager import friend_graph
+from ..common.image_manager import profile_thumbnail_urls
+from ..friends.utils import get_friendship_statuses
 from ..models import TaggUser
 from ..serializers import TaggUserSerializer
-from ..social_linking.utils import get_linked_socials
-from .models import Badge
-from .utils import (
-    fetch_suggested_people_url,
-    get_badges_for_user,
-    get_friendship,
-    get_mutual_friends,
-)
+from ..social_linking.utils import get_linked_socials_by_user
+from .models import Badge, UserBadge
+from .utils import fetch_suggested_people_url
 
 
 class BadgeSerializer(serializers.ModelSerializer):
@@ -21,6 +20,24 @@ class BadgeSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class SuggestedPeopleListSerializer(serializers.ListSerializer):
+    """
+    Serializes a page of suggested people in a fixed number of queries:
+    mutual friends, badges, social links, friendships and thumbnails are
+    resolved for the whole page up front
+    """
+
+    def to_representation(self, data):
+        users = list(data.all() if isinstance(data, models.Manager) else data)
+        if not users:
+            return []
+        self.child.batch = self.child.get_batch(users)
+        try:
+            return [self.child.to_representation(user) for user in users]
+        finally:
+            self.child.batch = None
+
+
 class SuggestedPeopleSerializer(serializers.ModelSerializer):
     user = serializers.SerializerMethodField()
     mutual_friends = serializers.SerializerMethodField()
@@ -41,35 +58,85 @@ class SuggestedPeopleSerializer(serializers.ModelSerializer):
             "friendship",
             "university",
         ]
+        list_serializer_class = SuggestedPeopleListSerializer
 
-    def get_user(self, obj):
-        return TaggUserSerializer(obj).data
+    # set by SuggestedPeopleListSerializer while serializing a page
+    batch = None
 
-    def get_mutual_friends(self, obj):
+    def get_batch(self, users):
         request_user = self.context.get("user")
-        cache_time = 60 ** 3
-        cache_key = f"friendship_{request_user.id}_{obj.id}"
-        mutual_friends = cache.get(cache_key)
+        ids = [user.id for user in users]
+
+        graph = friend_graph.get()
+        mutual_friend_ids = {
+            user.id: graph.mutual_friend_ids(request_user, user) for user in users
+        }
+        friends = {
+            friend_id
+            for friend_ids in mutual_friend_ids.values()
+            for friend_id in friend_ids
+        }
+        friends = TaggUser.objects.in_bulk(friends) if friends else {}
+
+        badges = defaultdict(list)
+        for user_badge in (
+            UserBadge.objects.filter(user__in=ids)
+            .select_related("badge")
+            .order_by("badge_id")
+        ):
+            badges[user_badge.user_id].append(user_badge.badge)
+
+        return {
+            "mutual_friends": {
+                user_id: [
+                    friends[friend_id]
+                    for friend_id in friend_ids
+                    if friend_id in friends
+                ]
+                for user_id, friend_ids in mutual_friend_ids.items()
+            },
+            "badges": badges,
+            "social_links": get_linked_socials_by_user(ids),
+            "friendships": get_friendship_statuses(request_user, ids),
+            "thumbnail_urls": profile_thumbnail_urls(ids + list(friends)),
+        }
+
+    def to_representation(self, instance):
+        # a single suggested person is serialized as a page of one
+        if self.batch:
+            return super().to_representation(instance)
+        self.batch = self.get_batch([instance])
+        try:
+            return super().to_representation(instance)
+        finally:
+            self.batch = None
 
-        if mutual_friends == None:
-            mutual_friends = get_mutual_friends(request_user, obj, shuffled=False)
-            cache.set(cache_key, mutual_friends, cache_time)
+    def get_user(self, obj):
+        return TaggUserSerializer(
+            obj, context={"thumbnail_urls": self.batch["thumbnail_urls"]}
+        ).data
 
+    def get_mutual_friends(self, obj):
+        mutual_friends = list(self.batch["mutual_friends"][obj.id])
         random.shuffle(mutual_friends)
-
-        return TaggUserSerializer(mutual_friends, many=True).data
+        return TaggUserSerializer(
+            mutual_friends,
+            many=True,
+            context={"thumbnail_urls": self.batch["thumbnail_urls"]},
+        ).data
 
     def get_badges(self, obj):
-        return BadgeSerializer(get_badges_for_user(obj), many=True).data
+        return BadgeSerializer(self.batch["badges"][obj.id], many=True).data
 
     def get_social_links(self, obj):
-        return get_linked_socials(obj)
+        return self.batch["social_links"][obj.id]
 
     def get_suggested_people_url(self, obj):
         return fetch_suggested_people_url(obj)
 
     def get_friendship(self, obj):
-        return get_friendship(self.context.get("user"), obj)
+        status, requester_id = self.batch["friendships"][obj.id]
+        return {"status": status, "requester_id": requester_id}
 
     def get_university(self, obj):
         return obj.university
@@ -3,19 +3,30 @@ import random
 
 from background_task import background
 from django.conf import settings
-from django.db.models import Q
+from django.db.models import F, Q
 
-from ..common.constants import (
-    SpRecommenderFeatureThresholds,
-    SpRecommenderFeatureWeights,
-)
-from ..common.utils import light_shuffle
+from ..common.friend_graph_manager import friend_ids, mutual_friend_ids
+from ..common.utils import light_shuffle_page
 from ..friends.models import Friends, FriendshipStatusType
-from ..friends.utils import find_user_friends
-from ..models import SuggestedPeopleLinked
 from ..serializers import TaggUser
+from .candidates import refresh_recommender_candidates
+from .features import (
+    RECOMMENDER_BATCH_SIZE,
+    bulk_update_recommenders,
+    compute_mutual_features,
+    recommender_score_expression,
+)
 from .models import PeopleRecommender, UserBadge, Badge
 
+RECOMMENDER_FEATURE_FIELDS = [
+    "friend_feature",
+    "university_feature",
+    "badge_feature",
+    "class_year_feature",
+    "interested_feature",
+    "dirty",
+]
+
 
 def get_image_and_file_name(user_id):
     """
@@ -39,22 +50,15 @@ def get_badges_for_user(user):
 
 
 def get_mutual_badges(user1, user2):
-    b1 = get_badges_for_user(user1)
-    b2 = get_badges_for_user(user2)
-    return list(set(b1).intersection(set(b2)))
+    return list(Badge.objects.filter(badge__user=user1).filter(badge__user=user2))
 
 
 def get_mutual_friends(user1, user2, shuffled=False):
     """
     Takes in two users (TaggUser) and retrieves a an intersection of friends list for the user
     """
-    friends1 = find_user_friends(user1)
-    friends2 = find_user_friends(user2)
-    mutual_friends = [
-        friend
-        for friend in friends1
-        if _contains(friends2, lambda object: object.id == friend.id)
-    ]
+    ids = mutual_friend_ids(user1, user2)
+    mutual_friends = list(TaggUser.objects.filter(id__in=ids)) if ids else []
     if shuffled:
         random.shuffle(mutual_friends)
     return mutual_friends
@@ -62,41 +66,32 @@ def get_mutual_friends(user1, user2, shuffled=False):
 
 @background(schedule=0)
 def mark_user_dirty(user_id):
-    user = TaggUser.objects.get(id=user_id)
-    prs = PeopleRecommender.objects.filter(Q(recipient=user) | Q(recommendation=user))
-    for pr in prs:
-        if pr.dirty:
-            continue
-        pr.dirty = True
-        pr.save()
+    PeopleRecommender.objects.filter(
+        Q(recipient=user_id) | Q(recommendation=user_id), dirty=False
+    ).update(dirty=True)
 
 
 @background(schedule=0)
 def mark_users_uninterested_1_count(user_id, uninterested_user_ids):
-    user = TaggUser.objects.get(id=user_id)
-    uninterested_users = TaggUser.objects.filter(Q(id__in=uninterested_user_ids))
-    prs = PeopleRecommender.objects.filter(
-        Q(recipient=user), Q(recommendation__in=uninterested_users)
-    )
-    for pr in prs:
-        pr.interested_feature = pr.interested_feature * 0.9
-        pr.save()
-
-
-def _calculate_normalized_feature_value_sum(pr):
-    return sum(
-        [
-            pr.friend_feature * SpRecommenderFeatureWeights.FRIEND,
-            pr.university_feature * SpRecommenderFeatureWeights.UNIVERSITY,
-            pr.badge_feature * SpRecommenderFeatureWeights.BADGE,
-            pr.class_year_feature * SpRecommenderFeatureWeights.CLASS_YEAR,
-            pr.interested_feature * SpRecommenderFeatureWeights.INTERESTED,
-        ]
+    interested_feature = F("interested_feature") * 0.9
+    PeopleRecommender.objects.filter(
+        recipient=user_id, recommendation__in=uninterested_user_ids
+    ).update(
+        interested_feature=interested_feature,
+        score=recommender_score_expression(interested_feature),
     )
 
 
-def get_suggested_people(user, seed):
-    friends = find_user_friends(user)
+def get_suggested_people_ranking(user):
+    """
+    Ranks `user`'s suggested people.
+    Returns:
+        (ids, ranked): the IDs of the suggested people, best first when
+        ranked is True. When the user has no recommendations yet they come
+        from the dumb recommender, in no particular order, and ranked is
+        False.
+    """
+    friends = friend_ids(user)
     # Retrieve IDs of users to whom still-active friend requests were sent.
     requested_users = Friends.objects.filter(
         status=FriendshipStatusType.REQUESTED, requester=user.id
@@ -106,47 +101,64 @@ def get_suggested_people(user, seed):
         status=FriendshipStatusType.REQUESTED, requested=user
     ).values("requester")
 
-    prs = PeopleRecommender.objects.filter(
-        Q(recipient=user),
-        # filter out friends
-        ~Q(recommendation__in=friends),
-        # filter out diff universities
-        Q(recommendation__university=user.university),
-        # filter our users with whom active friend requests exist
-        ~Q(recommendation__in=requested_users),
-        ~Q(recommendation__in=requesting_users),
-        # Filter out users who have blocked the querying user.
-        ~Q(recommendation__blocked__blocker=user.id),
-    )
-    recommendations = sorted(
-        prs, key=lambda x: _calculate_normalized_feature_value_sum(x), reverse=True
-    )
-    recommendations = light_shuffle(
-        [r.recommendation for r in recommendations], seed=seed
+    # ranked by the database, reading the (recipient, -score) index
+    ids = list(
+        PeopleRecommender.objects.filter(
+            Q(recipient=user),
+            # filter out friends
+            ~Q(recommendation__in=friends),
+            # filter out diff universities
+            Q(recommendation__university=user.university),
+            # filter our users with whom active friend requests exist
+            ~Q(recommendation__in=requested_users),
+            ~Q(recommendation__in=requesting_users),
+            # Filter out users who have blocked the querying user.
+            ~Q(recommendation__blocked__blocker=user.id),
+        )
+        .order_by("-score", "recommendation_id")
+        .values_list("recommendation_id", flat=True)
     )
+    if ids:
+        return ids, True
 
     """
         Our recommendation system gets updated every 6 hours (as of 2021/05/24).
         A new user does not have the populated PeopleRecommender rows, thus we
         have to use the "dumb" recommender for these new users, for now.
     """
-    if not recommendations:
-        recommendations = get_suggested_people_dumb(user, seed)
-
-    return recommendations
+    return (
+        list(_suggested_people_dumb(user).order_by("id").values_list("id", flat=True)),
+        False,
+    )
 
 
-def get_suggested_people_dumb(user, seed):
+def order_suggested_people(ranking, seed, offset=0, limit=None):
     """
-    **LEGACY**
-    Return suggested people for `user` in an order randomized by `seed`.
+    Returns the IDs of the page at `offset` of suggested people, in the order
+    they are shown for `seed`. Ranked suggestions are light shuffled, page by
+    page, the dumb ones shuffled.
     Args:
-        user: The user whom to return suggested people for.
-        seed: The seed used to randomly shuffle the results, provided by user.
-    Returns:
-        A list of `user`'s suggested people, shuffled.
+        ranking: As returned by get_suggested_people_ranking
+    """
+    ids, ranked = ranking
+    if limit is None:
+        limit = len(ids)
+    if ranked:
+        return light_shuffle_page(ids, offset, limit, seed=seed)
+    ids = list(ids)
+    random.Random(seed).shuffle(ids)
+    return ids[offset : offset + limit]
+
+
+def get_suggested_people(user, seed):
+    """
+    Return the IDs of suggested people for `user`, in the order they are
+    shown for `seed`.
     """
+    return order_suggested_people(get_suggested_people_ranking(user), seed)
 
+
+def _suggested_people_dumb(user):
     # Retrieve IDs of users to whom still-active friend requests were sent.
     requested_users = Friends.objects.filter(
         status=FriendshipStatusType.REQUESTED, requester=user.id
@@ -165,7 +177,7 @@ def get_suggested_people_dumb(user, seed):
         status=FriendshipStatusType.FRIENDS, requester=user.id
     ).values("requested")
 
-    users = TaggUser.objects.filter(
+    return TaggUser.objects.filter(
         # Filter for users from the same university.
         Q(university=user.university),
         # Filter out users with whom active friend requests exist.
@@ -180,7 +192,18 @@ def get_suggested_people_dumb(user, seed):
         ~Q(id=user.id),
     )
 
-    results = list(users)
+
+def get_suggested_people_dumb(user, seed):
+    """
+    **LEGACY**
+    Return suggested people for `user` in an order randomized by `seed`.
+    Args:
+        user: The user whom to return suggested people for.
+        seed: The seed used to randomly shuffle the results, provided by user.
+    Returns:
+        A list of `user`'s suggested people, shuffled.
+    """
+    results = list(_suggested_people_dumb(user))
     # Shuffle the results.
     random.Random(seed).shuffle(results)
     return results
@@ -219,121 +242,116 @@ def _is_valid_suggestion(user, cur_user, friends):
     )
 
 
-def get_friendship(user, suggested_user):
-
-    friendship_status = "no_record"
-    friendship_requester_id = ""
-    if Friends.objects.filter(requested=suggested_user.id, requester=user.id).exists():
-        record = Friends.objects.filter(
-            requested=suggested_user.pk, requester=user.id
-        ).values("status")
-        friendship_status = record[0]["status"]
-        friendship_requester_id = user.id
-
-    elif Friends.objects.filter(
-        requested=user.id, requester=suggested_user.id
-    ).exists():
-        record = (
-            Friends.objects.filter(requested=user.id, requester=suggested_user)
-            .values("status")
-            .values("status")
-        )
-        friendship_status = record[0]["status"]
-        friendship_requester_id = suggested_user.id
-
-    friendship = {"status": friendship_status, "requester_id": friendship_requester_id}
-    return friendship
-
-
 def _calculate_feature_values(pr, a, b):
     """
+    Fills in the features that only depend on the two users' profiles, the
+    mutual friend and badge features come from compute_mutual_features
+
     Args:
         pr (PeopleRecommender): the recommender
-        a (TaggUser): the recipient user
-        b (TaggUser): the recommendation user
+        a (tuple): the recipient user's (university, university_class)
+        b (tuple): the recommendation user's (university, university_class)
 
     Returns
         pr (PeopleRecommender) with features filled in
     """
-    pr.friend_feature = min(
-        1, len(get_mutual_friends(a, b)) / SpRecommenderFeatureThresholds.FRIEND
-    )
-    pr.university_feature = 1 if a.university == b.university else 0
-    pr.badge_feature = min(
-        1, len(get_mutual_badges(a, b)) / SpRecommenderFeatureThresholds.BADGE
-    )
-    pr.class_year_feature = 1 if a.university_class == b.university_class else 0
+    pr.university_feature = 1 if a[0] == b[0] else 0
+    pr.class_year_feature = 1 if a[1] == b[1] else 0
     if pr.interested_feature == 0:
         # PR just got initialized, setting it to a proper default value
         pr.interested_feature = 1
     pr.dirty = False
-    pr.save()
+    return pr
+
+
+def _dirty_recommenders():
+    """
+    Yields the dirty PeopleRecommender rows grouped by recipient, along with
+    both users' profiles. Profiles are read once per user, a chunk of rows at
+    a time.
+    """
+    profiles = {}
+    chunk = []
+
+    def resolve(chunk):
+        missing = {
+            user_id
+            for pr in chunk
+            for user_id in (pr.recipient_id, pr.recommendation_id)
+            if user_id not in profiles
+        }
+        if missing:
+            profiles.update(
+                (user_id, (university, university_class))
+                for user_id, university, university_class in TaggUser.objects.filter(
+                    id__in=missing
+                ).values_list("id", "university", "university_class")
+            )
+        for pr in chunk:
+            yield pr, profiles[pr.recipient_id], profiles[pr.recommendation_id]
+
+    for pr in (
+        PeopleRecommender.objects.filter(dirty=True)
+        .only("id", "recipient_id", "recommendation_id", "interested_feature")
+        .order_by("recipient_id")
+        .iterator(chunk_size=RECOMMENDER_BATCH_SIZE)
+    ):
+        chunk.append(pr)
+        if len(chunk) >= RECOMMENDER_BATCH_SIZE:
+            yield from resolve(chunk)
+            chunk = []
+    yield from resolve(chunk)
 
 
 def insert_recommender_missing_rows():
     """
-    Populates the People Recommender table with correct number of rows.
+    Populates the People Recommender table with the rows of every onboarded
+    user's top candidates, see refresh_recommender_candidates.
 
     Constraint:
-    The table should always have n*(n-1) number of rows, given n =
-    number of existing TaggUsers that're onboarded (taggusermeta__is_onboarded=True).
+    The table holds at most RECOMMENDER_TOP_K rows per onboarded TaggUser
+    (taggusermeta__is_onboarded=True), rows of pairs that are no longer
+    candidates are deleted.
 
     Note:
     This only populate empty rows, does not caculate values for efficiency
     reason.
+
+    Returns:
+        Number of candidate rows
     """
     logger = logging.getLogger("recommender_features")
     try:
-        onboarded_users = TaggUser.objects.filter(
-            taggusermeta__is_onboarded=True,
-            taggusermeta__suggested_people_linked=SuggestedPeopleLinked.FINAL_TUTORIAL,
-        )
-        for user in onboarded_users:
-            for recommendation in onboarded_users:
-                if recommendation == user:
-                    continue
-                pr, created = PeopleRecommender.objects.get_or_create(
-                    recipient=user,
-                    recommendation=recommendation,
-                    defaults={
-                        "friend_feature": 0,
-                        "university_feature": 0,
-                        "badge_feature": 0,
-                        "class_year_feature": 0,
-                        "interested_feature": 0,
-                    },
-                )
-                if created:
-                    logger.info(
-                        f"Created row (and marked dirty) for: {user.username} -> {recommendation.username}"
-                    )
-                    pr.dirty = True
-                    pr.save()
-                else:
-                    logger.debug(
-                        f"Skipping: {user.username} -> {recommendation.username}"
-                    )
+        total, _ = refresh_recommender_candidates()
         logger.info("Done")
+        return total
     except Exception as err:
         logger.error(err)
         logger.error("Something went wrong!")
+        return 0
 
 
 def compute_recommender_feature_values():
     """
     Populates the People Recommender table with recipient-recommendation feature
-    values used for recommendation.
+    values used for recommendation, for the rows marked dirty.
+
+    Returns:
+        Number of rows updated
     """
     logger = logging.getLogger("recommender_features")
     try:
-        for pr in PeopleRecommender.objects.all():
-            if not pr.dirty:
-                continue
-            logger.info(
-                f"Found dirty PR, updating feature values: {pr.recommendation.username} -> {pr.recipient.username}"
-            )
-            _calculate_feature_values(pr, pr.recipient, pr.recommendation)
+        updated = bulk_update_recommenders(
+            compute_mutual_features(
+                _calculate_feature_values(pr, recipient, recommendation)
+                for pr, recipient, recommendation in _dirty_recommenders()
+            ),
+            RECOMMENDER_FEATURE_FIELDS,
+        )
+        logger.info(f"Updated feature values of {updated} dirty PRs")
         logger.info("Done")
+        return updated
     except Exception as err:
         logger.error(err)
         logger.error("Something went wrong!")
+        return 0
@@ -0,0 +1,145 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from ...common.friend_graph_manager import (
+    FriendGraph,
+    FriendGraphIndex,
+    are_friends,
+    friend_count,
+    friend_graph,
+    friend_ids,
+    invalidate_friend_graph,
+    mutual_friend_count,
+    mutual_friend_ids,
+)
+from ...friends.models import Friends, FriendshipStatusType
+from ...friends.utils import find_user_friends
+from ..utils import create_user
+
+
+class FriendGraphTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_friend_graph()
+        self.users = [create_user(f"user{i}", f"+1000000000{i}") for i in range(5)]
+        a, b, c, d, _ = self.users
+        self.befriend(a, b)
+        self.befriend(c, a)
+        self.befriend(b, c)
+        self.befriend(d, b)
+        # a pending request isn't a friendship
+        Friends.objects.create(requester=a, requested=d)
+        return super().setUp()
+
+    def befriend(self, requester, requested):
+        with self.captureOnCommitCallbacks(execute=True):
+            Friends.objects.create(
+                requester=requester,
+                requested=requested,
+                status=FriendshipStatusType.FRIENDS,
+            )
+
+    def test_friends(self):
+        a, b, c, d, e = self.users
+        self.assertCountEqual(friend_ids(a), [b.id, c.id])
+        self.assertCountEqual(friend_ids(str(b.id)), [a.id, c.id, d.id])
+        self.assertEqual(friend_ids(e), [])
+        self.assertEqual(friend_count(b), 3)
+        self.assertEqual(friend_count(e), 0)
+        self.assertEqual(find_user_friends(a), {b, c})
+
+        self.assertTrue(are_friends(a, c))
+        self.assertFalse(are_friends(a, d))
+        self.assertFalse(are_friends(a, e))
+
+    def test_mutual_friends(self):
+        a, b, c, d, e = self.users
+        self.assertCountEqual(mutual_friend_ids(a, b), [c.id])
+        self.assertCountEqual(mutual_friend_ids(a, d), [b.id])
+        self.assertEqual(mutual_friend_count(c, d), 1)
+        self.assertEqual(mutual_friend_ids(a, e), [])
+
+    def test_graph_follows_friendship_changes(self):
+        a, b, c, d, e = self.users
+        self.assertFalse(are_friends(a, d))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Friends.objects.update_relationship(a, d, FriendshipStatusType.FRIENDS)
+        self.assertTrue(are_friends(d, a))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Friends.objects.delete_relationship(a, b, "unfriended")
+        self.assertCountEqual(friend_ids(a), [c.id, d.id])
+        self.assertCountEqual(mutual_friend_ids(a, b), [c.id, d.id])
+
+    def test_graph_is_shared_through_the_cache(self):
+        a, b, c, _, _ = self.users
+        friend_graph.get()
+
+        # another process finds the graph serialized in the cache
+        friend_graph._graph = None
+        with self.assertNumQueries(0):
+            self.assertCountEqual(friend_ids(a), [b.id, c.id])
+
+    def test_changes_are_followed_without_reloading_the_graph(self):
+        a, b, c, d, e = self.users
+        other = FriendGraphIndex()
+        self.assertCountEqual(other.get().friend_ids(a), [b.id, c.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Friends.objects.update_relationship(a, d, FriendshipStatusType.FRIENDS)
+        with self.captureOnCommitCallbacks(execute=True):
+            Friends.objects.delete_relationship(a, b, "unfriended")
+        # e had no friends, nor an ordinal
+        self.befriend(e, c)
+
+        other._checked = 0
+        with self.assertNumQueries(0), mock.patch.object(
+            FriendGraph, "loads", side_effect=AssertionError
+        ):
+            graph = other.get()
+        self.assertCountEqual(graph.friend_ids(a), [c.id, d.id])
+        self.assertCountEqual(graph.friend_ids(b), [c.id, d.id])
+        self.assertCountEqual(graph.friend_ids(e), [c.id])
+        self.assertCountEqual(graph.mutual_friend_ids(a, e), [c.id])
+        self.assertTrue(graph.are_friends(d, a))
+
+        # a new process loads the base graph and the changes since
+        with self.assertNumQueries(0):
+            fresh = FriendGraphIndex().get()
+        for user in self.users:
+            self.assertCountEqual(fresh.friend_ids(user), graph.friend_ids(user))
+
+    @mock.patch("backend.common.friend_graph_manager.FRIEND_GRAPH_CHANGE_WAIT", 0)
+    def test_one_process_rebuilds_a_version(self):
+        a, b, c, d, _ = self.users
+        other = FriendGraphIndex()
+        self.assertCountEqual(other.get().friend_ids(a), [b.id, c.id])
+
+        # a change that wasn't recorded, the graph has to be rebuilt
+        Friends.objects.filter(requester=a, requested=d).update(
+            status=FriendshipStatusType.FRIENDS
+        )
+        invalidate_friend_graph()
+        # this process holds the new version's rebuild lock
+        version = cache.get("friend_graph:version")
+        cache.add(f"friend_graph:{version}:lock", 1)
+
+        # the other one keeps serving its graph instead of rebuilding
+        other._checked = 0
+        with self.assertNumQueries(0):
+            self.assertCountEqual(other.get().friend_ids(a), [b.id, c.id])
+
+        cache.delete(f"friend_graph:{version}:lock")
+        self.assertCountEqual(friend_ids(a), [b.id, c.id, d.id])
+        other._checked = 0
+        with self.assertNumQueries(0):
+            self.assertCountEqual(other.get().friend_ids(a), [b.id, c.id, d.id])
+
+    def test_serialization_round_trip(self):
+        graph = FriendGraph.from_database()
+        loaded = FriendGraph.loads(graph.dumps())
+        for user in self.users:
+            self.assertEqual(loaded.friend_ids(user), graph.friend_ids(user))
@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from ...common.friend_graph_manager import invalidate_friend_graph
+from ...friends.models import Friends, FriendshipStatusType
+from ...friends.utils import get_friendship_status, get_friendship_statuses
+from ...models import TaggUserMeta
+from ...suggested_people.serializers import SuggestedPeopleSerializer
+from ..utils import create_user
+
+
+class FriendshipStatusTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_friend_graph()
+        self.viewer = create_user("viewer", "+10000000000")
+        self.friend = create_user("friend", "+10000000001")
+        self.requested = create_user("requested", "+10000000002")
+        self.requesting = create_user("requesting", "+10000000003")
+        self.stranger = create_user("stranger", "+10000000004")
+        Friends.objects.create(
+            requester=self.friend,
+            requested=self.viewer,
+            status=FriendshipStatusType.FRIENDS,
+        )
+        Friends.objects.create(requester=self.viewer, requested=self.requested)
+        Friends.objects.create(requester=self.requesting, requested=self.viewer)
+        return super().setUp()
+
+    def test_statuses_are_resolved_in_one_query(self):
+        pks = [
+            self.friend.id,
+            self.requested.id,
+            str(self.requesting.id),
+            self.stranger.id,
+        ]
+        with self.assertNumQueries(1):
+            statuses = get_friendship_statuses(self.viewer, pks)
+
+        self.assertEqual(
+            statuses,
+            {
+                self.friend.id: ("friends", self.friend.id),
+                self.requested.id: ("requested", self.viewer.id),
+                str(self.requesting.id): ("requested", str(self.requesting.id)),
+                self.stranger.id: ("no_record", ""),
+            },
+        )
+        self.assertEqual(
+            get_friendship_status(self.viewer, str(self.stranger.id)),
+            ("no_record", ""),
+        )
+
+    def test_suggested_people_page_resolves_friendships_at_once(self):
+        users = [self.friend, self.requested, self.requesting, self.stranger]
+        serializer = SuggestedPeopleSerializer(
+            users, many=True, context={"user": self.viewer}
+        )
+        batch = serializer.child.get_batch(users)
+        self.assertEqual(
+            batch["friendships"][self.requested.id], ("requested", self.viewer.id)
+        )
+
+        serializer.child.batch = batch
+        self.assertEqual(
+            serializer.child.get_friendship(self.requesting),
+            {"status": "requested", "requester_id": self.requesting.id},
+        )
+
+    def test_message_search_only_returns_friends(self):
+        TaggUserMeta.objects.update(is_onboarded=True)
+        self.client.force_authenticate(self.viewer)
+        response = self.client.get("/api/search/messages/", {"query": "e"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [user["username"] for user in response.data["users"]], ["friend"]
+        )
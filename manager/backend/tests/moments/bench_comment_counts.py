@@ -0,0 +1,122 @@
+"""
+Benchmark of block-aware comment counts on a moment with thousands of comments.
+Not collected by the default test pattern, run it explicitly:
+
+    python manage.py test backend.tests.moments.bench_comment_counts
+"""
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ...models import BlockedUser, TaggUser
+from ...moments.comments.models import CommentThreads, MomentComments
+from ...moments.comments.utils import get_moment_comments_count
+from ...moments.models import Moment
+
+NUM_COMMENTERS = 100
+NUM_COMMENTS = 3000
+REPLIES_PER_COMMENT = 2
+
+
+def legacy_get_moment_comments_count(moment_id, request_user=None):
+    """The per-parent-comment implementation this benchmark compares against"""
+
+    def sum_thread(parent_comment):
+        return CommentThreads.objects.filter(
+            Q(parent_comment=parent_comment),
+            ~Q(commenter__blocker__blocked=request_user),
+            ~Q(commenter__blocked__blocker=request_user),
+        ).count()
+
+    parent_comments = MomentComments.objects.filter(
+        Q(moment_id=moment_id),
+        ~Q(commenter__blocker__blocked=request_user),
+        ~Q(commenter__blocked__blocker=request_user),
+    )
+    return (
+        sum([sum_thread(parent_comment) for parent_comment in parent_comments])
+        + parent_comments.count()
+    )
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class CommentsCountBenchmark(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            TaggUser.objects.create(
+                username=f"user_{i}",
+                email=f"user_{i}@tagg.id",
+                phone_number=f"+1{i:010d}",
+            )
+            for i in range(NUM_COMMENTERS + 2)
+        ]
+        cls.viewer, cls.blocked_viewer, commenters = users[0], users[1], users[2:]
+        BlockedUser.objects.create(blocker=cls.blocked_viewer, blocked=commenters[0])
+        BlockedUser.objects.create(blocker=commenters[1], blocked=cls.blocked_viewer)
+
+        cls.moment = Moment.objects.create(
+            user_id=commenters[0],
+            caption="benchmark",
+            moment_url="https://tagg.id/moments/bench.jpg",
+            thumbnail_url="https://tagg.id/thumbnails/bench.jpg",
+            moment_category="Early Life",
+        )
+        comments = MomentComments.objects.bulk_create(
+            [
+                MomentComments(
+                    moment_id=cls.moment,
+                    commenter=commenters[i % NUM_COMMENTERS],
+                    comment=f"comment {i}",
+                )
+                for i in range(NUM_COMMENTS)
+            ]
+        )
+        CommentThreads.objects.bulk_create(
+            [
+                CommentThreads(
+                    parent_comment=comment,
+                    commenter=commenters[(i + j + 1) % NUM_COMMENTERS],
+                    comment="reply",
+                )
+                for i, comment in enumerate(comments)
+                for j in range(REPLIES_PER_COMMENT)
+            ]
+        )
+
+    def run_timed(self, label, count):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            result = count()
+            elapsed = time.perf_counter() - start
+        print(
+            f"{label:<38} {result:>6} comments {len(queries):>6} queries "
+            f"{elapsed * 1000:>9.1f} ms"
+        )
+        return result
+
+    def test_benchmark(self):
+        print(f"\n{NUM_COMMENTS} comments, {REPLIES_PER_COMMENT} replies each")
+        viewers = [("viewer", self.viewer), ("blocked viewer", self.blocked_viewer)]
+        for label, viewer in viewers:
+            legacy = self.run_timed(
+                f"legacy, {label}",
+                lambda: legacy_get_moment_comments_count(self.moment, viewer),
+            )
+            cache.clear()
+            cold = self.run_timed(
+                f"aggregated, {label}, cold cache",
+                lambda: get_moment_comments_count(self.moment, viewer),
+            )
+            warm = self.run_timed(
+                f"aggregated, {label}, warm cache",
+                lambda: get_moment_comments_count(self.moment, viewer),
+            )
+            self.assertEqual(legacy, cold)
+            self.assertEqual(legacy, warm)
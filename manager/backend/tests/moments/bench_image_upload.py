@@ -0,0 +1,110 @@
+"""
+Benchmark of moment image uploads against an in-memory S3 stand-in that
+sleeps to simulate network latency. Not collected by the default test
+pattern, run it explicitly:
+
+    python manage.py test backend.tests.moments.bench_image_upload
+"""
+import asyncio
+import os
+import tempfile
+import time
+from io import BytesIO
+from unittest import mock
+
+import boto3
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from ...common import image_manager
+
+NUM_IMAGES = 8
+IMAGE_SIZE = (3024, 4032)
+PUT_LATENCY = 0.08
+
+
+class LatencyS3Client:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body):
+        time.sleep(PUT_LATENCY)
+        self.objects[Key] = Body
+
+    def upload_file(self, Filename, Bucket, Key):
+        with open(Filename, "rb") as f:
+            self.put_object(Bucket, Key, f.read())
+
+
+def legacy_upload_images_async(data, client):
+    """The sequential, temp file based implementation compared against"""
+
+    def upload(bucket_file_path, file_path):
+        # a resource was created for every upload
+        boto3.resource("s3", region_name="us-east-1")
+        client.upload_file(file_path, "tagg-test", bucket_file_path)
+
+    async def upload_image_helper(image_name, image_content, filename):
+        image = Image.open(image_content).convert("RGB")
+        tmp_name = os.path.join(tempfile.gettempdir(), image_content.name)
+        try:
+            image.save(tmp_name)
+            upload(filename, tmp_name)
+            image = image.resize(image_manager.THUMBNAIL_SIZE)
+            image.save(tmp_name)
+            upload(image_manager.thumbnail_filename(filename), tmp_name)
+        finally:
+            os.remove(tmp_name)
+        return image_name, "Success"
+
+    async def gather():
+        return await asyncio.gather(*(upload_image_helper(*d) for d in data))
+
+    return dict(asyncio.run(gather()))
+
+
+@override_settings(S3_BUCKET="tagg-test")
+class ImageUploadBenchmark(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        image = Image.effect_noise(IMAGE_SIZE, 64).convert("RGB")
+        buffer = BytesIO()
+        image.save(buffer, format="JPEG")
+        cls.content = buffer.getvalue()
+
+    def images(self):
+        return [
+            (
+                f"image{i}",
+                SimpleUploadedFile(f"image{i}.jpg", self.content),
+                f"moments/{i}.jpg",
+            )
+            for i in range(NUM_IMAGES)
+        ]
+
+    def run_timed(self, label, upload):
+        start = time.perf_counter()
+        status = upload()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<12} {elapsed * 1000:>9.1f} ms")
+        self.assertEqual(set(status.values()), {"Success"})
+
+    def test_benchmark(self):
+        print(
+            f"\n{NUM_IMAGES} images {IMAGE_SIZE[0]}x{IMAGE_SIZE[1]}, "
+            f"{PUT_LATENCY * 1000:.0f} ms per PUT"
+        )
+        client = LatencyS3Client()
+        self.run_timed(
+            "legacy", lambda: legacy_upload_images_async(self.images(), client)
+        )
+        with mock.patch.object(image_manager, "get_s3_client", return_value=client):
+            self.run_timed(
+                "concurrent",
+                lambda: image_manager.upload_images_async(
+                    self.images(), upload_thumbnail=True
+                ),
+            )
+        self.assertEqual(len(client.objects), NUM_IMAGES * 2)
@@ -0,0 +1,96 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ...models import BlockedUser
+from ...moments.comments.models import CommentThreads, MomentComments
+from ...moments.comments.utils import (
+    get_moment_comments_count,
+    get_moments_comments_counts,
+)
+from ...moments.models import Moment
+from ..utils import create_user
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class MomentCommentsCountTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = create_user("owner", "+10000000001")
+        self.viewer = create_user("viewer", "+10000000002")
+        self.other = create_user("other", "+10000000003")
+        self.moment = Moment.objects.create(
+            user_id=self.owner,
+            caption="caption",
+            moment_url="https://tagg.id/moments/0.jpg",
+            thumbnail_url="https://tagg.id/thumbnails/0.jpg",
+            moment_category="Early Life",
+        )
+        self.comment = MomentComments.objects.create(
+            moment_id=self.moment, commenter=self.owner, comment="first"
+        )
+        self.other_comment = MomentComments.objects.create(
+            moment_id=self.moment, commenter=self.other, comment="second"
+        )
+        CommentThreads.objects.create(
+            parent_comment=self.comment, commenter=self.other, comment="reply"
+        )
+        CommentThreads.objects.create(
+            parent_comment=self.other_comment, commenter=self.owner, comment="reply"
+        )
+        return super().setUp()
+
+    def test_cached_total_is_adjusted_on_create(self):
+        self.assertEqual(get_moment_comments_count(self.moment, self.viewer), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            comment = MomentComments.objects.create(
+                moment_id=self.moment, commenter=self.viewer, comment="third"
+            )
+            CommentThreads.objects.create(
+                parent_comment=comment, commenter=self.owner, comment="reply"
+            )
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                get_moment_comments_count(self.moment.moment_id, self.viewer), 6
+            )
+
+    def test_cached_total_is_invalidated_on_delete(self):
+        moment_id = str(self.moment.moment_id)
+        self.assertEqual(get_moment_comments_count(moment_id), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other_comment.delete()
+
+        self.assertEqual(get_moment_comments_count(moment_id), 2)
+
+    def test_blocked_users_are_excluded_both_ways(self):
+        self.assertEqual(get_moment_comments_count(self.moment, self.viewer), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            block = BlockedUser.objects.create(blocker=self.other, blocked=self.viewer)
+        # other's comment, the reply under it and other's reply are hidden
+        self.assertEqual(get_moment_comments_count(self.moment, self.viewer), 1)
+        self.assertEqual(get_moment_comments_count(self.moment, self.owner), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            block.delete()
+            BlockedUser.objects.create(blocker=self.viewer, blocked=self.other)
+        self.assertEqual(get_moment_comments_count(self.moment, self.viewer), 1)
+
+    def test_batch_counts_moments_without_comments(self):
+        empty_moment = Moment.objects.create(
+            user_id=self.owner,
+            caption="caption",
+            moment_url="https://tagg.id/moments/1.jpg",
+            thumbnail_url="https://tagg.id/thumbnails/1.jpg",
+            moment_category="Early Life",
+        )
+        self.assertEqual(
+            get_moments_comments_counts(
+                [self.moment.moment_id, empty_moment.moment_id], self.viewer
+            ),
+            {self.moment.moment_id: 4, empty_moment.moment_id: 0},
+        )
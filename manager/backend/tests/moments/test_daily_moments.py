@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from django.test import TestCase
+
+from ...moments.models import DailyMoment, Moment
+from ...moments.utils import dailyMoments
+from ..utils import create_user
+
+
+def create_moment(user, index):
+    return Moment.objects.create(
+        user_id=user,
+        caption="caption",
+        moment_url=f"https://tagg.id/moments/{index}.jpg",
+        thumbnail_url=f"https://tagg.id/thumbnails/{index}.jpg",
+        moment_category="Early Life",
+    )
+
+
+class DailyMomentsTest(TestCase):
+    def setUp(self):
+        self.users = [
+            create_user(f"user_{i}", f"+1{i:010d}", is_onboarded=True)
+            for i in range(10)
+        ]
+        self.moments = [
+            create_moment(user, i * 3 + j)
+            for i, user in enumerate(self.users)
+            for j in range(3)
+        ]
+        return super().setUp()
+
+    def test_distinct_unseen_moments_per_user(self):
+        viewer = self.users[0]
+        seen = [moment for moment in self.moments if moment.user_id != viewer][:6]
+        yesterday = datetime.now().date() - timedelta(days=1)
+        DailyMoment.objects.bulk_create(
+            [
+                DailyMoment(
+                    user=viewer,
+                    moment=moment,
+                    owner_id=moment.user_id,
+                    date=yesterday,
+                    status=True,
+                )
+                for moment in seen
+            ]
+        )
+
+        stats = dailyMoments()
+
+        self.assertEqual(stats["users"], 10)
+        self.assertEqual(stats["rows"], 70)
+        today = DailyMoment.objects.filter(user=viewer, date=datetime.now().date())
+        self.assertEqual(today.count(), 7)
+        owners = list(today.values_list("owner_id", flat=True))
+        self.assertEqual(len(set(owners)), 7)
+        self.assertNotIn(viewer.pk, owners)
+        self.assertFalse(today.filter(moment__in=seen).exists())
+
+    def test_users_with_todays_moments_are_skipped(self):
+        create_user("waitlisted", "+19999999999", is_onboarded=False)
+        self.assertEqual(dailyMoments()["rows"], 70)
+        self.assertEqual(dailyMoments()["rows"], 0)
+        self.assertEqual(DailyMoment.objects.count(), 70)
@@ -0,0 +1,124 @@
+from unittest import mock
+
+from background_task.tasks import tasks
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ...models import BlockedUser
+from ...moments.feed.models import DiscoverFeedItem, DiscoverFeedOwner
+from ...moments.feed.utils import check_discover_feeds, get_discover_feed
+from ...moments.models import Moment
+from ..utils import create_user
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class DiscoverFeedTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = create_user("viewer", "+10000000001")
+        self.friend = create_user("friend", "+10000000002")
+        self.stranger = create_user("stranger", "+10000000003")
+        self.moments = [self.create_moment(user) for user in [self.friend] * 2]
+        self.moments.append(self.create_moment(self.stranger))
+        return super().setUp()
+
+    def create_moment(self, user, fan_out=True):
+        with self.captureOnCommitCallbacks(execute=True):
+            moment = Moment.objects.create(
+                user_id=user,
+                caption="caption",
+                moment_url="https://tagg.id/moments/0.jpg",
+                thumbnail_url="https://tagg.id/thumbnails/0.jpg",
+                moment_category="Early Life",
+            )
+        if fan_out:
+            self.run_tasks()
+        return moment
+
+    def run_tasks(self):
+        while tasks.run_next_task():
+            pass
+
+    def test_feed_is_built_on_first_read(self):
+        self.assertFalse(DiscoverFeedItem.objects.exists())
+        self.assertEqual(get_discover_feed(self.viewer), self.moments[::-1])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(get_discover_feed(self.viewer), self.moments[::-1])
+
+    def test_new_moments_are_fanned_out(self):
+        get_discover_feed(self.viewer)
+        moment = self.create_moment(self.stranger)
+
+        self.assertEqual(get_discover_feed(self.viewer)[0], moment)
+        # feeds that were never read are not materialized
+        self.assertFalse(DiscoverFeedItem.objects.filter(user=self.friend).exists())
+
+    def test_fan_out_is_deferred(self):
+        get_discover_feed(self.viewer)
+        moment = self.create_moment(self.stranger, fan_out=False)
+        self.assertNotIn(moment, get_discover_feed(self.viewer))
+
+        self.run_tasks()
+        self.assertEqual(get_discover_feed(self.viewer)[0], moment)
+
+    @mock.patch("backend.moments.feed.utils.DISCOVER_FEED_LENGTH", 3)
+    def test_feeds_are_trimmed(self):
+        get_discover_feed(self.viewer)
+        for _ in range(2):
+            self.create_moment(self.friend)
+
+        self.assertEqual(DiscoverFeedItem.objects.filter(user=self.viewer).count(), 3)
+
+    def test_empty_feed_is_built_once(self):
+        Moment.objects.all().delete()
+        self.assertEqual(get_discover_feed(self.viewer), [])
+        self.assertTrue(DiscoverFeedOwner.objects.filter(user=self.viewer).exists())
+
+        with self.assertNumQueries(2):
+            self.assertEqual(get_discover_feed(self.viewer), [])
+        moment = self.create_moment(self.friend)
+        self.assertEqual(get_discover_feed(self.viewer), [moment])
+
+    def test_blocks_rebuild_both_feeds(self):
+        get_discover_feed(self.viewer)
+        get_discover_feed(self.stranger)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            block = BlockedUser.objects.create(
+                blocker=self.stranger, blocked=self.viewer
+            )
+        self.run_tasks()
+        self.assertEqual(get_discover_feed(self.viewer), self.moments[1::-1])
+        self.create_moment(self.stranger)
+        self.assertEqual(get_discover_feed(self.viewer), self.moments[1::-1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            block.delete()
+        self.run_tasks()
+        self.assertEqual(len(get_discover_feed(self.viewer)), 4)
+
+    def test_blocks_dont_build_unread_feeds(self):
+        get_discover_feed(self.viewer)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BlockedUser.objects.create(blocker=self.stranger, blocked=self.viewer)
+        # deferred to a task
+        self.assertEqual(len(get_discover_feed(self.viewer)), 3)
+        self.run_tasks()
+
+        self.assertEqual(get_discover_feed(self.viewer), self.moments[1::-1])
+        self.assertFalse(DiscoverFeedOwner.objects.filter(user=self.stranger).exists())
+        self.assertFalse(DiscoverFeedItem.objects.filter(user=self.stranger).exists())
+
+    def test_checker_finds_and_fixes_drift(self):
+        get_discover_feed(self.viewer)
+        DiscoverFeedItem.objects.filter(moment=self.moments[0]).delete()
+
+        self.assertEqual(
+            check_discover_feeds(fix=True),
+            {"checked": 1, "inconsistent": 1, "rebuilt": 1},
+        )
+        self.assertEqual(check_discover_feeds()["inconsistent"], 0)
@@ -0,0 +1,91 @@
+import threading
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from ...common import image_manager
+
+
+class FakeS3Client:
+    """Keeps uploaded objects in memory, failing keys listed in fail"""
+
+    def __init__(self, fail=()):
+        self.objects = {}
+        self.fail = set(fail)
+        self.lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body):
+        if Key in self.fail:
+            raise ConnectionError(f"Could not upload {Key}")
+        with self.lock:
+            self.objects[Key] = Body
+
+
+def image_file(name, size=(300, 200), format="JPEG"):
+    buffer = BytesIO()
+    Image.new("RGB", size, "red").save(buffer, format=format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(S3_BUCKET="tagg-test")
+class ImageUploadTest(SimpleTestCase):
+    def upload(self, client, data):
+        with mock.patch.object(image_manager, "get_s3_client", return_value=client):
+            return image_manager.upload_images_async(data, upload_thumbnail=True)
+
+    def test_images_and_thumbnails_are_uploaded(self):
+        client = FakeS3Client()
+        status = self.upload(
+            client,
+            [
+                ("image1", image_file("image.jpg"), "moments/a.jpg"),
+                ("image2", image_file("image.png", format="PNG"), "moments/b.png"),
+            ],
+        )
+
+        self.assertEqual(status, {"image1": "Success", "image2": "Success"})
+        self.assertEqual(
+            set(client.objects),
+            {
+                "moments/a.jpg",
+                "thumbnails/moments/a-thumbnail.jpg",
+                "moments/b.png",
+                "thumbnails/moments/b-thumbnail.jpg",
+            },
+        )
+        thumbnail = Image.open(
+            BytesIO(client.objects["thumbnails/moments/a-thumbnail.jpg"])
+        )
+        self.assertEqual(thumbnail.size, image_manager.THUMBNAIL_SIZE)
+        self.assertEqual(
+            Image.open(BytesIO(client.objects["moments/b.png"])).format, "PNG"
+        )
+
+    def test_failures_are_reported_per_image(self):
+        client = FakeS3Client(fail={"thumbnails/moments/b-thumbnail.jpg"})
+        status = self.upload(
+            client,
+            [
+                ("image1", image_file("image.jpg"), "moments/a.jpg"),
+                ("image2", image_file("image.jpg"), "moments/b.jpg"),
+                ("image3", SimpleUploadedFile("image.jpg", b"not an image"), "c.jpg"),
+            ],
+        )
+
+        self.assertEqual(
+            status,
+            {
+                "image1": "Success",
+                "image2": "Image Upload Failed",
+                "image3": "Unknown Error",
+            },
+        )
+
+    def test_upload_image_raises_on_failure(self):
+        client = FakeS3Client(fail={"profile.jpeg"})
+        with mock.patch.object(image_manager, "get_s3_client", return_value=client):
+            with self.assertRaises(image_manager.ImageUploadException):
+                image_manager.upload_image(Image.new("RGB", (10, 10)), "profile.jpeg")
@@ -0,0 +1,131 @@
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ...common.counter_manager import QUEUE_GAP_TIMEOUT, flush_all_counters
+from ...moments.models import Moment
+from ...moments.shares.utils import moment_share_counter, record_moment_share
+from ...moments.views.models import MomentViews
+from ...moments.views.utils import moment_view_counter, record_moment_view
+from ..utils import create_user
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class MomentCountersTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = create_user("owner", "+10000000001")
+        self.viewer = create_user("viewer", "+10000000002")
+        self.moment = Moment.objects.create(
+            user_id=self.owner,
+            caption="caption",
+            moment_url="https://tagg.id/moments/0.jpg",
+            thumbnail_url="https://tagg.id/thumbnails/0.jpg",
+            moment_category="Early Life",
+        )
+        return super().setUp()
+
+    def test_counter_is_seeded_from_view_records(self):
+        MomentViews.objects.bulk_create(
+            [
+                MomentViews(moment_viewed=self.moment, moment_viewer=self.viewer)
+                for _ in range(7)
+            ]
+        )
+        self.assertEqual(moment_view_counter.get(self.moment.moment_id), 7)
+
+    def test_views_are_flushed_to_column(self):
+        with mock.patch("backend.moments.views.utils.random.randint", return_value=4):
+            record_moment_view(self.moment, self.viewer)
+            record_moment_view(self.moment, self.viewer)
+        record_moment_share(self.moment, self.viewer)
+        flush_all_counters()
+
+        self.moment.refresh_from_db()
+        self.assertEqual(self.moment.view_count, 8)
+        self.assertEqual(self.moment.share_count, 1)
+        self.assertEqual(
+            MomentViews.objects.filter(moment_viewed=self.moment).count(), 8
+        )
+
+    def test_queue_is_flushed_by_the_command(self):
+        # nothing flushes in the recording process, the queue is in the cache
+        record_moment_share(self.moment, self.viewer)
+        call_command("flush_counters", stdout=StringIO())
+        self.moment.refresh_from_db()
+        self.assertEqual(self.moment.share_count, 1)
+
+        # flushed objects are queued again by their next increment
+        record_moment_share(self.moment, self.viewer)
+        call_command("flush_counters", stdout=StringIO())
+        self.moment.refresh_from_db()
+        self.assertEqual(self.moment.share_count, 2)
+
+        self.assertEqual(flush_all_counters(), 0)
+
+    def test_failed_share_is_not_counted(self):
+        with mock.patch(
+            "backend.moments.shares.utils.MomentShares.objects.create",
+            side_effect=Exception,
+        ):
+            with self.assertRaises(Exception):
+                record_moment_share(self.moment, self.viewer)
+        self.assertEqual(moment_share_counter.get(self.moment.moment_id), 0)
+
+        flush_all_counters()
+        self.moment.refresh_from_db()
+        self.assertEqual(self.moment.share_count, 0)
+
+    def test_flush_waits_for_slots_being_filled(self):
+        record_moment_share(self.moment, self.viewer)
+        # another process took the next slot but hasn't stored its pk yet
+        slot = cache.incr("counter:moment_shares:queue:head")
+        other = Moment.objects.create(
+            user_id=self.owner,
+            caption="caption",
+            moment_url="https://tagg.id/moments/1.jpg",
+            thumbnail_url="https://tagg.id/thumbnails/1.jpg",
+            moment_category="Early Life",
+        )
+        cache.add(f"counter:moment_shares:queue:pk:{other.moment_id}", 1)
+        moment_share_counter.get(other.moment_id)
+        cache.incr(f"counter:moment_shares:{other.moment_id}")
+
+        self.assertEqual(flush_all_counters(), 1)
+        cache.set(f"counter:moment_shares:queue:{slot}", other.moment_id)
+        self.assertEqual(flush_all_counters(), 1)
+        other.refresh_from_db()
+        self.assertEqual(other.share_count, 1)
+
+    def test_flush_skips_lost_slots(self):
+        # a slot whose pk never came
+        cache.add("counter:moment_shares:queue:head", 0, timeout=None)
+        cache.incr("counter:moment_shares:queue:head")
+        record_moment_share(self.moment, self.viewer)
+
+        self.assertEqual(flush_all_counters(), 0)
+        with mock.patch(
+            "backend.common.counter_manager.time.time",
+            return_value=time.time() + QUEUE_GAP_TIMEOUT,
+        ):
+            self.assertEqual(flush_all_counters(), 1)
+        self.moment.refresh_from_db()
+        self.assertEqual(self.moment.share_count, 1)
+
+    @mock.patch("backend.moments.views.utils.increase_tagg_score")
+    @mock.patch("backend.moments.views.utils.handle_notification_with_images")
+    def test_thresholds_fire_once_per_fifty_views(self, notify, increase_tagg_score):
+        with mock.patch("backend.moments.views.utils.random.randint", return_value=7):
+            for _ in range(15):
+                record_moment_view(self.moment, self.viewer)
+
+        # 105 views cross 50 and 100
+        self.assertEqual(notify.call_count, 2)
+        self.assertIn("100+ views", notify.call_args[0][4])
+        self.assertEqual(increase_tagg_score.call_count, 2)
@@ -0,0 +1,57 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+
+from ...analytics.moments.utils import get_top_moment_by_filter
+from ...models import TaggUser
+from ...moments.models import Moment, MomentScores
+from ...moments.utils import increase_moment_score, increase_moment_scores
+
+
+class MomentScoresTest(TestCase):
+    def setUp(self):
+        self.user = TaggUser.objects.create(
+            username="owner",
+            first_name="owner",
+            last_name="tagg",
+            email="owner@tagg.id",
+            phone_number="+10000000001",
+        )
+        self.moments = [
+            Moment.objects.create(
+                user_id=self.user,
+                caption="caption",
+                moment_url=f"https://tagg.id/moments/{i}.jpg",
+                thumbnail_url=f"https://tagg.id/thumbnails/{i}.jpg",
+                moment_category="Early Life",
+            )
+            for i in range(2)
+        ]
+        return super().setUp()
+
+    def test_daily_bucket_is_upserted(self):
+        first, second = self.moments
+        with self.assertNumQueries(1):
+            increase_moment_scores(
+                [(first, 0.7), (str(first.pk), 0.2), (second.pk, 10)]
+            )
+        increase_moment_score(first, 0.1)
+
+        self.assertEqual(MomentScores.objects.count(), 2)
+        self.assertEqual(MomentScores.objects.get(moment=first).score, Decimal("1"))
+        self.assertEqual(MomentScores.objects.get(moment=second).score, Decimal("10"))
+
+    def test_top_moment_sums_daily_scores(self):
+        first, second = self.moments
+        increase_moment_scores([(first, 6), (second, 8)])
+        with mock.patch("backend.moments.utils.timezone.now") as now:
+            now.return_value = MomentScores.objects.first().timestamp.replace(
+                day=1, month=1
+            )
+            increase_moment_scores([(first, 5)])
+
+        lifetime = get_top_moment_by_filter(self.user, "LIFETIME")
+        self.assertEqual(lifetime["moment"]["moment_id"], str(first.pk))
+        today = get_top_moment_by_filter(self.user, 0)
+        self.assertEqual(today["moment"]["moment_id"], str(second.pk))
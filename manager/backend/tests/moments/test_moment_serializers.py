@@ -0,0 +1,108 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ...models import BlockedUser
+from ...moments.comments.models import CommentThreads, MomentComments
+from ...moments.models import Moment
+from ...moments.serializers import MomentPostSerializer, PublicMomentPostSerializer
+from ...moments.shares.models import MomentShares
+from ...moments.views.models import MomentViews
+from ...skins.models import Skin, TemplateType
+from ..utils import create_user
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class MomentPostListSerializerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = create_user("viewer", "+10000000001")
+        self.owners = [create_user(f"owner_{i}", f"+1000000010{i}") for i in range(3)]
+        self.blocked = create_user("blocked", "+10000000002")
+        BlockedUser.objects.create(blocker=self.viewer, blocked=self.blocked)
+        Skin.objects.create(
+            owner=self.owners[0],
+            template_type=TemplateType.THREE,
+            primary_color="#FFFFFF",
+            secondary_color="#698DD3",
+            active=True,
+        )
+        return super().setUp()
+
+    def create_moments(self, count):
+        moments = []
+        for i in range(count):
+            owner = self.owners[i % len(self.owners)]
+            moment = Moment.objects.create(
+                user_id=owner,
+                caption=f"caption {i}",
+                moment_url=f"https://tagg.id/moments/{i}.jpg",
+                thumbnail_url=f"https://tagg.id/thumbnails/{i}.jpg",
+                moment_category="Early Life",
+            )
+            for _ in range(i % 4):
+                MomentViews.objects.create(
+                    moment_viewed=moment, moment_viewer=self.viewer
+                )
+            for _ in range(i % 2):
+                MomentShares.objects.create(
+                    moment_shared=moment, moment_sharer=self.viewer
+                )
+            comment = MomentComments.objects.create(
+                moment_id=moment, commenter=owner, comment="nice"
+            )
+            CommentThreads.objects.create(
+                parent_comment=comment, commenter=self.blocked, comment="hidden"
+            )
+            CommentThreads.objects.create(
+                parent_comment=comment, commenter=self.viewer, comment="reply"
+            )
+            blocked_comment = MomentComments.objects.create(
+                moment_id=moment, commenter=self.blocked, comment="hidden"
+            )
+            CommentThreads.objects.create(
+                parent_comment=blocked_comment, commenter=owner, comment="hidden"
+            )
+            moments.append(moment)
+        return Moment.objects.filter(
+            moment_id__in=[moment.moment_id for moment in moments]
+        ).order_by("-date_created")
+
+    def count_queries(self, moments):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            MomentPostSerializer(moments, many=True, context={"user": self.viewer}).data
+        return len(queries)
+
+    def test_batched_output_matches_per_moment_output(self):
+        moments = self.create_moments(6)
+        batched = MomentPostSerializer(
+            moments, many=True, context={"user": self.viewer}
+        ).data
+        single = [
+            MomentPostSerializer(moment, context={"user": self.viewer}).data
+            for moment in moments
+        ]
+        self.assertEqual(batched, single)
+        self.assertEqual(batched[0]["comments_count"], 2)
+
+    def test_public_batched_output_matches_per_moment_output(self):
+        moments = self.create_moments(4)
+        batched = PublicMomentPostSerializer(moments, many=True).data
+        single = [PublicMomentPostSerializer(moment).data for moment in moments]
+        self.assertEqual(batched, single)
+        self.assertEqual(batched[0]["comments_count"], 5)
+
+    def test_query_count_is_flat_in_page_size(self):
+        small_page = self.count_queries(self.create_moments(5))
+        Moment.objects.all().delete()
+        large_page = self.count_queries(self.create_moments(25))
+        self.assertEqual(small_page, large_page)
+
+    def test_user_context_is_required(self):
+        moments = self.create_moments(1)
+        with self.assertRaises(NotImplementedError):
+            MomentPostSerializer(moments, many=True).data
@@ -0,0 +1,91 @@
+import tempfile
+from datetime import datetime, timezone
+from io import BytesIO
+from unittest import mock
+
+from botocore.response import StreamingBody
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from ...common import thumbnail_manager
+from ...common.thumbnail_manager import ThumbnailCache, thumbnail_response
+
+THUMBNAIL = b"\xff\xd8" + b"thumbnail" * 100
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.gets = 0
+
+    def get_object(self, Bucket, Key):
+        self.gets += 1
+        return {
+            "Body": StreamingBody(BytesIO(THUMBNAIL), len(THUMBNAIL)),
+            "ContentLength": len(THUMBNAIL),
+            "ETag": '"abc123"',
+            "LastModified": datetime(2022, 4, 1, tzinfo=timezone.utc),
+        }
+
+
+@override_settings(S3_BUCKET="tagg-test")
+class ThumbnailCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ThumbnailCache(self.directory.name, 4096, 4096)
+        self.client = FakeS3Client()
+        patches = [
+            mock.patch.object(
+                thumbnail_manager, "get_thumbnail_cache", return_value=self.cache
+            ),
+            mock.patch.object(
+                thumbnail_manager, "get_s3_client", return_value=self.client
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self.directory.cleanup)
+
+    def get(self, **headers):
+        request = RequestFactory().get("/", **headers)
+        return thumbnail_response(request, "thumbnails/moments/a-thumbnail.jpg")
+
+    def test_miss_is_streamed_and_cached(self):
+        response = self.get()
+        self.assertTrue(response.streaming)
+        self.assertEqual(b"".join(response.streaming_content), THUMBNAIL)
+        self.assertEqual(response["ETag"], '"abc123"')
+        self.assertEqual(response["Last-Modified"], "Fri, 01 Apr 2022 00:00:00 GMT")
+
+        response = self.get()
+        self.assertEqual(response.content, THUMBNAIL)
+        self.assertEqual(self.client.gets, 1)
+        metrics = self.cache.metrics()
+        self.assertEqual(metrics["hit_rate"], 0.5)
+        self.assertEqual(metrics["bytes_served"], 2 * len(THUMBNAIL))
+
+    def test_if_none_match_is_answered_with_304(self):
+        b"".join(self.get().streaming_content)
+        response = self.get(HTTP_IF_NONE_MATCH='W/"abc123"')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], '"abc123"')
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_disk_tier_survives_restart_and_memory_eviction(self):
+        b"".join(self.get().streaming_content)
+        self.cache = ThumbnailCache(self.directory.name, 100, 4096)
+        thumbnail_manager.get_thumbnail_cache.return_value = self.cache
+
+        response = self.get()
+        self.assertEqual(b"".join(response.streaming_content), THUMBNAIL)
+        self.assertEqual(self.client.gets, 1)
+        self.assertEqual(self.cache.metrics()["disk_hits"], 1)
+
+    def test_tiers_are_bounded(self):
+        cache = ThumbnailCache(self.directory.name, 2500, 2500)
+        for i in range(5):
+            cache.put(f"key{i}", THUMBNAIL, f"etag{i}", 0)
+        metrics = cache.metrics()
+        self.assertEqual(metrics["memory_entries"], 2)
+        self.assertEqual(metrics["disk_entries"], 2)
+        self.assertIsNone(cache.get("key0"))
+        self.assertIsNotNone(cache.get("key4"))
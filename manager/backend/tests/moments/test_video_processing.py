@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ...models import TaggUser
+from ...moments.models import Moment
+from ...moments.processing.models import VideoProcessing, VideoProcessingState
+from ...moments.processing.utils import start_video_processing, video_processing_state
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    S3_MOMENTS_FOLDER="moments",
+    S3_THUMBNAILS_FOLDER="thumbnails",
+    VIDEO_PROCESSING_CALLBACK_SECRET="secret",
+)
+class VideoProcessingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = TaggUser.objects.create(
+            username="owner",
+            first_name="owner",
+            last_name="tagg",
+            email="owner@tagg.id",
+            phone_number="+10000000001",
+        )
+        self.moment, _ = start_video_processing("abc.mov", self.create_moment)
+        self.client = APIClient()
+        return super().setUp()
+
+    def create_moment(self):
+        return Moment.objects.create(
+            user_id=self.user,
+            caption="caption",
+            moment_url="https://videos.tagg.id/moments/abc.mp4",
+            thumbnail_url="https://videos.tagg.id/thumbnails/abc-thumbnail.0000000.jpg",
+            moment_category="Early Life",
+        )
+
+    def post(self, action, data, secret="secret"):
+        return self.client.post(
+            f"/api/video-processing/{action}/",
+            data,
+            format="json",
+            HTTP_X_PROCESSING_SECRET=secret,
+        )
+
+    def state(self):
+        return VideoProcessing.objects.get(moment=self.moment).state
+
+    def test_retried_uploads_return_the_first_moment(self):
+        create_moment = mock.Mock(side_effect=self.create_moment)
+        moment, created = start_video_processing("abc.mov", create_moment)
+        self.assertEqual((moment, created), (self.moment, False))
+        create_moment.assert_not_called()
+
+        # the key was taken after the lookup, the new moment is rolled back
+        with mock.patch(
+            "backend.moments.processing.utils.VideoProcessing.objects.select_related"
+        ) as select_related:
+            select_related.return_value.filter.return_value.first.side_effect = [
+                None,
+                VideoProcessing.objects.get(key="abc"),
+            ]
+            moment, created = start_video_processing("abc.mov", self.create_moment)
+        self.assertEqual((moment, created), (self.moment, False))
+        self.assertEqual(Moment.objects.count(), 1)
+
+    def test_callback_follows_state_machine(self):
+        response = self.post("callback", {"filename": "abc.mov", "state": "done"}, "x")
+        self.assertEqual(response.status_code, 401)
+
+        self.post("callback", {"filename": "abc.mov", "state": "processing"})
+        self.assertEqual(self.state(), VideoProcessingState.PROCESSING)
+        self.post("callback", {"filename": "abc.mov", "state": "done"})
+        response = self.post("callback", {"filename": "abc.mov", "state": "processing"})
+        self.assertEqual(response.data, {"updated": False})
+        self.assertEqual(self.state(), VideoProcessingState.DONE)
+
+    def test_s3_events_mark_done_once_both_outputs_exist(self):
+        def event(key):
+            return {"Records": [{"s3": {"object": {"key": key}}}]}
+
+        self.post("s3_event", event("moments/abc.mp4"))
+        self.assertEqual(self.state(), VideoProcessingState.UPLOADED)
+        response = self.post("s3_event", event("thumbnails/abc-thumbnail.0000000.jpg"))
+        self.assertEqual(response.data, {"updated": 1})
+        self.assertEqual(self.state(), VideoProcessingState.DONE)
+
+    @mock.patch("backend.moments.processing.utils._session")
+    def test_head_fallback_is_cached_and_persisted(self, session):
+        session.head.return_value.status_code = 404
+        moment = Moment.objects.select_related("video_processing").get(
+            pk=self.moment.pk
+        )
+        self.assertEqual(video_processing_state(moment), VideoProcessingState.UPLOADED)
+        self.assertEqual(video_processing_state(moment), VideoProcessingState.UPLOADED)
+        self.assertEqual(session.head.call_count, 1)
+
+        cache.clear()
+        session.head.return_value.status_code = 200
+        self.assertEqual(video_processing_state(moment), VideoProcessingState.DONE)
+        self.assertEqual(self.state(), VideoProcessingState.DONE)
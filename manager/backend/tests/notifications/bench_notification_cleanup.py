@@ -0,0 +1,128 @@
+"""
+Benchmark of deleting and updating the notifications one actor sent to a user
+with a large inbox. Not collected by the default test pattern, run it
+explicitly:
+
+    python manage.py test backend.tests.notifications.bench_notification_cleanup
+"""
+import time
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ...common.notification_manager import delete_notification, update_notification
+from ...models import TaggUser
+from ...notifications.models import Notification, NotificationList, NotificationType
+
+INBOX_SIZE = 5000
+NUM_ACTORS = 10
+
+
+def legacy_update_notification(
+    user_id, actor_id, current_notification_type, notification_type, verbage
+):
+    """The per-entry implementation this benchmark compares against"""
+    for notification_list_obj in NotificationList.objects.filter(user=user_id).values(
+        "notification_id"
+    ):
+        if Notification.objects.filter(
+            id=notification_list_obj["notification_id"],
+            notification_type=current_notification_type,
+            actor_id=actor_id,
+        ).exists():
+            Notification.objects.filter(
+                id=notification_list_obj["notification_id"],
+                notification_type=current_notification_type,
+                actor_id=actor_id,
+            ).update(notification_type=notification_type, verbage=verbage)
+
+
+def legacy_delete_notification(user_id, actor_id, notification_types):
+    """The per-entry implementation this benchmark compares against"""
+    for notification_list_obj in NotificationList.objects.filter(user=user_id).values(
+        "notification_id"
+    ):
+        if Notification.objects.filter(
+            id=notification_list_obj["notification_id"],
+            notification_type__in=notification_types,
+            actor_id=actor_id,
+        ).exists():
+            Notification.objects.filter(
+                id=notification_list_obj["notification_id"],
+                notification_type__in=notification_types,
+                actor_id=actor_id,
+            ).delete()
+
+
+class NotificationCleanupBenchmark(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            TaggUser.objects.create(
+                username=f"user_{i}",
+                email=f"user_{i}@tagg.id",
+                phone_number=f"+1{i:010d}",
+            )
+            for i in range(NUM_ACTORS + 2)
+        ]
+        cls.legacy_user, cls.user, cls.actors = users[0], users[1], users[2:]
+        for user in [cls.legacy_user, cls.user]:
+            notifications = Notification.objects.bulk_create(
+                [
+                    Notification(
+                        actor=cls.actors[i % NUM_ACTORS],
+                        verbage="hello",
+                        notification_type=NotificationType.FRIEND_REQUEST
+                        if i % 2
+                        else NotificationType.COMMENT,
+                    )
+                    for i in range(INBOX_SIZE)
+                ]
+            )
+            NotificationList.objects.bulk_create(
+                [
+                    NotificationList(notification=notification, user=user)
+                    for notification in notifications
+                ]
+            )
+
+    def run_timed(self, label, run):
+        # the legacy helpers overflow the query log
+        connection.queries_log.clear()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+        print(f"{label:<24} {len(queries):>6} queries {elapsed * 1000:>9.1f} ms")
+
+    def test_benchmark(self):
+        print(f"\n{INBOX_SIZE} notifications from {NUM_ACTORS} actors")
+        actor = self.actors[1]
+        self.run_timed(
+            "legacy update",
+            lambda: legacy_update_notification(
+                self.legacy_user.id, actor.id, "FRD_REQ", "FRD_ACPT", "friends!"
+            ),
+        )
+        self.run_timed(
+            "set-based update",
+            lambda: update_notification(
+                self.user.id, actor.id, "FRD_REQ", "FRD_ACPT", "friends!"
+            ),
+        )
+        self.run_timed(
+            "legacy delete",
+            lambda: legacy_delete_notification(
+                self.legacy_user.id, actor.id, ["FRD_ACPT"]
+            ),
+        )
+        self.run_timed(
+            "set-based delete",
+            lambda: delete_notification(self.user.id, actor.id, ["FRD_ACPT"]),
+        )
+        for user in [self.legacy_user, self.user]:
+            self.assertEqual(
+                NotificationList.objects.filter(user=user).count(),
+                INBOX_SIZE - INBOX_SIZE // NUM_ACTORS,
+            )
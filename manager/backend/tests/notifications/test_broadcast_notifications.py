@@ -0,0 +1,93 @@
+from unittest import mock
+
+from rest_framework.test import APITestCase
+
+from ...common.notification_manager import (
+    delete_notification,
+    get_badge_count,
+    get_unread_counts,
+    handle_bulk_notification,
+    handle_notification,
+)
+from ...notifications.models import Notification, NotificationList, NotificationType
+from ..utils import create_user
+
+
+@mock.patch("backend.common.notification_manager.notify_user")
+@mock.patch("backend.common.notification_manager.notify_all_users")
+class BroadcastNotificationsTest(APITestCase):
+    def setUp(self):
+        self.actor = create_user("actor", "+10000000001")
+        self.user = create_user("user", "+10000000002")
+        self.other = create_user("other", "+10000000003")
+        return super().setUp()
+
+    def broadcast(self):
+        self.assertTrue(
+            handle_bulk_notification(
+                NotificationType.MOMENT_3P, self.actor, "posted a moment!"
+            )
+        )
+        return Notification.objects.get(broadcast=True)
+
+    def list_notifications(self, user):
+        self.client.force_authenticate(user)
+        response = self.client.get("/api/notifications/")
+        self.assertEqual(response.status_code, 200)
+        return response.data["results"]
+
+    def test_broadcast_is_stored_once(self, notify_all_users, notify_user):
+        self.broadcast()
+
+        self.assertEqual(Notification.objects.count(), 1)
+        self.assertFalse(NotificationList.objects.exists())
+        notify_all_users.assert_called_once()
+
+    def test_list_merges_personal_and_broadcast_streams(
+        self, notify_all_users, notify_user
+    ):
+        handle_notification(NotificationType.COMMENT, self.actor, self.user, "first")
+        broadcast = self.broadcast()
+        handle_notification(NotificationType.COMMENT, self.actor, self.user, "last")
+        late_user = create_user("late", "+10000000004")
+
+        results = self.list_notifications(self.user)
+        self.assertEqual(
+            [result["notification"]["verbage"] for result in results],
+            ["last", "posted a moment!", "first"],
+        )
+        self.assertIsNone(results[1]["id"])
+        self.assertEqual(results[1]["notification"]["id"], str(broadcast.id))
+        self.assertEqual(
+            results[0]["id"],
+            NotificationList.objects.get(notification__verbage="last").id,
+        )
+        self.assertEqual(results[1]["user"], self.user.id)
+
+        # the actor and users who joined after the broadcast don't see it
+        self.assertEqual(self.list_notifications(self.actor), [])
+        self.assertEqual(self.list_notifications(late_user), [])
+
+    def test_badge_count_includes_broadcasts(self, notify_all_users, notify_user):
+        handle_notification(NotificationType.COMMENT, self.actor, self.user, "comment")
+        self.broadcast()
+
+        self.assertEqual(get_unread_counts(self.user), {NotificationType.COMMENT: 1})
+        self.assertEqual(get_badge_count(self.user), 2)
+
+        self.client.force_authenticate(self.user)
+        response = self.client.get("/api/notifications/unread_count/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[NotificationType.COMMENT], 1)
+        self.assertEqual(response.data[NotificationType.FRIEND_REQUEST], 0)
+
+    def test_delete_only_dismisses_broadcast_for_user(
+        self, notify_all_users, notify_user
+    ):
+        broadcast = self.broadcast()
+
+        self.assertTrue(delete_notification(self.user.id, self.actor.id))
+
+        self.assertTrue(Notification.objects.filter(id=broadcast.id).exists())
+        self.assertEqual(self.list_notifications(self.user), [])
+        self.assertEqual(len(self.list_notifications(self.other)), 1)
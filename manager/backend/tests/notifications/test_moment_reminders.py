@@ -0,0 +1,97 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ...moments.models import Moment
+from ...notifications.models import Notification, NotificationType
+from ...notifications.utils import (
+    moment_posted_friend,
+    moments_posted_reminder,
+    recent_posters,
+)
+from ..utils import create_user
+
+
+@mock.patch("backend.common.notification_manager.notify_all_users")
+class MomentRemindersTest(TestCase):
+    def setUp(self):
+        self.users = [create_user(f"user_{i}", f"+1000000000{i}") for i in range(4)]
+        return super().setUp()
+
+    def post(self, user, category="Early Life", minutes_ago=0):
+        moment = Moment.objects.create(
+            user_id=user,
+            caption="caption",
+            moment_url="https://tagg.id/moments/0.jpg",
+            thumbnail_url="https://tagg.id/thumbnails/0.jpg",
+            moment_category=category,
+        )
+        Moment.objects.filter(pk=moment.pk).update(
+            date_created=timezone.now() - timedelta(minutes=minutes_ago)
+        )
+        moment.refresh_from_db()
+        return moment
+
+    def test_recent_posters_groups_moments_by_user(self, notify_all_users):
+        self.post(self.users[0], minutes_ago=30)
+        latest = self.post(self.users[0], minutes_ago=10)
+        self.post(self.users[1], minutes_ago=20)
+        self.post(self.users[2], minutes_ago=90)
+
+        with self.assertNumQueries(2):
+            posters = recent_posters(timezone.now() - timedelta(hours=1))
+            self.assertEqual(
+                [(moment.user_id.username, count) for moment, count in posters],
+                [("user_0", 2), ("user_1", 1)],
+            )
+        self.assertEqual(posters[0][0], latest)
+
+    def test_moments_posted_reminder_needs_two_posters(self, notify_all_users):
+        self.post(self.users[0], minutes_ago=30)
+        moments_posted_reminder()
+        self.assertFalse(Notification.objects.exists())
+
+        moment = self.post(self.users[1], minutes_ago=5)
+        moments_posted_reminder()
+        notification = Notification.objects.get()
+        self.assertEqual(notification.notification_type, NotificationType.MOMENT_3P)
+        self.assertEqual(notification.actor, self.users[1])
+        self.assertEqual(notification.notification_object, moment.moment_id)
+        self.assertEqual(notification.verbage, "And 2 others posted a moment!")
+
+    def test_moment_posted_friend_is_coalesced(self, notify_all_users):
+        self.post(self.users[0], minutes_ago=30)
+        self.post(self.users[1], "Friends", minutes_ago=20)
+        moment = self.post(self.users[1], "Friends", minutes_ago=5)
+        self.post(self.users[2], minutes_ago=10)
+
+        moment_posted_friend()
+
+        notification = Notification.objects.get()
+        self.assertTrue(notification.broadcast)
+        self.assertEqual(notification.actor, self.users[1])
+        self.assertEqual(notification.notification_object, moment.moment_id)
+        self.assertEqual(
+            notification.verbage,
+            "Posted 2 moments to Friends! And 2 others posted too!",
+        )
+        notify_all_users.assert_called_once()
+
+    def test_one_notification_per_run(self, notify_all_users):
+        self.post(self.users[0], minutes_ago=30)
+        moment = self.post(self.users[1], minutes_ago=5)
+
+        moment_posted_friend()
+        moments_posted_reminder()
+        moment_posted_friend()
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.notification_type, NotificationType.MOMENT_FRIEND)
+        self.assertEqual(notification.notification_object, moment.moment_id)
+
+        # a newer moment is announced again
+        self.post(self.users[2])
+        moment_posted_friend()
+        self.assertEqual(Notification.objects.count(), 2)
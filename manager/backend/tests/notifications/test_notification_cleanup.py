@@ -0,0 +1,67 @@
+from django.test import TestCase
+
+from ...common.notification_manager import delete_notification, update_notification
+from ...notifications.models import Notification, NotificationList, NotificationType
+from ..utils import create_user
+
+
+class NotificationCleanupTest(TestCase):
+    def setUp(self):
+        self.actor = create_user("actor", "+10000000001")
+        self.user = create_user("user", "+10000000002")
+        self.other = create_user("other", "+10000000003")
+        for receiver, actor, notification_type in [
+            (self.user, self.actor, NotificationType.FRIEND_REQUEST),
+            (self.user, self.actor, NotificationType.COMMENT),
+            (self.user, self.other, NotificationType.FRIEND_REQUEST),
+            (self.other, self.actor, NotificationType.FRIEND_REQUEST),
+        ]:
+            NotificationList.objects.create(
+                user=receiver,
+                notification=Notification.objects.create(
+                    actor=actor, notification_type=notification_type
+                ),
+            )
+        return super().setUp()
+
+    def test_update_is_scoped_to_user_actor_and_type(self):
+        self.assertEqual(
+            update_notification(
+                self.user.id, self.actor.id, "FRD_REQ", "FRD_ACPT", "friends!"
+            ),
+            1,
+        )
+        self.assertCountEqual(
+            Notification.objects.values_list("actor", "notification_type", "verbage"),
+            [
+                (self.actor.id, NotificationType.FRIEND_ACCEPTANCE, "friends!"),
+                (self.actor.id, NotificationType.COMMENT, ""),
+                (self.other.id, NotificationType.FRIEND_REQUEST, ""),
+                (self.actor.id, NotificationType.FRIEND_REQUEST, ""),
+            ],
+        )
+        self.assertEqual(
+            update_notification(
+                self.user.id, self.actor.id, "FRD_REQ", "FRD_ACPT", "friends!"
+            ),
+            0,
+        )
+
+    def test_delete_is_scoped_to_user_actor_and_types(self):
+        self.assertEqual(
+            delete_notification(self.user.id, self.actor.id, ["FRD_REQ"]), 1
+        )
+        self.assertCountEqual(
+            NotificationList.objects.filter(user=self.user).values_list(
+                "notification__actor", "notification__notification_type"
+            ),
+            [
+                (self.actor.id, NotificationType.COMMENT),
+                (self.other.id, NotificationType.FRIEND_REQUEST),
+            ],
+        )
+        self.assertEqual(NotificationList.objects.filter(user=self.other).count(), 1)
+
+        # every type by default
+        self.assertEqual(delete_notification(self.user.id, self.actor.id), 1)
+        self.assertEqual(delete_notification(self.user.id, self.actor.id), 0)
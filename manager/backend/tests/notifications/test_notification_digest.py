@@ -0,0 +1,142 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from ...common.notification_manager import (
+    clear_unread_counts,
+    get_unread_counts,
+    handle_notification,
+    handle_notification_with_images,
+)
+from ...moments.models import Moment
+from ...notifications.models import (
+    Notification,
+    NotificationDigest,
+    NotificationList,
+    NotificationType,
+)
+from ..utils import create_user
+
+
+@mock.patch("backend.common.notification_manager.notify_user_with_image")
+@mock.patch("backend.common.notification_manager.notify_user")
+class NotificationDigestTest(TestCase):
+    def setUp(self):
+        self.user = create_user("user", "+10000000001")
+        self.actor = create_user("actor", "+10000000002")
+        return super().setUp()
+
+    def profile_viewed(self):
+        self.assertTrue(
+            handle_notification(
+                NotificationType.PROFILE_VIEW, self.user, self.user, "Viewed!"
+            )
+        )
+
+    def test_notifications_are_folded_within_window(self, notify_user, notify_image):
+        for _ in range(3):
+            self.profile_viewed()
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.verbage, "Viewed! (x3)")
+        self.assertEqual(NotificationList.objects.count(), 1)
+        self.assertEqual(NotificationDigest.objects.get().count, 3)
+        notify_user.assert_called_once()
+        self.assertEqual(
+            get_unread_counts(self.user), {NotificationType.PROFILE_VIEW: 1}
+        )
+
+    def test_seen_digest_is_unread_again(self, notify_user, notify_image):
+        self.profile_viewed()
+        meta = self.user.taggusermeta
+        meta.last_seen_notifications = timezone.now()
+        meta.save()
+        clear_unread_counts(self.user)
+
+        self.profile_viewed()
+        self.assertEqual(
+            get_unread_counts(self.user), {NotificationType.PROFILE_VIEW: 1}
+        )
+        self.assertGreater(
+            Notification.objects.get().timestamp, meta.last_seen_notifications
+        )
+        notify_user.assert_called_once()
+
+    def test_new_digest_after_window(self, notify_user, notify_image):
+        self.profile_viewed()
+        NotificationDigest.objects.update(window_end=timezone.now() - timedelta(1))
+        self.profile_viewed()
+
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(notify_user.call_count, 2)
+
+    def test_expired_digests_are_pruned(self, notify_user, notify_image):
+        self.profile_viewed()
+        handle_notification(NotificationType.CLICK_TAG, self.user, self.user, "!")
+        NotificationDigest.objects.filter(
+            notification__notification_type=NotificationType.PROFILE_VIEW
+        ).update(window_end=timezone.now() - timedelta(1))
+
+        call_command("reconcile_unread_counts", stdout=StringIO())
+
+        self.assertEqual(
+            list(
+                NotificationDigest.objects.values_list(
+                    "notification__notification_type", flat=True
+                )
+            ),
+            [NotificationType.CLICK_TAG],
+        )
+        # the notifications themselves stay listed
+        self.assertEqual(NotificationList.objects.count(), 2)
+
+    def test_types_are_folded_separately(self, notify_user, notify_image):
+        self.profile_viewed()
+        for _ in range(2):
+            handle_notification(
+                NotificationType.CLICK_TAG, self.user, self.user, "Clicked!"
+            )
+            handle_notification(
+                NotificationType.COMMENT, self.actor, self.user, "Commented!"
+            )
+
+        self.assertCountEqual(
+            Notification.objects.values_list("notification_type", "verbage"),
+            [
+                (NotificationType.PROFILE_VIEW, "Viewed!"),
+                (NotificationType.CLICK_TAG, "Clicked! (x2)"),
+                (NotificationType.COMMENT, "Commented!"),
+                (NotificationType.COMMENT, "Commented!"),
+            ],
+        )
+
+    def test_digest_takes_latest_object(self, notify_user, notify_image):
+        moments = [
+            Moment.objects.create(
+                user_id=self.user,
+                caption="caption",
+                moment_url=f"https://tagg.id/moments/{i}.jpg",
+                thumbnail_url=f"https://tagg.id/thumbnails/{i}.jpg",
+                moment_category="Early Life",
+            )
+            for i in range(2)
+        ]
+        for i, moment in enumerate(moments):
+            handle_notification_with_images(
+                NotificationType.MOMENT_VIEW,
+                self.user,
+                self.user,
+                "Moment Views",
+                f"{(i + 1) * 50}+ views!",
+                "https://tagg.id/pic.jpg",
+                moment,
+            )
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.object, moments[1])
+        self.assertEqual(notification.verbage, "100+ views! (x2)")
+        notify_image.assert_called_once()
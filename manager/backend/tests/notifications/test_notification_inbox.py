@@ -0,0 +1,83 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from ...moments.comments.models import CommentThreads, MomentComments
+from ...moments.models import Moment
+from ...notifications.models import Notification, NotificationList, NotificationType
+from ...notifications.serializers import NotificationListSerializer
+from ..utils import create_user
+
+
+class NotificationInboxSerializerTest(TestCase):
+    def setUp(self):
+        self.user = create_user("user", "+10000000001")
+        self.actors = [create_user(f"actor_{i}", f"+1000000001{i}") for i in range(3)]
+        return super().setUp()
+
+    def add_notifications(self, count):
+        for i in range(count):
+            actor = self.actors[i % len(self.actors)]
+            moment = Moment.objects.create(
+                user_id=self.actors[(i + 1) % len(self.actors)],
+                caption="caption",
+                moment_url=f"https://tagg.id/moments/{i}.jpg",
+                thumbnail_url=f"https://tagg.id/thumbnails/{i}.jpg",
+                moment_category="Early Life",
+            )
+            comment = MomentComments.objects.create(
+                moment_id=moment, commenter=actor, comment="comment"
+            )
+            thread = CommentThreads.objects.create(
+                parent_comment=comment, commenter=actor, comment="reply"
+            )
+            for notification_type, target in [
+                (NotificationType.COMMENT, comment),
+                (NotificationType.COMMENT, thread),
+                (NotificationType.MOMENT_TAG, moment),
+                (NotificationType.DEFAULT, None),
+            ]:
+                NotificationList.objects.create(
+                    user=self.user,
+                    notification=Notification.objects.create(
+                        actor=actor,
+                        notification_type=notification_type,
+                        object=target,
+                    ),
+                )
+
+    def serialize_page(self):
+        page = list(
+            NotificationList.objects.filter(user=self.user).order_by(
+                "-notification__timestamp"
+            )
+        )
+        with CaptureQueriesContext(connection) as queries:
+            data = NotificationListSerializer(page, many=True).data
+        return data, len(queries)
+
+    def test_batched_page_matches_per_item_serialization(self):
+        self.add_notifications(2)
+        data, _ = self.serialize_page()
+
+        self.assertEqual(len(data), 8)
+        self.assertEqual(
+            data,
+            [
+                NotificationListSerializer(item).data
+                for item in NotificationList.objects.filter(user=self.user).order_by(
+                    "-notification__timestamp"
+                )
+            ],
+        )
+        self.assertIsNotNone(data[0]["notification"]["actor"]["thumbnail_url"])
+
+    def test_queries_do_not_grow_with_page_size(self):
+        self.add_notifications(2)
+        _, small_page_queries = self.serialize_page()
+        self.add_notifications(10)
+        _, large_page_queries = self.serialize_page()
+
+        self.assertEqual(small_page_queries, large_page_queries)
+        # notifications, actors, one query per object type and skins
+        self.assertLessEqual(large_page_queries, 6)
@@ -0,0 +1,272 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase
+from django.utils import timezone
+from fcm_django.models import FCMDevice
+from firebase_admin import exceptions, messaging
+
+from ...common.notification_manager import (
+    handle_bulk_notification,
+    handle_notification,
+)
+from ...common.push_manager import (
+    PUSH_LEASE_SECONDS,
+    PUSH_RETENTION_DAYS,
+    claim_pushes,
+    drain_push_outbox,
+    enqueue_push,
+    process_push,
+    prune_push_outbox,
+    push_metrics,
+    send_multicast,
+)
+from ...notifications.models import (
+    Notification,
+    NotificationType,
+    PushOutbox,
+    PushState,
+)
+from ..utils import create_user
+
+
+class FakeFCM:
+    """Answers multicasts like FCM, token prefixes pick the outcome:
+    dead- tokens are unregistered, flaky- tokens are unavailable once"""
+
+    def __init__(self):
+        self.requests = []
+        self.seen = set()
+        self.error = None
+
+    def send_each_for_multicast(self, message, app=None):
+        self.requests.append(message)
+        if self.error:
+            raise self.error
+
+        responses = []
+        for token in message.tokens:
+            if token.startswith("dead-"):
+                error = messaging.UnregisteredError("Requested entity was not found.")
+            elif token.startswith("flaky-") and token not in self.seen:
+                self.seen.add(token)
+                error = exceptions.UnavailableError("The service is unavailable.")
+            else:
+                error = None
+            responses.append(
+                messaging.SendResponse(
+                    None if error else {"name": f"projects/tagg/messages/{token}"},
+                    error,
+                )
+            )
+        return messaging.BatchResponse(responses)
+
+
+@mock.patch("backend.common.push_manager.firebase_app", mock.Mock())
+class SendMulticastTest(TestCase):
+    @mock.patch("backend.common.push_manager.messaging._get_messaging_service")
+    def test_multicast_is_sent_one_message_per_device(self, get_service):
+        service = get_service.return_value
+        service.send_each.return_value = messaging.BatchResponse(
+            [
+                messaging.SendResponse({"name": "projects/tagg/messages/1"}, None),
+                messaging.SendResponse(
+                    None, messaging.UnregisteredError("Requested entity was not found.")
+                ),
+            ]
+        )
+
+        errors = send_multicast(["token-1", "token-2"], "title", "body", badge=2)
+        # FCM's batch endpoint is gone, send_all and send_multicast post to it
+        service.send_all.assert_not_called()
+        (messages, dry_run), _ = service.send_each.call_args
+        self.assertEqual(
+            [message.token for message in messages], ["token-1", "token-2"]
+        )
+        self.assertEqual(messages[0].apns.payload.aps.badge, 2)
+        self.assertIsNone(errors[0])
+        self.assertIsInstance(errors[1], messaging.UnregisteredError)
+
+
+@mock.patch("backend.common.push_manager.firebase_app", mock.Mock())
+class PushOutboxTest(TestCase):
+    def setUp(self):
+        self.fcm = FakeFCM()
+        patcher = mock.patch(
+            "backend.common.push_manager.messaging.send_each_for_multicast",
+            self.fcm.send_each_for_multicast,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.actor = create_user("actor", "+10000000001")
+        self.receiver = create_user("receiver", "+10000000002")
+        self.add_device(self.actor, "actor-token")
+        self.add_device(self.receiver, "receiver-token")
+        return super().setUp()
+
+    def add_device(self, user, token):
+        return FCMDevice.objects.create(
+            user=user, registration_id=token, type="ios", active=True
+        )
+
+    def test_push_is_written_with_notification_and_sent_by_worker(self):
+        self.assertTrue(
+            handle_notification(
+                NotificationType.COMMENT, self.actor, self.receiver, "commented"
+            )
+        )
+        push = PushOutbox.objects.get()
+        self.assertEqual(push.user, self.receiver)
+        self.assertEqual(push.badge, 1)
+        self.assertEqual(self.fcm.requests, [])
+
+        self.assertEqual(drain_push_outbox(workers=1), {PushState.DELIVERED: 1})
+        self.assertEqual(len(self.fcm.requests), 1)
+        message = self.fcm.requests[0]
+        self.assertEqual(message.tokens, ["receiver-token"])
+        self.assertEqual(
+            (message.notification.title, message.notification.body),
+            ("actor tagg", "commented"),
+        )
+        self.assertEqual(message.apns.payload.aps.badge, 1)
+        push.refresh_from_db()
+        self.assertEqual(push.state, PushState.DELIVERED)
+        self.assertIsNotNone(push.delivered_on)
+
+    def test_push_is_rolled_back_with_notification(self):
+        with mock.patch(
+            "backend.common.notification_manager.NotificationList.save",
+            side_effect=Exception,
+        ):
+            self.assertFalse(
+                handle_notification(
+                    NotificationType.COMMENT, self.actor, self.receiver, "commented"
+                )
+            )
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(PushOutbox.objects.exists())
+
+    def test_broadcast_is_sent_in_multicast_batches(self):
+        FCMDevice.objects.bulk_create(
+            [
+                FCMDevice(registration_id=f"token-{i}", type="ios", active=True)
+                for i in range(1199)
+            ]
+        )
+        handle_bulk_notification(NotificationType.DEFAULT, self.actor, "new tagg")
+
+        self.assertEqual(drain_push_outbox(workers=1), {PushState.DELIVERED: 1})
+        self.assertEqual(
+            [len(message.tokens) for message in self.fcm.requests],
+            [500, 500, 200],
+        )
+        tokens = {token for message in self.fcm.requests for token in message.tokens}
+        self.assertNotIn("actor-token", tokens)
+        self.assertIn("receiver-token", tokens)
+        self.assertGreater(push_metrics.metrics()["latency_max_ms"], 0)
+
+    @mock.patch("backend.common.push_manager.PUSH_BATCH_SIZE", 1)
+    def test_lease_is_renewed_between_batches(self):
+        self.add_device(create_user("other", "+10000000003"), "other-token")
+        handle_bulk_notification(NotificationType.DEFAULT, self.actor, "new tagg")
+        (push,) = claim_pushes(1)
+        leases = [push.lease_until]
+
+        def send_each_for_multicast(message, app=None):
+            leases.append(PushOutbox.objects.get().next_attempt)
+            return self.fcm.send_each_for_multicast(message, app)
+
+        with mock.patch(
+            "backend.common.push_manager.messaging.send_each_for_multicast",
+            send_each_for_multicast,
+        ):
+            self.assertEqual(process_push(push), PushState.DELIVERED)
+        # one batch per device, each sent under a fresh lease
+        self.assertEqual(len(leases), 3)
+        self.assertEqual(leases, sorted(set(leases)))
+
+    @mock.patch("backend.common.push_manager.PUSH_BATCH_SIZE", 1)
+    def test_broken_off_broadcast_is_resumed_without_duplicates(self):
+        self.add_device(create_user("other", "+10000000003"), "other-token")
+        handle_bulk_notification(NotificationType.DEFAULT, self.actor, "new tagg")
+        (push,) = claim_pushes(1)
+
+        with mock.patch(
+            "backend.common.push_manager.renew_push_lease",
+            side_effect=[True, DatabaseError("connection lost")],
+        ):
+            self.assertEqual(process_push(push), PushState.PENDING)
+        (sent,) = self.fcm.requests[0].tokens
+        push.refresh_from_db()
+        self.assertEqual(
+            sorted(push.tokens + [sent]), ["other-token", "receiver-token"]
+        )
+
+        PushOutbox.objects.update(next_attempt=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(drain_push_outbox(workers=1), {PushState.DELIVERED: 1})
+        tokens = [token for message in self.fcm.requests for token in message.tokens]
+        self.assertEqual(sorted(tokens), ["other-token", "receiver-token"])
+
+    def test_expired_lease_is_not_delivered_twice(self):
+        handle_bulk_notification(NotificationType.DEFAULT, self.actor, "new tagg")
+        (push,) = claim_pushes(1)
+        # the lease ran out and another worker claimed the push
+        PushOutbox.objects.update(
+            next_attempt=timezone.now() - timedelta(seconds=PUSH_LEASE_SECONDS)
+        )
+        (other,) = claim_pushes(1)
+
+        self.assertEqual(process_push(push), PushState.PENDING)
+        self.assertEqual(self.fcm.requests, [])
+        self.assertEqual(process_push(other), PushState.DELIVERED)
+        self.assertEqual(len(self.fcm.requests), 1)
+        self.assertEqual(PushOutbox.objects.get().state, PushState.DELIVERED)
+
+    def test_dead_devices_are_pruned_and_unavailable_ones_retried(self):
+        dead = self.add_device(create_user("dead", "+10000000003"), "dead-token")
+        self.add_device(create_user("flaky", "+10000000004"), "flaky-token")
+        handle_bulk_notification(NotificationType.DEFAULT, self.actor, "new tagg")
+
+        self.assertEqual(drain_push_outbox(workers=1), {PushState.PENDING: 1})
+        dead.refresh_from_db()
+        self.assertFalse(dead.active)
+        push = PushOutbox.objects.get()
+        self.assertEqual(push.tokens, ["flaky-token"])
+        self.assertEqual(push.attempts, 1)
+        self.assertGreater(push.next_attempt, timezone.now())
+
+        # not due yet
+        self.assertEqual(drain_push_outbox(workers=1), {})
+        PushOutbox.objects.update(next_attempt=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(drain_push_outbox(workers=1), {PushState.DELIVERED: 1})
+        self.assertEqual(self.fcm.requests[-1].tokens, ["flaky-token"])
+
+    @mock.patch("backend.common.push_manager.PUSH_MAX_ATTEMPTS", 2)
+    def test_push_fails_after_max_attempts(self):
+        self.fcm.error = exceptions.UnavailableError("The service is unavailable.")
+        handle_notification(
+            NotificationType.COMMENT, self.actor, self.receiver, "commented"
+        )
+
+        self.assertEqual(drain_push_outbox(workers=1), {PushState.PENDING: 1})
+        PushOutbox.objects.update(next_attempt=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(drain_push_outbox(workers=1), {PushState.FAILED: 1})
+
+        push = PushOutbox.objects.get()
+        self.assertEqual(push.attempts, 2)
+        self.assertIn("unavailable", push.last_error)
+
+    def test_old_finished_pushes_are_pruned(self):
+        old = timezone.now() - timedelta(days=PUSH_RETENTION_DAYS, seconds=1)
+        for state in PushState.values:
+            push = enqueue_push("old", user=self.receiver)
+            PushOutbox.objects.filter(pk=push.pk).update(state=state, next_attempt=old)
+        recent = enqueue_push("recent", user=self.receiver)
+        PushOutbox.objects.filter(pk=recent.pk).update(state=PushState.DELIVERED)
+
+        self.assertEqual(prune_push_outbox(), 2)
+        self.assertEqual(
+            sorted(PushOutbox.objects.values_list("body", "state")),
+            [("old", PushState.PENDING), ("recent", PushState.DELIVERED)],
+        )
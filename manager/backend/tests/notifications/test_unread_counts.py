@@ -0,0 +1,95 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ...common.notification_manager import (
+    delete_notification,
+    get_unread_counts,
+    handle_notification,
+    reconcile_unread_counts,
+)
+from ...notifications.models import (
+    Notification,
+    NotificationList,
+    NotificationType,
+    UnreadNotificationCount,
+)
+from ..utils import create_user
+
+
+@mock.patch("backend.common.notification_manager.notify_user")
+class UnreadCountsTest(APITestCase):
+    def setUp(self):
+        self.actor = create_user("actor", "+10000000001")
+        self.user = create_user("user", "+10000000002")
+        self.client.force_authenticate(self.user)
+        return super().setUp()
+
+    def notify(self, notification_type, count=1):
+        for _ in range(count):
+            handle_notification(notification_type, self.actor, self.user, "hello")
+
+    def test_counters_are_incremented_on_fan_out(self, notify_user):
+        self.notify(NotificationType.COMMENT, 2)
+        self.notify(NotificationType.FRIEND_REQUEST)
+        self.notify(NotificationType.FRIEND_ACCEPTANCE)
+
+        self.assertEqual(
+            get_unread_counts(self.user),
+            {
+                NotificationType.COMMENT: 2,
+                NotificationType.FRIEND_REQUEST: 1,
+                NotificationType.FRIEND_ACCEPTANCE: 1,
+            },
+        )
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/notifications/unread_count/")
+        self.assertEqual(
+            response.data,
+            {
+                NotificationType.COMMENT: 2,
+                NotificationType.FRIEND_REQUEST: 2,
+                NotificationType.PROFILE_VIEW: 0,
+                NotificationType.MOMENT_TAG: 0,
+                NotificationType.CLICK_TAG: 0,
+                NotificationType.MOMENT_VIEW: 0,
+            },
+        )
+
+    def test_seen_clears_counters(self, notify_user):
+        self.notify(NotificationType.COMMENT)
+
+        response = self.client.post("/api/notifications/seen/")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(get_unread_counts(self.user), {})
+
+        self.notify(NotificationType.MOMENT_TAG)
+        self.assertEqual(get_unread_counts(self.user), {NotificationType.MOMENT_TAG: 1})
+
+    def test_reconcile_fixes_drifted_counters(self, notify_user):
+        self.notify(NotificationType.COMMENT, 3)
+        self.notify(NotificationType.PROFILE_VIEW)
+        NotificationList.objects.filter(
+            notification__notification_type=NotificationType.COMMENT
+        ).first().delete()
+        Notification.objects.filter(
+            notification_type=NotificationType.PROFILE_VIEW
+        ).update(timestamp=timezone.now() - timedelta(days=8))
+        UnreadNotificationCount.objects.filter(
+            notification_type=NotificationType.COMMENT
+        ).delete()
+
+        self.assertEqual(reconcile_unread_counts(), 2)
+        self.assertEqual(get_unread_counts(self.user), {NotificationType.COMMENT: 2})
+        self.assertEqual(reconcile_unread_counts([self.user.id]), 0)
+
+    def test_deleted_notifications_are_uncounted(self, notify_user):
+        self.notify(NotificationType.FRIEND_REQUEST)
+        self.notify(NotificationType.COMMENT)
+
+        delete_notification(
+            self.user.id, self.actor.id, [NotificationType.FRIEND_REQUEST]
+        )
+        self.assertEqual(get_unread_counts(self.user), {NotificationType.COMMENT: 1})
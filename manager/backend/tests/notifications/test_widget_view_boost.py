@@ -0,0 +1,73 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ...analytics.widgets.models import WidgetViews
+from ...common.counter_manager import flush_all_counters
+from ...models import TaggUser
+from ...moments.models import Moment
+from ...moments.views.models import MomentViews
+from ...moments.views.utils import moment_view_counter
+from ...notifications.utils import widget_view_boost
+from ...widget.models import RewardCalculation, Widget, WidgetType
+from ..utils import create_user
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+@mock.patch("backend.analytics.widgets.utils.reward_widget_click_count")
+@mock.patch("random.randint", return_value=4)
+class WidgetViewBoostTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = create_user("tagg", "+10000000001")
+        self.owner = create_user("owner", "+10000000002")
+        self.new_owner = create_user("new_owner", "+10000000003")
+        self.widgets = [
+            Widget.objects.create(owner=owner, order=i, type=WidgetType.choices[0][0])
+            for i, owner in enumerate([self.owner] * 3 + [self.new_owner])
+        ]
+        Widget.objects.create(
+            owner=self.owner, order=9, active=False, type=WidgetType.choices[0][0]
+        )
+        self.reward = RewardCalculation.objects.create(
+            taggId=self.widgets[0], userId=self.owner, count=25
+        )
+        self.moments = [
+            Moment.objects.create(
+                user_id=user,
+                caption="caption",
+                moment_url=f"https://tagg.id/moments/{i}.jpg",
+                thumbnail_url=f"https://tagg.id/thumbnails/{i}.jpg",
+                moment_category="Early Life",
+            )
+            for i, user in enumerate([self.user, self.owner, self.new_owner])
+        ]
+        return super().setUp()
+
+    def test_boost(self, randint, reward):
+        # the cron boosts as the first user
+        booster = TaggUser.objects.all().first()
+        # one counter is cached and incremented, the others are updated in place
+        boosted = [moment for moment in self.moments if moment.user_id != booster]
+        moment_view_counter.get(boosted[0].moment_id)
+
+        widget_view_boost()
+
+        self.assertEqual(WidgetViews.objects.count(), 16)
+        # 25 + 4 + 4 crosses 30 once, then 4 more
+        self.reward.refresh_from_db()
+        self.assertEqual(self.reward.count, 4)
+        reward.assert_called_once_with(self.owner)
+        self.assertEqual(RewardCalculation.objects.get(userId=self.new_owner).count, 4)
+
+        self.assertEqual(MomentViews.objects.count(), 8)
+        self.assertFalse(
+            MomentViews.objects.filter(moment_viewed__user_id=booster).exists()
+        )
+        flush_all_counters()
+        for moment in self.moments:
+            moment.refresh_from_db()
+            self.assertEqual(moment.view_count, 0 if moment.user_id == booster else 4)
@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from rest_framework.test import APITestCase
+
+from ...common.friend_graph_manager import invalidate_friend_graph
+from ...friends.models import Friends, FriendshipStatusType
+from ...models import BlockedUser, TaggUserMeta
+from ...search.utils import InvalidCursor, search_users
+from ..utils import create_user
+
+
+class UserSearchTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_friend_graph()
+        self.viewer = create_user("viewer", "+10000000000")
+        self.substring = create_user("the_sam", "+10000000001")
+        self.prefix_name = create_user("zed", "+10000000002", first_name="Samantha")
+        self.prefix = create_user("samuel", "+10000000003")
+        self.exact = create_user("sam", "+10000000004")
+        self.blocked = create_user("sammy", "+10000000005")
+        self.blocker = create_user("samson", "+10000000006")
+        create_user("unrelated", "+10000000007")
+        BlockedUser.objects.create(blocker=self.viewer, blocked=self.blocked)
+        BlockedUser.objects.create(blocker=self.blocker, blocked=self.viewer)
+        TaggUserMeta.objects.update(is_onboarded=True)
+        return super().setUp()
+
+    def test_matches_are_ranked(self):
+        users, next_cursor = search_users(self.viewer, "SAM")
+        self.assertEqual(
+            [user.username for user in users], ["sam", "samuel", "zed", "the_sam"]
+        )
+        self.assertIsNone(next_cursor)
+
+    def test_pages_follow_the_cursor(self):
+        usernames = []
+        cursor = None
+        for _ in range(4):
+            users, cursor = search_users(self.viewer, "sam", cursor=cursor, limit=1)
+            usernames += [user.username for user in users]
+        self.assertEqual(usernames, ["sam", "samuel", "zed", "the_sam"])
+        self.assertIsNone(cursor)
+
+        with self.assertRaises(InvalidCursor):
+            search_users(self.viewer, "sam", cursor="not a cursor")
+
+    def test_search_endpoint(self):
+        self.client.force_authenticate(self.viewer)
+        response = self.client.get("/api/search/", {"query": "sam", "limit": 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [user["username"] for user in response.data["users"]],
+            ["sam", "samuel", "zed"],
+        )
+
+        response = self.client.get(
+            "/api/search/", {"query": "sam", "cursor": response.data["next"]}
+        )
+        self.assertEqual(
+            [user["username"] for user in response.data["users"]], ["the_sam"]
+        )
+        self.assertIsNone(response.data["next"])
+
+        response = self.client.get("/api/search/", {"query": "sam", "cursor": "x"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get("/api/search/", {"query": "sam", "limit": 0})
+        self.assertEqual(response.status_code, 400)
+
+    def test_messages_searches_friends_only(self):
+        for user, status in [
+            (self.prefix, FriendshipStatusType.FRIENDS),
+            (self.substring, FriendshipStatusType.FRIENDS),
+            (self.exact, FriendshipStatusType.REQUESTED),
+        ]:
+            with self.captureOnCommitCallbacks(execute=True):
+                Friends.objects.create(
+                    requester=self.viewer, requested=user, status=status
+                )
+
+        self.client.force_authenticate(self.viewer)
+        response = self.client.get("/api/search/messages/", {"query": "sam"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [user["username"] for user in response.data["users"]],
+            ["samuel", "the_sam"],
+        )
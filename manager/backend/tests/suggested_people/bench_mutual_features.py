@@ -0,0 +1,105 @@
+"""
+Benchmark of the mutual friend and badge features of PeopleRecommender pairs
+on synthetic graphs of 10k, 50k and 100k users. Not collected by the default
+test pattern, run it explicitly:
+
+    python manage.py test backend.tests.suggested_people.bench_mutual_features
+"""
+import random
+import time
+import uuid
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+
+from ...common.friend_graph_manager import FriendGraph
+from ...suggested_people.features import compute_mutual_features
+
+USER_COUNTS = [10000, 50000, 100000]
+AVERAGE_FRIENDS = 20
+BADGE_COUNT = 20
+RECIPIENTS = 50
+RECOMMENDATIONS_PER_RECIPIENT = 500
+
+
+def legacy_mutual_counts(friends, badges, pairs):
+    """The per-pair implementation this benchmark compares against: a nested
+    scan of both friend lists and an intersection of both badge sets"""
+    counts = []
+    for recipient, recommendation in pairs:
+        friends1 = friends.get(recipient, [])
+        friends2 = friends.get(recommendation, [])
+        mutual_friends = [
+            friend
+            for friend in friends1
+            if any(other == friend for other in friends2)
+        ]
+        mutual_badges = set(badges.get(recipient, [])).intersection(
+            set(badges.get(recommendation, []))
+        )
+        counts.append((len(mutual_friends), len(mutual_badges)))
+    return counts
+
+
+class MutualFeaturesBenchmark(SimpleTestCase):
+    def build(self, user_count):
+        rng = random.Random(user_count)
+        users = [uuid.UUID(int=rng.getrandbits(128)) for _ in range(user_count)]
+        edges = {
+            frozenset(rng.sample(users, 2))
+            for _ in range(user_count * AVERAGE_FRIENDS // 2)
+        }
+        friends = {}
+        for a, b in edges:
+            friends.setdefault(a, []).append(b)
+            friends.setdefault(b, []).append(a)
+        badges = {
+            user: rng.sample(range(BADGE_COUNT), rng.randint(0, 3)) for user in users
+        }
+        pairs = [
+            (recipient, recommendation)
+            for recipient in rng.sample(users, RECIPIENTS)
+            for recommendation in rng.sample(users, RECOMMENDATIONS_PER_RECIPIENT)
+            if recommendation != recipient
+        ]
+        return edges, friends, badges, pairs
+
+    def test_benchmark(self):
+        print()
+        for user_count in USER_COUNTS:
+            edges, friends, badges, pairs = self.build(user_count)
+
+            start = time.perf_counter()
+            graph = FriendGraph.from_edges(edges)
+            badge_bits = {
+                user: sum(1 << badge for badge in owned)
+                for user, owned in badges.items()
+            }
+            build = time.perf_counter() - start
+
+            start = time.perf_counter()
+            expected = legacy_mutual_counts(friends, badges, pairs)
+            legacy = time.perf_counter() - start
+
+            prs = [
+                SimpleNamespace(recipient_id=recipient, recommendation_id=recommendation)
+                for recipient, recommendation in pairs
+            ]
+            start = time.perf_counter()
+            computed = list(compute_mutual_features(prs, graph, badge_bits))
+            batched = time.perf_counter() - start
+
+            self.assertEqual(
+                [
+                    (round(pr.friend_feature * 50), round(pr.badge_feature * 5))
+                    for pr in computed
+                ],
+                [(min(f, 50), min(b, 5)) for f, b in expected],
+            )
+            print(
+                f"{user_count} users, {len(edges)} friendships, {len(pairs)} pairs: "
+                f"index build {build:.2f}s, "
+                f"per-pair {legacy * 1e6 / len(pairs):.1f}us/pair, "
+                f"batched {batched * 1e6 / len(pairs):.1f}us/pair "
+                f"({legacy / batched:.1f}x)"
+            )
@@ -0,0 +1,103 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from ...common.friend_graph_manager import FriendGraph, invalidate_friend_graph
+from ...friends.models import Friends, FriendshipStatusType
+from ...suggested_people.features import (
+    badge_matrix,
+    compute_mutual_features,
+    update_mutual_features,
+)
+from ...suggested_people.models import Badge, PeopleRecommender, UserBadge
+from ...suggested_people.utils import compute_recommender_feature_values
+from ..utils import create_user
+
+
+class MutualFeaturesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_friend_graph()
+        self.users = [
+            create_user(
+                f"user{i}",
+                f"+1000000000{i}",
+                university="Brown University",
+                university_class=2023,
+            )
+            for i in range(6)
+        ]
+        a, b, c, d, e, f = self.users
+        # a and b share c, d and e as friends
+        for mutual in [c, d, e]:
+            self.befriend(a, mutual)
+            self.befriend(mutual, b)
+        self.befriend(a, f)
+
+        badges = [Badge.objects.create(name=f"badge{i}") for i in range(3)]
+        for user, owned in [(a, badges), (b, badges[1:]), (f, badges[:1])]:
+            for badge in owned:
+                UserBadge.objects.create(user=user, badge=badge)
+
+        self.prs = [
+            PeopleRecommender.objects.create(
+                recipient=recipient,
+                recommendation=recommendation,
+                friend_feature=0,
+                university_feature=0,
+                badge_feature=0,
+                class_year_feature=0,
+                interested_feature=0,
+                dirty=True,
+            )
+            for recipient, recommendation in [(a, b), (a, c), (b, f), (e, d)]
+        ]
+        return super().setUp()
+
+    def befriend(self, requester, requested):
+        with self.captureOnCommitCallbacks(execute=True):
+            Friends.objects.create(
+                requester=requester,
+                requested=requested,
+                status=FriendshipStatusType.FRIENDS,
+            )
+
+    def features(self):
+        return [
+            (pr.friend_feature, pr.badge_feature)
+            for pr in PeopleRecommender.objects.filter(
+                id__in=[pr.id for pr in self.prs]
+            ).order_by("id")
+        ]
+
+    def test_mutual_counts_are_rows_of_the_squared_adjacency(self):
+        a, b, c, d, e, f = self.users
+        graph = FriendGraph.from_database()
+        self.assertEqual(graph.mutual_friend_counts(a), {b.id: 3})
+        self.assertEqual(graph.mutual_friend_counts(c), {d.id: 2, e.id: 2, f.id: 1})
+
+        badges = badge_matrix()
+        self.assertEqual(bin(badges[a.id] & badges[b.id]).count("1"), 2)
+        self.assertNotIn(c.id, badges)
+
+        pr = next(compute_mutual_features([self.prs[0]], graph, badges))
+        self.assertEqual((pr.friend_feature, pr.badge_feature), (3 / 50, 2 / 5))
+
+    def test_dirty_rows_are_written_in_bulk(self):
+        with self.assertNumQueries(5):
+            # friend graph, badges, dirty rows, their users and one bulk update
+            compute_recommender_feature_values()
+
+        self.assertEqual(
+            self.features(), [(3 / 50, 2 / 5), (0, 0), (0, 0), (2 / 50, 0)]
+        )
+        pr = PeopleRecommender.objects.get(id=self.prs[0].id)
+        self.assertFalse(pr.dirty)
+        self.assertEqual(pr.interested_feature, 1)
+        self.assertEqual(pr.university_feature, 1)
+
+    def test_update_mutual_features_of_every_row(self):
+        PeopleRecommender.objects.update(dirty=False)
+        self.assertEqual(update_mutual_features(), 4)
+        self.assertEqual(
+            self.features(), [(3 / 50, 2 / 5), (0, 0), (0, 0), (2 / 50, 0)]
+        )
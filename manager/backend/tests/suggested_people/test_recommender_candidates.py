@@ -0,0 +1,150 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from ...common.friend_graph_manager import invalidate_friend_graph
+from ...friends.models import Friends, FriendshipStatusType
+from ...models import SuggestedPeopleLinked, TaggUserMeta
+from ...suggested_people.candidates import refresh_recommender_candidates
+from ...suggested_people.models import Badge, PeopleRecommender, UserBadge
+from ...suggested_people.utils import (
+    compute_recommender_feature_values,
+    get_suggested_people,
+)
+from ..utils import create_user
+
+
+class RecommenderCandidatesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_friend_graph()
+        self.user = create_user(
+            "user", "+10000000000", university="Brown", university_class=2023
+        )
+        self.friend = create_user(
+            "friend", "+10000000001", university="Brown", university_class=2024
+        )
+        self.friend_of_friend = create_user(
+            "fof", "+10000000002", university="Brown", university_class=2024
+        )
+        self.classmate = create_user(
+            "classmate", "+10000000003", university="Brown", university_class=2023
+        )
+        self.badge_mate = create_user(
+            "badgemate", "+10000000004", university="Brown", university_class=2024
+        )
+        self.stranger = create_user(
+            "stranger", "+10000000005", university="Brown", university_class=2024
+        )
+        self.elsewhere = create_user(
+            "elsewhere", "+10000000006", university="Harvard", university_class=2023
+        )
+        TaggUserMeta.objects.update(
+            is_onboarded=True,
+            suggested_people_linked=SuggestedPeopleLinked.FINAL_TUTORIAL,
+        )
+
+        for requester, requested in [
+            (self.user, self.friend),
+            (self.friend, self.friend_of_friend),
+            (self.friend, self.elsewhere),
+        ]:
+            with self.captureOnCommitCallbacks(execute=True):
+                Friends.objects.create(
+                    requester=requester,
+                    requested=requested,
+                    status=FriendshipStatusType.FRIENDS,
+                )
+        badge = Badge.objects.create(name="badge")
+        for user in [self.user, self.badge_mate]:
+            UserBadge.objects.create(user=user, badge=badge)
+        return super().setUp()
+
+    def recommendations(self, user):
+        return set(
+            PeopleRecommender.objects.filter(recipient=user).values_list(
+                "recommendation", flat=True
+            )
+        )
+
+    def create_row(self, recommendation, interested_feature):
+        return PeopleRecommender.objects.create(
+            recipient=self.user,
+            recommendation=recommendation,
+            friend_feature=0,
+            university_feature=0,
+            badge_feature=0,
+            class_year_feature=0,
+            interested_feature=interested_feature,
+        )
+
+    def test_only_plausible_pairs_are_materialized(self):
+        refresh_recommender_candidates()
+
+        self.assertEqual(
+            self.recommendations(self.user),
+            {self.friend_of_friend.id, self.classmate.id, self.badge_mate.id},
+        )
+        self.assertEqual(self.recommendations(self.elsewhere), set())
+        self.assertTrue(all(PeopleRecommender.objects.values_list("dirty", flat=True)))
+        # far below the n * (n - 1) rows of the dense table
+        self.assertLess(PeopleRecommender.objects.count(), 7 * 6 / 2)
+
+    def test_top_k_cap_and_pruning(self):
+        stale = self.create_row(self.stranger, 1)
+        kept = self.create_row(self.classmate, 0.5)
+
+        total, pruned = refresh_recommender_candidates(top_k=2)
+
+        self.assertEqual(
+            self.recommendations(self.user), {self.classmate.id, self.badge_mate.id}
+        )
+        self.assertFalse(PeopleRecommender.objects.filter(id=stale.id).exists())
+        self.assertEqual(pruned, 1)
+        kept.refresh_from_db()
+        self.assertEqual(kept.interested_feature, 0.5)
+
+        # running it again changes nothing
+        self.assertEqual(refresh_recommender_candidates(top_k=2), (total, 0))
+
+    def test_ties_are_broken_by_id(self):
+        classmates = [self.classmate] + [
+            create_user(
+                f"classmate{i}",
+                f"+1000000001{i}",
+                university="Brown",
+                university_class=2023,
+            )
+            for i in range(3)
+        ]
+        TaggUserMeta.objects.update(
+            is_onboarded=True,
+            suggested_people_linked=SuggestedPeopleLinked.FINAL_TUTORIAL,
+        )
+
+        total, _ = refresh_recommender_candidates(top_k=2)
+
+        # the classmates tie, the same ones make the cut on every run
+        self.assertEqual(
+            self.recommendations(self.user),
+            set(sorted(classmate.id for classmate in classmates)[-2:]),
+        )
+        self.assertEqual(refresh_recommender_candidates(top_k=2), (total, 0))
+
+    def test_skipped_users_are_not_pruned(self):
+        skipped = self.create_row(self.stranger, 0.9)
+
+        refresh_recommender_candidates(top_k=2)
+
+        # the decay of a skipped user outlives its candidacy
+        skipped.refresh_from_db()
+        self.assertEqual(skipped.interested_feature, 0.9)
+
+    def test_suggested_people_reads_the_sparse_table(self):
+        refresh_recommender_candidates()
+        compute_recommender_feature_values()
+
+        suggested = get_suggested_people(self.user, seed=0)
+        self.assertEqual(
+            set(suggested),
+            {self.friend_of_friend.id, self.classmate.id, self.badge_mate.id},
+        )
@@ -0,0 +1,100 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from ...common.friend_graph_manager import invalidate_friend_graph
+from ...suggested_people.models import PeopleRecommender
+from ...suggested_people.utils import (
+    compute_recommender_feature_values,
+    mark_user_dirty,
+    mark_users_uninterested_1_count,
+)
+from ..utils import create_user
+
+
+class RecommenderRefreshTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_friend_graph()
+        self.users = [
+            create_user(
+                f"user{i}",
+                f"+100000000{i:02}",
+                university="Brown",
+                university_class=2023 + i % 2,
+            )
+            for i in range(12)
+        ]
+        PeopleRecommender.objects.bulk_create(
+            [
+                PeopleRecommender(
+                    recipient=recipient,
+                    recommendation=recommendation,
+                    friend_feature=0,
+                    university_feature=0,
+                    badge_feature=0,
+                    class_year_feature=0,
+                    interested_feature=1,
+                )
+                for recipient in self.users
+                for recommendation in self.users
+                if recipient != recommendation
+            ]
+        )
+        return super().setUp()
+
+    def test_mark_user_dirty_is_one_update(self):
+        user = self.users[0]
+        with self.assertNumQueries(1):
+            mark_user_dirty.now(str(user.id))
+
+        dirty = PeopleRecommender.objects.filter(dirty=True)
+        self.assertEqual(dirty.count(), 2 * 11)
+        self.assertFalse(
+            dirty.exclude(recipient=user).exclude(recommendation=user).exists()
+        )
+
+    def test_mark_users_uninterested_is_one_update(self):
+        user, *seen = self.users[:4]
+        with self.assertNumQueries(1):
+            mark_users_uninterested_1_count.now(str(user.id), [str(u.id) for u in seen])
+
+        self.assertEqual(
+            sorted(
+                PeopleRecommender.objects.filter(recipient=user).values_list(
+                    "interested_feature", flat=True
+                )
+            ),
+            [0.9] * 3 + [1] * 8,
+        )
+
+    def test_refresh_only_reads_dirty_rows_in_constant_queries(self):
+        PeopleRecommender.objects.filter(recipient__in=self.users[:3]).update(
+            dirty=True
+        )
+        with self.assertNumQueries(5):
+            self.assertEqual(compute_recommender_feature_values(), 33)
+
+        self.assertFalse(PeopleRecommender.objects.filter(dirty=True).exists())
+        pr = PeopleRecommender.objects.get(
+            recipient=self.users[0], recommendation=self.users[2]
+        )
+        self.assertEqual((pr.university_feature, pr.class_year_feature), (1, 1))
+        pr = PeopleRecommender.objects.get(
+            recipient=self.users[0], recommendation=self.users[1]
+        )
+        self.assertEqual(pr.class_year_feature, 0)
+        # clean rows are left alone
+        pr = PeopleRecommender.objects.get(
+            recipient=self.users[3], recommendation=self.users[5]
+        )
+        self.assertEqual(pr.university_feature, 0)
+
+    def test_command_reports_throughput(self):
+        PeopleRecommender.objects.update(dirty=True)
+        out = StringIO()
+        call_command("update_recommender", stdout=out)
+        self.assertIn("Dirty features: ", out.getvalue())
+        self.assertIn(" rows/s)", out.getvalue())
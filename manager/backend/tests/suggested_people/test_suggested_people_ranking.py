@@ -0,0 +1,85 @@
+from django.core.cache import cache
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
+
+from ...common.friend_graph_manager import invalidate_friend_graph
+from ...common.utils import light_shuffle, light_shuffle_page
+from ...suggested_people.api import SuggestedPeopleViewSet
+from ...suggested_people.models import PeopleRecommender
+from ...suggested_people.utils import (
+    get_suggested_people_ranking,
+    mark_users_uninterested_1_count,
+)
+from ..utils import create_user
+
+
+class SuggestedPeopleRankingTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_friend_graph()
+        self.user = create_user("user", "+10000000000", university="Brown")
+        self.others = [
+            create_user(f"other{i}", f"+100000001{i:02}", university="Brown")
+            for i in range(12)
+        ]
+        # others[i] has score i, the last one ranks first
+        PeopleRecommender.objects.bulk_create(
+            [
+                PeopleRecommender(
+                    recipient=self.user,
+                    recommendation=other,
+                    friend_feature=0,
+                    university_feature=0,
+                    badge_feature=0,
+                    class_year_feature=0,
+                    interested_feature=1,
+                    score=i,
+                )
+                for i, other in enumerate(self.others)
+            ]
+        )
+        return super().setUp()
+
+    def test_light_shuffle_page_matches_full_shuffle(self):
+        items = list(range(23))
+        for offset, limit in [(0, 5), (3, 4), (7, 9), (20, 10)]:
+            self.assertEqual(
+                light_shuffle_page(items, offset, limit, seed="seed"),
+                light_shuffle(items, seed="seed")[offset : offset + limit],
+            )
+
+    def test_ranking_comes_from_the_score(self):
+        ids, ranked = get_suggested_people_ranking(self.user)
+        self.assertTrue(ranked)
+        self.assertEqual(ids, [other.id for other in reversed(self.others)])
+
+    def test_pages_are_served_from_cached_ids(self):
+        # the endpoint isn't routed, call the view directly
+        view = SuggestedPeopleViewSet.as_view({"get": "list"})
+        pages = []
+        for offset in [0, 4, 8]:
+            request = APIRequestFactory().get(
+                "/api/suggested_people/",
+                {"seed": "42", "offset": offset, "limit": 4},
+            )
+            force_authenticate(request, self.user)
+            response = view(request)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["count"], 12)
+            pages += [result["user"]["id"] for result in response.data["results"]]
+
+        expected = light_shuffle(
+            [str(other.id) for other in reversed(self.others)], seed="42"
+        )
+        self.assertEqual(pages, expected)
+
+        # the cache holds the ranked IDs, not users
+        ids, ranked = cache.get(f"sp_{self.user.id}")
+        self.assertEqual(ids, [other.id for other in reversed(self.others)])
+
+    def test_uninterested_keeps_score_in_step(self):
+        mark_users_uninterested_1_count.now(
+            str(self.user.id), [str(self.others[11].id)]
+        )
+        pr = PeopleRecommender.objects.get(recommendation=self.others[11])
+        self.assertAlmostEqual(pr.interested_feature, 0.9)
+        self.assertAlmostEqual(pr.score, 0.9 * 0.2)
@@ -0,0 +1,98 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from ...common.friend_graph_manager import invalidate_friend_graph
+from ...friends.models import Friends, FriendshipStatusType
+from ...skins.models import Skin, TemplateType
+from ...social_linking.models import SocialLink
+from ...suggested_people.models import Badge, UserBadge
+from ...suggested_people.serializers import SuggestedPeopleSerializer
+from ..utils import create_user
+
+
+class SuggestedPeopleSerializerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        invalidate_friend_graph()
+        self.viewer = create_user("viewer", "+10000000000", university="Brown")
+        self.mutual = create_user("mutual", "+10000000001", university="Brown")
+        self.befriend(self.viewer, self.mutual)
+        self.badge = Badge.objects.create(name="badge")
+        Skin.objects.create(
+            owner=self.mutual,
+            template_type=TemplateType.THREE,
+            primary_color="#FFFFFF",
+            secondary_color="#698DD3",
+            active=True,
+        )
+        return super().setUp()
+
+    def befriend(self, requester, requested, status=FriendshipStatusType.FRIENDS):
+        with self.captureOnCommitCallbacks(execute=True):
+            Friends.objects.create(
+                requester=requester, requested=requested, status=status
+            )
+
+    def create_suggestions(self, count, offset=0):
+        users = []
+        for i in range(offset, offset + count):
+            user = create_user(
+                f"suggested_{i}", f"+1000000100{i:02}", university="Brown"
+            )
+            self.befriend(user, self.mutual)
+            UserBadge.objects.create(user=user, badge=self.badge)
+            users.append(user)
+        return users
+
+    def serialize(self, users):
+        return SuggestedPeopleSerializer(
+            users, many=True, context={"user": self.viewer}
+        ).data
+
+    def test_page_is_serialized_in_constant_queries(self):
+        users = self.create_suggestions(2)
+        # warm the friend graph, it is built once per change, not per page
+        self.serialize(users)
+        with self.assertNumQueries(5):
+            self.serialize(users)
+
+        users += self.create_suggestions(8, offset=2)
+        self.serialize(users)
+        with self.assertNumQueries(5):
+            data = self.serialize(users)
+        self.assertEqual(len(data), 10)
+
+    def test_representation(self):
+        user, stranger = self.create_suggestions(2)
+        SocialLink.objects.create(user_id=user, snapchat_username="snap")
+        with self.captureOnCommitCallbacks(execute=True):
+            Friends.objects.filter(requester=stranger).delete()
+        self.befriend(stranger, self.viewer, FriendshipStatusType.REQUESTED)
+
+        data = self.serialize([user, stranger])
+
+        self.assertEqual(data[0]["user"]["username"], user.username)
+        self.assertEqual(
+            [friend["username"] for friend in data[0]["mutual_friends"]], ["mutual"]
+        )
+        # the mutual friend's active skin picks the large profile picture
+        self.assertIn(
+            f"/lpp-{self.mutual.id}-", data[0]["mutual_friends"][0]["thumbnail_url"]
+        )
+        self.assertEqual(data[0]["badges"], [{"id": self.badge.id, "name": "badge"}])
+        self.assertEqual(data[0]["social_links"], ["Snapchat"])
+        self.assertEqual(
+            data[0]["friendship"], {"status": "no_record", "requester_id": ""}
+        )
+
+        self.assertEqual(data[1]["mutual_friends"], [])
+        self.assertEqual(data[1]["social_links"], [])
+        self.assertEqual(
+            data[1]["friendship"], {"status": "requested", "requester_id": stranger.id}
+        )
+
+    def test_reading_does_not_create_social_links(self):
+        users = self.create_suggestions(3)
+        self.serialize(users)
+        SuggestedPeopleSerializer(users[0], context={"user": self.viewer}).data
+        self.assertFalse(SocialLink.objects.exists())
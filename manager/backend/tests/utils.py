@@ -0,0 +1,24 @@
+from ..models import TaggUser, TaggUserMeta
+
+
+def create_user(username, phone_number, is_onboarded=None, **fields):
+    """
+    Creates a user named after `username`, `fields` override the default
+    TaggUser fields. Sets the user's onboarding status when is_onboarded is
+    given.
+    """
+    user = TaggUser.objects.create(
+        **{
+            "username": username,
+            "first_name": username,
+            "last_name": "tagg",
+            "email": f"{username}@tagg.id",
+            "phone_number": phone_number,
+            **fields,
+        }
+    )
+    if is_onboarded is not None:
+        TaggUserMeta.objects.update_or_create(
+            user=user, defaults={"is_onboarded": is_onboarded}
+        )
+    return user
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 """
 
 import os
+import tempfile
 
 import environ
 
@@ -316,6 +317,20 @@ S3_SUGGESTED_PEOPLE_FOLDER = env("S3_SUGGESTED_PEOPLE_FOLDER")
 S3_VIDEO_BUCKET = env("S3_VIDEO_BUCKET")
 S3_VIDEO_QUEUE_BUCKET = env("S3_VIDEO_QUEUE_BUCKET")
 
+# Shared secret the video transcoder sends when reporting processing status
+VIDEO_PROCESSING_CALLBACK_SECRET = env("VIDEO_PROCESSING_CALLBACK_SECRET", default="")
+
+# Moment thumbnail proxy cache
+THUMBNAIL_CACHE_DIR = env(
+    "THUMBNAIL_CACHE_DIR", default=os.path.join(tempfile.gettempdir(), "tagg-thumbnails")
+)
+THUMBNAIL_CACHE_MEMORY_BYTES = env.int(
+    "THUMBNAIL_CACHE_MEMORY_BYTES", default=32 * 1024 * 1024
+)
+THUMBNAIL_CACHE_DISK_BYTES = env.int(
+    "THUMBNAIL_CACHE_DISK_BYTES", default=512 * 1024 * 1024
+)
+
 # User agents
 USER_AGENTS = [
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/51.0.2704.103 Safari/537.36",
@@ -457,6 +472,10 @@ FCM_DJANGO_SETTINGS = {
     "DELETE_INACTIVE_DEVICES": False,
 }
 
+# Seconds during which profile view, tagg click and moment view notifications
+# to a user are folded into a single digest
+NOTIFICATION_DIGEST_WINDOW = env.int("NOTIFICATION_DIGEST_WINDOW", default=60 * 60)
+
 # Stream API: Chat
 STREAM_API_KEY = env("STREAM_API_KEY")
 STREAM_API_SECRET = env("STREAM_API_SECRET")
@@ -473,7 +492,6 @@ CRONJOBS = [
     ("0 9 * * *", "django.core.management.call_command", ["regenerate_ig_token"]),
     # every day at 9 AM (server needs to be running for this to run successfully)
     ("0 9 * * *", "django.core.management.call_command", ["link_taggs_reminder"]),
-    ("0 * * * *", "django.core.management.call_command", ["moments_posted_reminder"]),
     ("0 * * * *", "django.core.management.call_command", ["moment_posted_friend"]),
     ("0 5 * * *", "django.core.management.call_command", ["dailyMoments"]),
     (
@@ -485,6 +503,14 @@ CRONJOBS = [
     ("0 */6 * * *", "django.core.management.call_command", ["update_recommender"]),
     ("0 */3 * * *", "django.core.management.call_command", ["profile_viewed"]),
     ("0 4,8,12,16,20 * * *", "django.core.management.call_command", ["widget_view_boost"]),
+    # ages notifications past the 7 day window out of the unread counters and
+    # prunes the expired notification digests
+    ("30 * * * *", "django.core.management.call_command", ["reconcile_unread_counts"]),
+    # drains the push outbox and prunes the old finished pushes, a long running
+    # `manage.py push_worker` can be deployed instead for lower latency
+    ("* * * * *", "django.core.management.call_command", ["push_worker", "--once"]),
+    # write-behind moment view/share counters
+    ("* * * * *", "django.core.management.call_command", ["flush_counters"]),
 ]
 
 # Data Science